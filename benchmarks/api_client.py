@@ -0,0 +1,157 @@
+"""Compares sending requests the way utility.get_request used to, with a new
+connection per request, against the pooled client of s2_client.py, one
+request at a time and concurrently, against the local stand-in API. The
+stand-in API rate limits every n-th request of the pooled client, which
+retries them, and the responses are checked against the expected papers.
+
+Example usage:
+    python benchmarks/api_client.py \
+        --papers 300 \
+        --latency 0.05 \
+        --throttle 10 \
+        --retry_after 0.1 \
+        --max_concurrency 8
+"""
+
+import argparse
+import sys
+import time
+from typing import Any, Callable, List, Optional
+
+sys.path.append("benchmarks/")
+sys.path.append("ccv/")
+import requests
+from s2_client import SyncS2Client
+from s2_stub import StubServer, fake_paper
+
+
+def get_args() -> argparse.Namespace:
+    """Returns the given arguments.
+
+    Returns:
+        argparse.Namespace: The arguments.
+    """
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--papers", type=int, help="number of papers to request", default=300
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        help="seconds the stand-in API waits per request",
+        default=0.05,
+    )
+    parser.add_argument(
+        "--throttle",
+        type=int,
+        help="the stand-in API answers every n-th request with 429",
+        default=10,
+    )
+    parser.add_argument(
+        "--retry_after",
+        type=float,
+        help="seconds the stand-in API sends as Retry-After",
+        default=0.1,
+    )
+    parser.add_argument(
+        "--max_concurrency",
+        type=int,
+        help="max number of requests in flight",
+        default=8,
+    )
+
+    return parser.parse_args()
+
+
+def run(
+    name: str,
+    fetch: Callable[[List[str]], List[Any]],
+    urls: List[str],
+    server: StubServer,
+    client: Optional[SyncS2Client] = None,
+) -> List[Any]:
+    """Fetches the URLs and prints how long it took.
+
+    Args:
+        name (str): Name of the mode.
+        fetch (Callable[[List[str]], List[Any]]): Fetches the URLs.
+        urls (List[str]): The URLs.
+        server (StubServer): The stand-in API.
+        client (Optional[SyncS2Client]): The client used, if any. Default
+            None.
+
+    Returns:
+        List[Any]: The responses.
+    """
+
+    start = time.perf_counter()
+    results = fetch(urls)
+    seconds = time.perf_counter() - start
+    retries = client.counts["retries"] if client is not None else 0
+    print(
+        f"{name:>10}: {seconds:.2f}s, {len(urls) / seconds:.1f} papers/s, "
+        f"{server.requests} requests, {server.throttled} rate limited, "
+        f"{retries} retries"
+    )
+    return results
+
+
+def get_unpooled(urls: List[str]) -> List[Any]:
+    """Requests each URL on a new connection, without retrying.
+
+    Args:
+        urls (List[str]): The URLs.
+
+    Returns:
+        List[Any]: The responses, {} for failed requests.
+    """
+
+    results = []
+    for url in urls:
+        r = requests.get(url)
+        results.append(r.json() if r.status_code == 200 else {})
+    return results
+
+
+def main() -> None:
+    """Executes the script."""
+
+    args = get_args()
+    ids = [f"corpusid:{i}" for i in range(1, args.papers + 1)]
+    expected = [fake_paper(id) for id in ids]
+
+    failed = False
+    with StubServer(latency=args.latency) as server:
+        urls = [f"{server.url}/paper/{id}" for id in ids]
+        results = run("unpooled", get_unpooled, urls, server)
+        failed = failed or results != expected
+
+    modes = [
+        ("sequential", lambda c: lambda urls: [c.get(u) for u in urls]),
+        ("concurrent", lambda c: c.get_many),
+    ]
+    for name, mode in modes:
+        with StubServer(
+            latency=args.latency,
+            throttle=args.throttle,
+            retry_after=args.retry_after,
+        ) as server:
+            client = SyncS2Client(
+                rate=1000,
+                burst=1000,
+                max_concurrency=args.max_concurrency,
+                base_delay=0.05,
+            )
+            urls = [f"{server.url}/paper/{id}" for id in ids]
+            results = run(name, mode(client), urls, server, client)
+            client.close()
+            failed = failed or results != expected
+
+    if failed:
+        sys.exit("Responses do not match the expected papers!")
+    print("All responses match the expected papers.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Compares the throughput of serial and batched BM25 searching, and checks
+that both return the same hits.
+
+Example usage:
+    python benchmarks/bm25_search.py \
+        --index "./anserini/indexes/lucene-index-cord19-abstract-2022-02-07" \
+        --input "./data/covidfact.jsonl" \
+        --claim_col "claim" \
+        --k 100 \
+        --threads 8 \
+        --chunk_size 64
+"""
+
+import argparse
+import sys
+import time
+from typing import Any, List, Tuple
+
+sys.path.append("ccv/")
+from pyserini.search.lucene import LuceneSearcher
+from retrieval import load_claims, search
+
+
+def get_args() -> argparse.Namespace:
+    """Returns the given arguments.
+
+    Returns:
+        argparse.Namespace: The arguments.
+    """
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--index", type=str, help="index file path", required=True
+    )
+    parser.add_argument(
+        "--input", type=str, help="input file containing claims", required=True
+    )
+    parser.add_argument(
+        "--claim_col", type=str, help="name of claim column", default="claim"
+    )
+    parser.add_argument(
+        "--delimiter", type=str, help="if not json, which delimiter"
+    )
+    parser.add_argument(
+        "--k", type=int, help="number of hits per claim", default=100
+    )
+    parser.add_argument(
+        "--threads", type=int, help="number of search threads", default=8
+    )
+    parser.add_argument(
+        "--chunk_size", type=int, help="claims per batch", default=64
+    )
+
+    return parser.parse_args()
+
+
+def timed_search(
+    searcher: LuceneSearcher,
+    claims: List[str],
+    k: int,
+    threads: int,
+    chunk_size: int,
+) -> Tuple[float, List[List[Tuple[str, float]]]]:
+    """Searches for all claims and measures the time taken.
+
+    Args:
+        searcher (LuceneSearcher): The searcher to use.
+        claims (List[str]): The claims to search for.
+        k (int): Number of hits per claim.
+        threads (int): Number of threads to use.
+        chunk_size (int): Number of claims per batch.
+
+    Returns:
+        float: Seconds taken.
+        List[List[Tuple[str, float]]]: The (docid, score) of each hit.
+    """
+
+    start = time.perf_counter()
+    results = [
+        [(h.docid, h.score) for h in hits]
+        for hits in search(searcher, claims, k, threads, chunk_size)
+    ]
+    return time.perf_counter() - start, results
+
+
+def main() -> None:
+    """Executes the script."""
+
+    args = get_args()
+    searcher = LuceneSearcher(args.index)
+    claims = load_claims(args.input, args.delimiter)[args.claim_col].tolist()
+
+    # Warm up the searcher so neither mode pays for loading the index.
+    searcher.search(claims[0], args.k)
+
+    results: List[Any] = []
+    for name, threads in [("serial", 1), ("batched", args.threads)]:
+        seconds, hits = timed_search(
+            searcher, claims, args.k, threads, args.chunk_size
+        )
+        results.append(hits)
+        print(
+            f"{name:>8}: {seconds:.2f}s, "
+            f"{len(claims) / seconds:.1f} claims/s"
+        )
+
+    if results[0] != results[1]:
+        sys.exit("Batched hits do not match serial hits!")
+    print("Batched hits match serial hits.")
+
+
+if __name__ == "__main__":
+    main()
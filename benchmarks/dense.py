@@ -0,0 +1,188 @@
+"""Compares the latency and recall of BM25-only, dense and hybrid first-stage
+retrieval. The reference is the current pipeline: the top nkeep documents
+after re-ranking the top 100 BM25 hits. For each first stage and ninit, the
+candidates are re-ranked and recall@nkeep is the fraction of the reference
+documents among the top nkeep re-ranked candidates. Documents are compared
+by docid, before duplicates are merged by corpusid.
+
+Example usage:
+    python benchmarks/dense.py \
+        --index "./anserini/indexes/lucene-index-cord19-abstract-2022-02-07" \
+        --dense_index "./data/dense_index" \
+        --input "./data/covidfact.jsonl" \
+        --claim_col "claim" \
+        --nkeep 20 \
+        --ninits 20 50 100 \
+        --nprobe 64 \
+        --limit 100
+"""
+
+import argparse
+import json
+import sys
+import time
+from typing import Any, Dict, Iterable, List, Tuple
+
+sys.path.append("ccv/")
+from pyserini.search.lucene import LuceneSearcher
+from dense import DenseEncoder, DenseIndex, dense_search
+from reranker import MonoT5Reranker
+from retrieval import load_claims, search
+
+
+def get_args() -> argparse.Namespace:
+    """Returns the given arguments.
+
+    Returns:
+        argparse.Namespace: The arguments.
+    """
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--index", type=str, help="index file path", required=True
+    )
+    parser.add_argument(
+        "--dense_index", type=str, help="dense index folder", required=True
+    )
+    parser.add_argument(
+        "--input", type=str, help="input file containing claims", required=True
+    )
+    parser.add_argument(
+        "--claim_col", type=str, help="name of claim column", default="claim"
+    )
+    parser.add_argument(
+        "--delimiter", type=str, help="if not json, which delimiter"
+    )
+    parser.add_argument(
+        "--nkeep", type=int, help="number of documents to keep", default=20
+    )
+    parser.add_argument(
+        "--ninits",
+        type=int,
+        nargs="+",
+        help="numbers of first-stage hits to compare",
+        default=[20, 50, 100],
+    )
+    parser.add_argument(
+        "--nprobe", type=int, help="number of IVF partitions to scan"
+    )
+    parser.add_argument(
+        "--device", type=str, help="device to run models on", default="cpu"
+    )
+    parser.add_argument(
+        "--limit", type=int, help="number of claims to use", default=100
+    )
+
+    return parser.parse_args()
+
+
+class Scorer:
+    """Re-ranks candidates, scoring each (claim, docid) pair only once
+    across all the first stages compared."""
+
+    def __init__(self, searcher: LuceneSearcher, device: str) -> None:
+        """
+        Args:
+            searcher (LuceneSearcher): The searcher, to fetch abstracts.
+            device (str): The device to run the re-ranker on.
+        """
+
+        self.searcher = searcher
+        self.reranker = MonoT5Reranker(device=device)
+        self.scores: Dict[Tuple[str, str], float] = {}
+
+    def top(self, claim: str, docids: List[str], n: int) -> List[str]:
+        """Re-ranks the candidates of the claim and returns the top n.
+
+        Args:
+            claim (str): The claim.
+            docids (List[str]): The candidates.
+            n (int): Number of documents to return.
+
+        Returns:
+            List[str]: The docids of the top n documents.
+        """
+
+        new = [d for d in docids if (claim, d) not in self.scores]
+        texts = [
+            json.loads(self.searcher.doc(d).raw())["csv_metadata"]["abstract"]
+            for d in new
+        ]
+        if new:
+            for d, s in zip(new, self.reranker.score(claim, texts)):
+                self.scores[(claim, d)] = s
+        ranked = sorted(docids, key=lambda d: -self.scores[(claim, d)])
+        return ranked[:n]
+
+
+def timed(hits: Iterable[List[Any]]) -> Tuple[float, List[List[str]]]:
+    """Runs a first stage and measures the time taken.
+
+    Args:
+        hits (Iterable[List[Any]]): The hits of each claim.
+
+    Returns:
+        float: Seconds taken.
+        List[List[str]]: The docids of the hits of each claim.
+    """
+
+    start = time.perf_counter()
+    docids = [[h.docid for h in claim_hits] for claim_hits in hits]
+    return time.perf_counter() - start, docids
+
+
+def main() -> None:
+    """Executes the script."""
+
+    args = get_args()
+    searcher = LuceneSearcher(args.index)
+    index = DenseIndex(args.dense_index)
+    encoder = DenseEncoder(
+        index.meta["model"], args.device, max_length=index.meta["max_length"]
+    )
+    claims = load_claims(args.input, args.delimiter)[args.claim_col].tolist()
+    claims = claims[: args.limit]
+    scorer = Scorer(searcher, args.device)
+
+    # Warm up the searchers so no first stage pays for loading them.
+    searcher.search(claims[0], 10)
+    index.search(encoder.encode(claims[:1]), 10, args.nprobe)
+
+    _, reference = timed(search(searcher, claims, 100))
+    reference = [
+        scorer.top(c, docids, args.nkeep)
+        for c, docids in zip(claims, reference)
+    ]
+
+    for ninit in args.ninits:
+        stages = {
+            "bm25": lambda: search(searcher, claims, ninit),
+            "dense": lambda: dense_search(
+                searcher, index, encoder, claims, ninit, nprobe=args.nprobe
+            ),
+            "hybrid": lambda: dense_search(
+                searcher,
+                index,
+                encoder,
+                claims,
+                ninit,
+                search(searcher, claims, ninit),
+                args.nprobe,
+            ),
+        }
+        for name, stage in stages.items():
+            seconds, candidates = timed(stage())
+            recall = sum(
+                len(set(scorer.top(c, docids, args.nkeep)) & set(ref))
+                / max(len(ref), 1)
+                for c, docids, ref in zip(claims, candidates, reference)
+            ) / len(claims)
+            print(
+                f"{name:>6} ninit={ninit:>4}: "
+                f"{1000 * seconds / len(claims):.1f} ms/claim, "
+                f"recall@{args.nkeep} {recall:.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""Compares loading the evidence links of all claims by reading the evidence
+relations into a DataFrame and the evidence map into a dict against reading
+both files incrementally with EviLinks of feature_visualization.py, as
+get_features does. The links of each claim are written out as they are
+loaded, the way get_features writes each claim's graph. Each loader runs in
+its own process, so that its peak resident memory can be measured, and the
+links both load are checked to be the same (up to the float precision of
+pandas' JSON parser). Streaming is also measured with the evidence map
+converted to a binary map by pair_map.py.
+
+Example usage:
+    python benchmarks/evidence_links.py \
+        --predictions "data/8e07ef5c41d7c1805593048efd379e19/ds_result.jsonl" \
+        --erelations "data/8e07ef5c41d7c1805593048efd379e19/es_result.jsonl" \
+        --emap "data/8e07ef5c41d7c1805593048efd379e19/es_map.json"
+"""
+
+import argparse
+import json
+import math
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Iterator, Tuple
+
+sys.path.append("ccv/")
+import pandas as pd
+from feature_visualization import EviLinks, get_evi_link, iter_evi_links
+from pair_map import convert
+
+D = "./data/8e07ef5c41d7c1805593048efd379e19"
+
+
+def get_args() -> argparse.Namespace:
+    """Returns the given arguments.
+
+    Returns:
+        argparse.Namespace: The arguments.
+    """
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--predictions",
+        type=str,
+        help="predictions file",
+        default=f"{D}/ds_result.jsonl",
+    )
+    parser.add_argument(
+        "--erelations",
+        type=str,
+        help="evidence relations file",
+        default=f"{D}/es_result.jsonl",
+    )
+    parser.add_argument(
+        "--emap", type=str, help="evidence map file", default=f"{D}/es_map.json"
+    )
+    parser.add_argument(
+        "--repeat", type=int, help="number of runs of each loader", default=3
+    )
+    parser.add_argument(
+        "--loader", type=str, help=argparse.SUPPRESS, choices=LOADERS
+    )
+    parser.add_argument("--output", type=str, help=argparse.SUPPRESS)
+
+    return parser.parse_args()
+
+
+def claim_ids(predictions: str) -> Iterator[int]:
+    """Reads the ids of the claims, in the order get_features builds their
+    graphs.
+
+    Args:
+        predictions (str): Predictions file.
+
+    Returns:
+        Iterator[int]: The claim ids.
+    """
+
+    with open(predictions, "r") as f:
+        for line in f:
+            yield json.loads(line)["id"]
+
+
+def load_dataframe(
+    predictions: str, erelations: str, emap: str
+) -> Iterator[Tuple[int, Any]]:
+    """Loads the evidence links the way get_features did before, reading both
+    files whole and walking the relations row by row.
+
+    Args:
+        predictions (str): Predictions file.
+        erelations (str): Evidence relations file.
+        emap (str): Evidence map file.
+
+    Returns:
+        Iterator[Tuple[int, Any]]: The evidence links of each claim.
+    """
+
+    evidence_relations = pd.read_json(erelations, lines=True)
+    with open(emap, "r") as f:
+        pairs = json.load(f)
+
+    evi_links = {}
+    for _, er in evidence_relations.iterrows():
+        if not er["evidence"]:
+            continue
+        link = pairs[str(er["id"])]
+        id = link["claim_id"]
+        evi_links.setdefault(id, []).append(get_evi_link(er["evidence"], link))
+    for claim_id in claim_ids(predictions):
+        yield claim_id, evi_links.get(claim_id, {})
+
+
+def load_streaming(
+    predictions: str, erelations: str, emap: str
+) -> Iterator[Tuple[int, Any]]:
+    """Loads the evidence links one claim at a time with EviLinks.
+
+    Args:
+        predictions (str): Predictions file.
+        erelations (str): Evidence relations file.
+        emap (str): Evidence map file.
+
+    Returns:
+        Iterator[Tuple[int, Any]]: The evidence links of each claim.
+    """
+
+    evi_links = EviLinks(iter_evi_links(erelations, emap))
+    for claim_id in claim_ids(predictions):
+        yield claim_id, evi_links.get(claim_id)
+
+
+# The binary loader streams the links with the map converted to a binary map.
+LOADERS = {
+    "dataframe": load_dataframe,
+    "streaming": load_streaming,
+    "binary": load_streaming,
+}
+
+
+def same(a: Any, b: Any) -> bool:
+    """Checks whether the two loaded values are the same, up to float
+    precision.
+
+    Args:
+        a (Any): A value.
+        b (Any): Another value.
+
+    Returns:
+        bool: Whether they are the same.
+    """
+
+    if isinstance(a, float) or isinstance(b, float):
+        return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-12)
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(same(a[k], b[k]) for k in a)
+    if isinstance(a, list):
+        return len(a) == len(b) and all(same(x, y) for x, y in zip(a, b))
+    return a == b
+
+
+def run_loader(args: argparse.Namespace) -> None:
+    """Runs one loader, writing the links of each claim to the output file as
+    they are loaded, followed by the time taken and the peak resident memory,
+    also relative to the peak before loading.
+
+    Args:
+        args (argparse.Namespace): The provided arguments.
+    """
+
+    loader = LOADERS[args.loader]
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    with open(args.output, "w") as f:
+        for claim_id, links in loader(
+            args.predictions, args.erelations, args.emap
+        ):
+            f.write(json.dumps([claim_id, links]) + "\n")
+        seconds = time.perf_counter() - start
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        growth = peak - before
+        stats = {"seconds": seconds, "peak_kb": peak, "growth_kb": growth}
+        f.write(json.dumps(stats) + "\n")
+
+
+def main() -> None:
+    """Executes the script."""
+
+    args = get_args()
+    if args.loader:
+        run_loader(args)
+        return
+
+    binary = tempfile.NamedTemporaryFile(suffix=".npy")
+    convert(args.emap, binary.name)
+    results = {}
+    for name in LOADERS:
+        emap = binary.name if name == "binary" else args.emap
+        runs = []
+        for _ in range(args.repeat):
+            with tempfile.NamedTemporaryFile(suffix=".json") as output:
+                subprocess.run(
+                    [
+                        sys.executable,
+                        __file__,
+                        "--predictions",
+                        args.predictions,
+                        "--erelations",
+                        args.erelations,
+                        "--emap",
+                        emap,
+                        "--loader",
+                        name,
+                        "--output",
+                        output.name,
+                    ],
+                    check=True,
+                )
+                with open(output.name, "r") as f:
+                    lines = [json.loads(line) for line in f]
+                runs.append(lines.pop())
+        results[name] = lines
+        seconds = min(r["seconds"] for r in runs)
+        peak = min(r["peak_kb"] for r in runs) / 1024
+        growth = min(r["growth_kb"] for r in runs) / 1024
+        nlinks = sum(len(links) for _, links in lines)
+        print(
+            f"{name:>9}: {seconds:.2f}s, "
+            f"peak memory {peak:.1f} MiB (+{growth:.1f} MiB loading), "
+            f"{nlinks} links of {len(lines)} claims"
+        )
+
+    for name in ["streaming", "binary"]:
+        if not same(results["dataframe"], results[name]):
+            sys.exit("Streamed evidence links do not match!")
+    print("Streamed evidence links match.")
+    print(
+        "Input sizes:",
+        ", ".join(
+            f"{os.path.basename(p)} {os.path.getsize(p) / 2**20:.1f} MiB"
+            for p in [args.erelations, args.emap, binary.name]
+        ),
+    )
+    binary.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""Compares the pair strategies of stance_evidence.py, writing every ordered
+pair of evidences against writing each unordered pair once (symmetric) and
+against only keeping the pairs of the most similar evidences (top_k). The
+number of pairs written is the number of longchecker inferences needed. The
+stances of the pairs are taken from the results of longchecker on all pairs,
+so that the graphs get_features builds for each strategy can be compared
+against the graphs built from all pairs, without running longchecker again.
+The paper information the graphs need comes from the local stand-in API.
+
+Example usage:
+    python benchmarks/evidence_pairs.py \
+        --claims "data/8e07ef5c41d7c1805593048efd379e19/ds_claims.jsonl" \
+        --corpus "data/8e07ef5c41d7c1805593048efd379e19/ds_corpus.jsonl" \
+        --predictions "data/8e07ef5c41d7c1805593048efd379e19/ds_result.jsonl" \
+        --erelations "data/8e07ef5c41d7c1805593048efd379e19/es_result.jsonl" \
+        --emap "data/8e07ef5c41d7c1805593048efd379e19/es_map.json" \
+        --top_k 1 3 5
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict, Set, Tuple
+
+sys.path.append("benchmarks/")
+sys.path.append("ccv/")
+import s2_client
+import utility
+from feature_visualization import get_features
+from s2_stub import StubServer
+from stance_evidence import produce_files
+
+D = "./data/8e07ef5c41d7c1805593048efd379e19"
+PAIR_FIELDS = ["claim_id", "fdoc_id", "fdoc_e_num", "sdoc_id", "sdoc_e_num"]
+
+
+def get_args() -> argparse.Namespace:
+    """Returns the given arguments.
+
+    Returns:
+        argparse.Namespace: The arguments.
+    """
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--claims", type=str, help="claims file", default=f"{D}/ds_claims.jsonl"
+    )
+    parser.add_argument(
+        "--corpus", type=str, help="corpus file", default=f"{D}/ds_corpus.jsonl"
+    )
+    parser.add_argument(
+        "--predictions",
+        type=str,
+        help="predictions file",
+        default=f"{D}/ds_result.jsonl",
+    )
+    parser.add_argument(
+        "--erelations",
+        type=str,
+        help="evidence relations file of all pairs",
+        default=f"{D}/es_result.jsonl",
+    )
+    parser.add_argument(
+        "--emap",
+        type=str,
+        help="evidence map file of all pairs",
+        default=f"{D}/es_map.json",
+    )
+    parser.add_argument(
+        "--top_k",
+        type=int,
+        nargs="+",
+        help="numbers of most similar evidences kept per evidence",
+        default=[1, 3, 5],
+    )
+
+    return parser.parse_args()
+
+
+def load_stances(erelations: str, emap: str) -> Dict[Tuple, Dict[str, Any]]:
+    """Loads the stances predicted by longchecker for all pairs.
+
+    Args:
+        erelations (str): Evidence relations file of all pairs.
+        emap (str): Evidence map file of all pairs.
+
+    Returns:
+        Dict[Tuple, Dict[str, Any]]: The evidence predicted for each pair,
+            keyed by the fields of the pair in PAIR_FIELDS.
+    """
+
+    with open(emap, "r") as f:
+        pairs = json.load(f)
+    stances = {}
+    with open(erelations, "r") as f:
+        for line in f:
+            er = json.loads(line)
+            pair = pairs[str(er["id"])]
+            stances[tuple(pair[k] for k in PAIR_FIELDS)] = er["evidence"]
+    return stances
+
+
+def write_stances(
+    stances: Dict[Tuple, Dict[str, Any]], emap: str, erelations: str
+) -> None:
+    """Writes the evidence relations file of the pairs in the given map, as
+    longchecker would.
+
+    Args:
+        stances (Dict[Tuple, Dict[str, Any]]): The evidence predicted for each
+            pair, from load_stances.
+        emap (str): Evidence map file of the pairs.
+        erelations (str): Evidence relations file to write.
+    """
+
+    with open(emap, "r") as f:
+        pairs = json.load(f)
+    with open(erelations, "w") as f:
+        for id, pair in pairs.items():
+            evidence = stances[tuple(pair[k] for k in PAIR_FIELDS)]
+            f.write(json.dumps({"id": int(id), "evidence": evidence}) + "\n")
+
+
+def evidence_links(output: str) -> Dict[str, Set[Tuple]]:
+    """Reads the evidence-evidence links of the graphs get_features wrote.
+
+    Args:
+        output (str): Output file of get_features.
+
+    Returns:
+        Dict[str, Set[Tuple]]: The unordered evidences and label of each
+            evidence-evidence link, by claim.
+    """
+
+    links = {}
+    with open(output, "r") as f:
+        for line in f:
+            graph = json.loads(line)
+            claim = graph["nodes"][0]["text"]
+            links[claim] = {
+                (frozenset([link["source"], link["target"]]), link["label"])
+                for link in graph["links"]
+                if "_" in link["source"] and "_" in link["target"]
+            }
+    return links
+
+
+def main() -> None:
+    """Executes the script."""
+
+    args = get_args()
+    stances = load_stances(args.erelations, args.emap)
+    strategies = [("all", 0), ("symmetric", 0)]
+    strategies += [("top_k", k) for k in args.top_k]
+    s2_client.configure(rate=1000, burst=1000)
+
+    links = {}
+    with tempfile.TemporaryDirectory() as tmp, StubServer() as server:
+        utility.api_url = server.url
+        for pairs, k in strategies:
+            name = pairs if not k else f"{pairs}={k}"
+            files = {
+                kind: os.path.join(tmp, f"{pairs}{k}.{kind}")
+                for kind in ["claims", "corpus", "map", "result", "graph"]
+            }
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                npairs, nall = produce_files(
+                    argparse.Namespace(
+                        oclaims=files["claims"],
+                        ocorpus=files["corpus"],
+                        omap=files["map"],
+                        corpus=args.corpus,
+                        predictions=args.predictions,
+                        pairs=pairs,
+                        top_k=k,
+                        similarity="tfidf",
+                    )
+                )
+            seconds = time.perf_counter() - start
+            write_stances(stances, files["map"], files["result"])
+            with contextlib.redirect_stdout(io.StringIO()):
+                get_features(
+                    argparse.Namespace(
+                        output=files["graph"],
+                        claims=args.claims,
+                        corpus=args.corpus,
+                        predictions=args.predictions,
+                        erelations=files["result"],
+                        emap=files["map"],
+                        metadata_cache=os.path.join(tmp, "metadata.sqlite"),
+                        offline=False,
+                        graph_store=None,
+                        workers=1,
+                    )
+                )
+            links[name] = evidence_links(files["graph"])
+
+            full = links["all"]
+            nlinks = sum(len(v) for v in links[name].values())
+            nfull = sum(len(v) for v in full.values())
+            kept = sum(len(links[name][c] & full[c]) for c in full)
+            union = sum(len(links[name][c] | full[c]) for c in full)
+            print(
+                f"{name:>9}: {npairs:>6} of {nall} pairs "
+                f"({100 * (nall - npairs) / nall:.1f}% cut) in {seconds:.2f}s, "
+                f"{nlinks} evidence links, "
+                f"{kept} of {nfull} links of all pairs kept, "
+                f"{nlinks - kept} new, jaccard {kept / max(union, 1):.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""Compares finding the reference and common author links between the
+evidence documents of a claim by checking every pair of documents against
+the indexed get_ref_links and get_aut_links of feature_visualization.py, and
+checks that both find the same links. The documents are synthetic, with
+references to each other and to unrelated papers, aliases, and authors drawn
+from a shared pool.
+
+Example usage:
+    python benchmarks/graph_links.py \
+        --sizes 20 100 500 \
+        --references 40 \
+        --authors 6
+"""
+
+import argparse
+import random
+import sys
+import time
+from typing import Any, Dict
+
+sys.path.append("ccv/")
+from feature_visualization import get_aut_links, get_ref_links
+
+
+def get_args() -> argparse.Namespace:
+    """Returns the given arguments.
+
+    Returns:
+        argparse.Namespace: The arguments.
+    """
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        help="numbers of documents per claim",
+        default=[20, 100, 500],
+    )
+    parser.add_argument(
+        "--references",
+        type=int,
+        help="number of references per document",
+        default=40,
+    )
+    parser.add_argument(
+        "--authors", type=int, help="number of authors per document", default=6
+    )
+    parser.add_argument(
+        "--linked",
+        type=float,
+        help="fraction of references to other evidence documents",
+        default=0.1,
+    )
+    parser.add_argument("--seed", type=int, help="random seed", default=0)
+
+    return parser.parse_args()
+
+
+def get_ref_links_pairwise(dinfo: Dict[str, Any]) -> Dict[str, Any]:
+    """Looks for reference links between documents identified as evidence to a
+    claim by checking every pair of documents. Used as reference for
+    get_ref_links.
+
+    Args:
+        dinfo (Dict[str, Any]): Dictionary containing various claim related
+            evidence.
+
+    Returns:
+        Dict[str, Any]: Dictionary where the key is the referencing document
+            and the value is a dictionary containing information about that
+            reference.
+    """
+
+    d = {}
+    docs = list(dinfo.keys())
+    for d1 in docs:
+        for d2 in docs:
+            references = dinfo[d1]["rinfo"].keys()
+            ids = dinfo[d2]["aliases"].copy()
+            ids.append(d2)
+            for id in ids:
+                if id in references:
+                    if not d.get(d1, None):
+                        d[d1] = []
+                    d[d1].append(
+                        {
+                            "reference": d2,
+                            "isInfluential": dinfo[d1]["rinfo"][d2][
+                                "isInfluential"
+                            ],
+                            "intent": dinfo[d1]["rinfo"][d2]["intents"],
+                        }
+                    )
+                    break
+    return d
+
+
+def get_aut_links_pairwise(dinfo: Dict[str, Any]) -> Dict[str, Any]:
+    """Looks for common authors between documents identified as evidence to a
+    claim by checking every pair of documents. Used as reference for
+    get_aut_links.
+
+    Args:
+        dinfo (Dict[str, Any]): Dictionary containing various claim related
+            evidence.
+
+    Returns:
+        Dict[str, Any]: Dictionary containing information about which documents
+            have common authors.
+    """
+
+    d = {}
+    docs = list(dinfo.keys())
+    for i in range(len(docs)):
+        for j in range(i + 1, len(docs)):
+            d1, d2 = docs[i], docs[j]
+            a1 = set(dinfo[d1]["ainfo"]["authors"].keys())
+            a2 = set(dinfo[d2]["ainfo"]["authors"].keys())
+            common = a1.intersection(a2)
+            if common:
+                d[d1] = {"doc": d2, "common": list(common)}
+    return d
+
+
+def make_docs(
+    n: int, nreferences: int, nauthors: int, linked: float
+) -> Dict[str, Any]:
+    """Makes the evidence documents of a claim, as built by get_features.
+
+    Args:
+        n (int): Number of documents.
+        nreferences (int): Number of references per document.
+        nauthors (int): Number of authors per document.
+        linked (float): Fraction of references to other evidence documents,
+            either by their corpusid or one of their aliases.
+
+    Returns:
+        Dict[str, Any]: The documents, keyed by corpusid.
+    """
+
+    corpusids = [str(c) for c in random.sample(range(10**6, 10**7), n)]
+    aliases = {c: [] for c in corpusids}
+    for c in random.sample(corpusids, n // 10):
+        aliases[c].append(str(random.randrange(10**7, 10**8)))
+    pool = [str(a) for a in range(max(n * nauthors // 4, nauthors))]
+
+    docs = {}
+    for c in corpusids:
+        references = {}
+        for _ in range(nreferences):
+            info = {
+                "isInfluential": random.random() < 0.2,
+                "intents": random.sample(
+                    ["background", "methodology", "result"], 1
+                ),
+                "contexts": [],
+            }
+            if random.random() < linked:
+                target = random.choice(corpusids)
+                references[random.choice(aliases[target] + [target])] = info
+                # The links are looked up by the corpusid of the document.
+                references[target] = info
+            else:
+                references[str(random.randrange(10**8, 10**9))] = info
+        authors = random.sample(pool, nauthors)
+        docs[c] = {
+            "aliases": aliases[c],
+            "ainfo": {"authors": {a: f"Author {a}" for a in authors}},
+            "rinfo": references,
+        }
+    return docs
+
+
+def main() -> None:
+    """Executes the script."""
+
+    args = get_args()
+    random.seed(args.seed)
+    pairs = [
+        ("references", get_ref_links_pairwise, get_ref_links),
+        ("authors", get_aut_links_pairwise, get_aut_links),
+    ]
+
+    for n in args.sizes:
+        docs = make_docs(n, args.references, args.authors, args.linked)
+        for name, pairwise, indexed in pairs:
+            results, seconds = [], []
+            for find in [pairwise, indexed]:
+                start = time.perf_counter()
+                results.append(find(docs))
+                seconds.append(time.perf_counter() - start)
+            print(
+                f"{name:>10} ndocs={n:>5}: pairwise {seconds[0]:.3f}s, "
+                f"indexed {seconds[1]:.3f}s, "
+                f"speedup {seconds[0] / seconds[1]:.1f}x, "
+                f"{len(results[1])} linked documents"
+            )
+            if results[0] != results[1]:
+                sys.exit("Indexed links do not match pairwise links!")
+    print("Indexed links match pairwise links.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Records the requests of the stages that talk to the Semantic Scholar API,
+resolving corpusids (id_cache.resolve_doc_ids) and fetching the metadata of
+evidence documents (feature_visualization.get_metadata), against the local
+stand-in API, then stops it and replays the recorded responses with s2_client
+at different injected latencies. Checks that every replay gives the same
+results as the recorded run.
+
+Example usage:
+    python benchmarks/http_replay.py \
+        --corpus "./data/8e07ef5c41d7c1805593048efd379e19/ds_corpus.jsonl" \
+        --papers 500 \
+        --latencies 0 0.05 0.2 \
+        --throttle 10
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+sys.path.append("benchmarks/")
+sys.path.append("ccv/")
+import s2_client
+import utility
+from feature_visualization import get_metadata
+from id_cache import resolve_doc_ids
+from id_resolution import make_metadatas
+from s2_stub import StubServer
+
+
+def get_args() -> argparse.Namespace:
+    """Returns the given arguments.
+
+    Returns:
+        argparse.Namespace: The arguments.
+    """
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--corpus",
+        type=str,
+        help="corpus file of the evidence documents",
+        default="./data/8e07ef5c41d7c1805593048efd379e19/ds_corpus.jsonl",
+    )
+    parser.add_argument(
+        "--papers", type=int, help="number of papers to resolve", default=500
+    )
+    parser.add_argument(
+        "--latencies",
+        type=float,
+        nargs="+",
+        help="seconds each replayed response takes",
+        default=[0, 0.05, 0.2],
+    )
+    parser.add_argument(
+        "--throttle",
+        type=int,
+        help="rate limit every nth replayed request, 0 for none",
+        default=0,
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        help="requests per second allowed, by default unlimited",
+        default=1000,
+    )
+    parser.add_argument("--seed", type=int, help="random seed", default=0)
+
+    return parser.parse_args()
+
+
+def run_stages(
+    stages: List[Tuple[str, Callable[[], Any]]]
+) -> Dict[str, Tuple[float, int, Any]]:
+    """Runs the stages with the current client.
+
+    Args:
+        stages (List[Tuple[str, Callable[[], Any]]]): Name and function of
+            each stage.
+
+    Returns:
+        Dict[str, Tuple[float, int, Any]]: Seconds taken, number of requests
+            and result of each stage.
+    """
+
+    results = {}
+    for name, stage in stages:
+        requests = utility.request_count()
+        start = time.perf_counter()
+        result = stage()
+        seconds = time.perf_counter() - start
+        results[name] = (seconds, utility.request_count() - requests, result)
+    return results
+
+
+def main() -> None:
+    """Executes the script."""
+
+    args = get_args()
+    random.seed(args.seed)
+    metadatas = make_metadatas(args.papers)
+    with open(args.corpus, "r") as f:
+        doc_ids = [str(json.loads(line)["doc_id"]) for line in f]
+    stages = [
+        ("resolve", lambda: resolve_doc_ids(metadatas)),
+        ("metadata", lambda: get_metadata(doc_ids)),
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fixtures = os.path.join(tmp, "fixtures.sqlite")
+        with StubServer() as server:
+            utility.api_url = server.url
+            s2_client.configure(
+                rate=1000, burst=1000, mode="record", fixtures=fixtures
+            )
+            recorded = run_stages(stages)
+        for name, (seconds, requests, _) in recorded.items():
+            print(f"recorded {name:>8}: {seconds:.2f}s, {requests} requests")
+
+        # The stand-in API is stopped, every response is replayed.
+        for latency in args.latencies:
+            s2_client.configure(
+                rate=args.rate,
+                burst=args.rate,
+                base_delay=0.1,
+                mode="replay",
+                fixtures=fixtures,
+                latency=latency,
+                throttle=args.throttle,
+            )
+            replayed = run_stages(stages)
+            for name, (seconds, requests, result) in replayed.items():
+                print(
+                    f"replayed {name:>8} latency={latency:.2f}s: "
+                    f"{seconds:.2f}s, {requests} requests"
+                )
+                if result != recorded[name][2]:
+                    sys.exit("Replayed results do not match recorded results!")
+        s2_client.close_client()
+    print("Replayed results match recorded results.")
+
+
+if __name__ == "__main__":
+    main()
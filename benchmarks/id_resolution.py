@@ -0,0 +1,123 @@
+"""Compares resolving corpusids one id at a time against resolving them in
+bulk using the paper batch endpoint, against the local stand-in API.
+
+Example usage:
+    python benchmarks/id_resolution.py --papers 1000 --latency 0.05
+"""
+
+import argparse
+import random
+import sys
+import time
+from typing import Dict, List, Union
+
+sys.path.append("benchmarks/")
+sys.path.append("ccv/")
+import s2_client
+import utility
+from id_cache import resolve_doc_ids
+from s2_stub import StubServer
+
+
+def get_args() -> argparse.Namespace:
+    """Returns the given arguments.
+
+    Returns:
+        argparse.Namespace: The arguments.
+    """
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--papers", type=int, help="number of papers to resolve", default=1000
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        help="seconds the stand-in API waits per request",
+        default=0.05,
+    )
+    parser.add_argument("--seed", type=int, help="random seed", default=0)
+
+    return parser.parse_args()
+
+
+def make_metadatas(n: int) -> List[Dict[str, str]]:
+    """Makes CORD-19 style metadata for papers without a corpusid, with a
+    random selection of other ids, some of which can not be resolved.
+
+    Args:
+        n (int): Number of papers.
+
+    Returns:
+        List[Dict[str, str]]: Metadata of the papers.
+    """
+
+    metadatas = []
+    for i in range(n):
+        m = {"s2_id": ""}
+        for key, _ in utility.id_keys:
+            r = random.random()
+            if r < 0.4:
+                m[key] = ""
+            elif r < 0.6:
+                m[key] = f"missing{i}{key}"
+            else:
+                m[key] = f"PMC{i}" if key == "pmcid" else f"{key}{i}"
+        metadatas.append(m)
+    return metadatas
+
+
+def resolve_serially(
+    metadatas: List[Dict[str, str]]
+) -> List[Union[int, str]]:
+    """Resolves the corpusids one id at a time, the way get_doc_id used to.
+
+    Args:
+        metadatas (List[Dict[str, str]]): Metadata of the papers.
+
+    Returns:
+        List[Union[int, str]]: The corpusid of each paper, "" if not found.
+    """
+
+    ids = []
+    for m in metadatas:
+        id = m["s2_id"]
+        for key, type in utility.id_keys:
+            id = m[key]
+            if id:
+                id = utility.get_corpusid(id, type)
+                if id:
+                    break
+        ids.append(id)
+    return ids
+
+
+def main() -> None:
+    """Executes the script."""
+
+    args = get_args()
+    random.seed(args.seed)
+    metadatas = make_metadatas(args.papers)
+    # The stand-in API has no rate limit to stay under.
+    s2_client.configure(rate=1000, burst=1000)
+
+    results = []
+    modes = [("serial", resolve_serially), ("bulk", resolve_doc_ids)]
+    for name, resolve in modes:
+        with StubServer(latency=args.latency) as server:
+            utility.api_url = server.url
+            start = time.perf_counter()
+            results.append(resolve(metadatas))
+            seconds = time.perf_counter() - start
+        print(
+            f"{name:>6}: {seconds:.2f}s, {server.requests} requests, "
+            f"{args.papers / seconds:.1f} papers/s"
+        )
+
+    if results[0] != results[1]:
+        sys.exit("Bulk corpusids do not match serial corpusids!")
+    print("Bulk corpusids match serial corpusids.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""Compares looking up the paper, author and reference information of
+documents and the corpusids of papers using the local stand-in API against
+looking them up in a graph store. The store is ingested from dataset shards
+made up to hold the same papers, authors and citations as the stand-in API,
+and the lookups of both are checked to be the same.
+
+Example usage:
+    python benchmarks/local_graph.py \
+        --corpus "./data/8e07ef5c41d7c1805593048efd379e19/ds_corpus.jsonl" \
+        --papers 1000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+sys.path.append("benchmarks/")
+sys.path.append("ccv/")
+import graph_store
+import s2_client
+import utility
+from feature_visualization import (
+    process_authors,
+    process_paper,
+    process_references,
+)
+from s2_stub import StubServer, fake_corpusid, fake_paper, fake_references
+
+
+def get_args() -> argparse.Namespace:
+    """Returns the given arguments.
+
+    Returns:
+        argparse.Namespace: The arguments.
+    """
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--corpus",
+        type=str,
+        help="corpus file of the documents to look up",
+        default="./data/8e07ef5c41d7c1805593048efd379e19/ds_corpus.jsonl",
+    )
+    parser.add_argument(
+        "--papers",
+        type=int,
+        help="number of papers to look up the corpusid of",
+        default=1000,
+    )
+    parser.add_argument("--seed", type=int, help="random seed", default=0)
+
+    return parser.parse_args()
+
+
+def make_ids(n: int) -> List[Tuple[str, str]]:
+    """Makes (type, id) pairs of papers, of all the types of ids.
+
+    Args:
+        n (int): Number of pairs.
+
+    Returns:
+        List[Tuple[str, str]]: The pairs.
+    """
+
+    types = list(utility.type_map)
+    ids = []
+    for i in range(n):
+        type = random.choice(types)
+        if type == "pmc":
+            ids.append((type, f"PMC{i}"))
+        elif type == "s2":
+            ids.append((type, f"{random.getrandbits(160):040x}"))
+        else:
+            ids.append((type, f"{type}{i}"))
+    return ids
+
+
+def write_shards(
+    folder: str, corpusids: List[str], ids: List[Tuple[str, str]]
+) -> Dict[str, List[str]]:
+    """Writes dataset shards holding the given documents and papers as the
+    stand-in API makes them up.
+
+    Args:
+        folder (str): Folder to write the shards to.
+        corpusids (List[str]): Corpusids of the documents.
+        ids (List[Tuple[str, str]]): (type, id) pairs of the papers.
+
+    Returns:
+        Dict[str, List[str]]: The shards of each dataset.
+    """
+
+    papers, authors, citations, paper_ids = [], {}, [], []
+    for corpusid in corpusids:
+        paper = fake_paper(f"corpusid:{corpusid}")
+        papers.append(
+            {
+                "corpusid": int(corpusid),
+                "externalids": {"CorpusId": corpusid},
+                "citationcount": paper["citationCount"],
+                "influentialcitationcount": paper["influentialCitationCount"],
+                "authors": [
+                    {"authorId": a["authorId"], "name": a["name"]}
+                    for a in paper["authors"]
+                ],
+            }
+        )
+        for a in paper["authors"]:
+            authors[a["authorId"]] = {
+                "authorid": a["authorId"],
+                "name": a["name"],
+                "papercount": a["paperCount"],
+                "citationcount": a["citationCount"],
+                "hindex": a["hIndex"],
+            }
+        for r in fake_references(f"corpusid:{corpusid}")["data"]:
+            external_ids = r["citedPaper"]["externalIds"]
+            citations.append(
+                {
+                    "citingcorpusid": int(corpusid),
+                    "citedcorpusid": (external_ids or {}).get("CorpusId"),
+                    "isinfluential": r["isInfluential"],
+                    "contexts": r["contexts"],
+                    "intents": r["intents"],
+                }
+            )
+    for type, id in ids:
+        corpusid = fake_corpusid(utility.format_id(id, type))
+        if type == "s2":
+            paper_ids.append({"sha": id, "corpusid": corpusid})
+            continue
+        name = graph_store.EXTERNAL_IDS[type]
+        external_id = id[3:] if type == "pmc" else id
+        external_ids = {name: external_id}
+        papers.append({"corpusid": corpusid, "externalids": external_ids})
+
+    shards = {}
+    datasets = [
+        ("papers", papers),
+        ("authors", list(authors.values())),
+        ("citations", citations),
+        ("paper_ids", paper_ids),
+    ]
+    for name, records in datasets:
+        path = os.path.join(folder, f"{name}.jsonl")
+        with open(path, "w") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+        shards[name] = [path]
+    return shards
+
+
+def timed(lookups: List[Callable[[], Any]]) -> Tuple[float, List[Any]]:
+    """Runs the lookups and measures the time taken.
+
+    Args:
+        lookups (List[Callable[[], Any]]): The lookups.
+
+    Returns:
+        float: Seconds taken.
+        List[Any]: The result of each lookup.
+    """
+
+    start = time.perf_counter()
+    results = [lookup() for lookup in lookups]
+    return time.perf_counter() - start, results
+
+
+def main() -> None:
+    """Executes the script."""
+
+    args = get_args()
+    random.seed(args.seed)
+    with open(args.corpus, "r") as f:
+        corpusids = list(
+            dict.fromkeys(str(json.loads(line)["doc_id"]) for line in f)
+        )
+    ids = make_ids(args.papers)
+    lookups = {
+        "paper": [lambda c=c: process_paper(c) for c in corpusids],
+        "authors": [lambda c=c: process_authors(c) for c in corpusids],
+        "references": [lambda c=c: process_references(c) for c in corpusids],
+        "corpusid": [lambda k=k: utility.get_corpusid(k[1], k[0]) for k in ids],
+    }
+    # The stand-in API has no rate limit to stay under.
+    s2_client.configure(rate=1000, burst=1000)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        shards = write_shards(tmp, corpusids, ids)
+        start = time.perf_counter()
+        graph_store.build(os.path.join(tmp, "store"), **shards)
+        print(f"ingested in {time.perf_counter() - start:.2f}s")
+
+        failed = False
+        with StubServer() as server:
+            utility.api_url = server.url
+            for name, calls in lookups.items():
+                graph_store.configure(None)
+                requests = server.requests
+                api_seconds, api_results = timed(calls)
+                api_requests = server.requests - requests
+
+                graph_store.configure(os.path.join(tmp, "store"))
+                requests = server.requests
+                store_seconds, store_results = timed(calls)
+                store_requests = server.requests - requests
+
+                print(
+                    f"{name:>10}: API {1e6 * api_seconds / len(calls):.0f}us "
+                    f"({api_requests} requests), store "
+                    f"{1e6 * store_seconds / len(calls):.0f}us "
+                    f"({store_requests} requests) per lookup"
+                )
+                failed |= api_results != store_results
+        graph_store.configure(None)
+
+    if failed:
+        sys.exit("Lookups in the store do not match the API!")
+    print("Lookups in the store match the API.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Compares finding near-duplicate titles by comparing every pair against
+the q-gram index of dedup.py, and checks that both find the same duplicates.
+Titles are taken from a corpus file, with slightly altered copies of some of
+them mixed in as duplicates.
+
+Example usage:
+    python benchmarks/near_duplicates.py \
+        --corpus "./data/8e07ef5c41d7c1805593048efd379e19/ds_corpus.jsonl" \
+        --sizes 100 500 1000
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from difflib import SequenceMatcher
+from typing import List, Tuple
+
+sys.path.append("ccv/")
+from dedup import find_duplicates
+
+
+def get_args() -> argparse.Namespace:
+    """Returns the given arguments.
+
+    Returns:
+        argparse.Namespace: The arguments.
+    """
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--corpus",
+        type=str,
+        help="corpus file to take titles from",
+        default="./data/8e07ef5c41d7c1805593048efd379e19/ds_corpus.jsonl",
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        help="numbers of titles to deduplicate",
+        default=[100, 500, 1000],
+    )
+    parser.add_argument(
+        "--duplicates",
+        type=float,
+        help="fraction of titles that are altered copies",
+        default=0.1,
+    )
+    parser.add_argument("--seed", type=int, help="random seed", default=0)
+
+    return parser.parse_args()
+
+
+def find_duplicates_pairwise(
+    titles: List[str], threshold: float = 0.825
+) -> List[Tuple[int, int]]:
+    """Finds all pairs of titles with a SequenceMatcher ratio of at least the
+    threshold by comparing every pair. Used as reference for find_duplicates.
+
+    Args:
+        titles (List[str]): The titles.
+        threshold (float): The ratio threshold. Default 0.825.
+
+    Returns:
+        List[Tuple[int, int]]: Index pairs (i, j), with i < j, of duplicate
+            titles.
+    """
+
+    duplicates = []
+    for i in range(len(titles)):
+        for j in range(i + 1, len(titles)):
+            r = SequenceMatcher(a=titles[i], b=titles[j]).ratio()
+            if r >= threshold:
+                duplicates.append((i, j))
+    return duplicates
+
+
+def alter(title: str) -> str:
+    """Makes a few random character edits to the given title.
+
+    Args:
+        title (str): The title.
+
+    Returns:
+        str: The altered title.
+    """
+
+    chars = list(title)
+    for _ in range(random.randint(0, max(len(chars) // 20, 1))):
+        i = random.randrange(len(chars) + 1)
+        op = random.random()
+        if op < 0.4 and chars:
+            chars.pop(min(i, len(chars) - 1))
+        elif op < 0.8:
+            chars.insert(i, random.choice("abcdefghijklmnopqrstuvwxyz -"))
+        elif chars:
+            chars[min(i, len(chars) - 1)] = random.choice("0123456789")
+    return "".join(chars)
+
+
+def make_titles(titles: List[str], n: int, duplicates: float) -> List[str]:
+    """Samples n distinct titles, replacing some of them with altered copies
+    of the others. If there are not enough titles, the rest are made by
+    shuffling the words of sampled titles.
+
+    Args:
+        titles (List[str]): Titles to sample from.
+        n (int): Number of titles.
+        duplicates (float): Fraction of titles that are altered copies.
+
+    Returns:
+        List[str]: The lowercased titles.
+    """
+
+    sample = random.sample(titles, min(n, len(titles)))
+    while len(sample) < n:
+        words = random.choice(titles).split()
+        random.shuffle(words)
+        sample.append(" ".join(words))
+    for i in random.sample(range(n), int(n * duplicates)):
+        sample[i] = alter(random.choice(sample))
+    return [t.lower() for t in sample]
+
+
+def main() -> None:
+    """Executes the script."""
+
+    args = get_args()
+    random.seed(args.seed)
+    with open(args.corpus, "r") as f:
+        titles = list({json.loads(line)["title"] for line in f})
+
+    for n in args.sizes:
+        sample = make_titles(titles, n, args.duplicates)
+        results, seconds = [], []
+        for find in [find_duplicates_pairwise, find_duplicates]:
+            start = time.perf_counter()
+            results.append(find(sample))
+            seconds.append(time.perf_counter() - start)
+        print(
+            f"ninit={n:>5}: pairwise {seconds[0]:.2f}s, "
+            f"indexed {seconds[1]:.2f}s, "
+            f"speedup {seconds[0] / seconds[1]:.1f}x, "
+            f"{len(results[1])} duplicate pairs"
+        )
+        if results[0] != results[1]:
+            sys.exit("Indexed duplicates do not match pairwise duplicates!")
+    print("Indexed duplicates match pairwise duplicates.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Compares fetching the paper, author and reference information of the
+evidence documents of each claim with three requests per document against
+fetching the paper and author information of a claim's documents together
+from the paper batch endpoint, and against fetching each document of all
+claims only once, the references concurrently. Runs against the local
+stand-in API, and checks that all give the same information.
+
+Example usage:
+    python benchmarks/paper_metadata.py --latency 0.05
+"""
+
+import argparse
+import json
+import sys
+import time
+from typing import Any, Dict, List
+
+sys.path.append("benchmarks/")
+sys.path.append("ccv/")
+import s2_client
+import utility
+from feature_visualization import (
+    get_metadata,
+    process_authors,
+    process_paper,
+    process_papers,
+    process_references,
+)
+from s2_stub import StubServer
+
+
+def get_args() -> argparse.Namespace:
+    """Returns the given arguments.
+
+    Returns:
+        argparse.Namespace: The arguments.
+    """
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--predictions",
+        type=str,
+        help="predictions file to take the evidence documents from",
+        default="./data/8e07ef5c41d7c1805593048efd379e19/ds_result.jsonl",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        help="seconds the stand-in API waits per request",
+        default=0.05,
+    )
+
+    return parser.parse_args()
+
+
+def fetch_separately(claims: List[List[str]]) -> List[Dict[str, Any]]:
+    """Fetches the information of each document with three requests, the way
+    get_features used to.
+
+    Args:
+        claims (List[List[str]]): The evidence documents of each claim.
+
+    Returns:
+        List[Dict[str, Any]]: The information of the documents of each claim.
+    """
+
+    return [
+        {
+            doc_id: {
+                "pinfo": process_paper(doc_id),
+                "ainfo": process_authors(doc_id),
+                "rinfo": process_references(doc_id),
+            }
+            for doc_id in doc_ids
+        }
+        for doc_ids in claims
+    ]
+
+
+def fetch_together(claims: List[List[str]]) -> List[Dict[str, Any]]:
+    """Fetches the paper and author information of the documents of each
+    claim together, and the references of each document.
+
+    Args:
+        claims (List[List[str]]): The evidence documents of each claim.
+
+    Returns:
+        List[Dict[str, Any]]: The information of the documents of each claim.
+    """
+
+    results = []
+    for doc_ids in claims:
+        papers = process_papers(doc_ids)
+        results.append(
+            {
+                doc_id: {
+                    **papers[doc_id],
+                    "rinfo": process_references(doc_id),
+                }
+                for doc_id in doc_ids
+            }
+        )
+    return results
+
+
+def fetch_once(claims: List[List[str]]) -> List[Dict[str, Any]]:
+    """Fetches the information of the documents of all claims together, each
+    document once, the way get_features does.
+
+    Args:
+        claims (List[List[str]]): The evidence documents of each claim.
+
+    Returns:
+        List[Dict[str, Any]]: The information of the documents of each claim.
+    """
+
+    metadata = get_metadata([d for doc_ids in claims for d in doc_ids])
+    return [{d: metadata[d] for d in doc_ids} for doc_ids in claims]
+
+
+def main() -> None:
+    """Executes the script."""
+
+    args = get_args()
+    with open(args.predictions, "r") as f:
+        claims = [list(json.loads(line)["evidence"]) for line in f]
+    claims = [doc_ids for doc_ids in claims if doc_ids]
+    ndocs = sum(len(doc_ids) for doc_ids in claims)
+    nunique = len({doc_id for doc_ids in claims for doc_id in doc_ids})
+    # The stand-in API has no rate limit to stay under.
+    s2_client.configure(rate=1000, burst=1000)
+
+    results = []
+    modes = [
+        ("separate", fetch_separately),
+        ("together", fetch_together),
+        ("once", fetch_once),
+    ]
+    for name, fetch in modes:
+        with StubServer(latency=args.latency) as server:
+            utility.api_url = server.url
+            start = time.perf_counter()
+            results.append(fetch(claims))
+            seconds = time.perf_counter() - start
+        print(
+            f"{name:>8}: {seconds:.2f}s, {server.requests} requests "
+            f"for {ndocs} documents ({nunique} unique), "
+            f"{dict(server.counts)}"
+        )
+
+    if any(r != results[0] for r in results[1:]):
+        sys.exit("Information fetched together does not match!")
+    print("Information fetched together matches.")
+
+
+if __name__ == "__main__":
+    main()
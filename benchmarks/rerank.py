@@ -0,0 +1,186 @@
+"""Measures the docs/second of the monoT5 re-ranker at different precisions,
+and how far their scores are from scoring with fp32 in the original document
+order, which is how documents used to be re-ranked. Also compares re-ranking
+each claim on its own against packing the (claim, document) pairs of all
+claims into token-budgeted batches.
+
+Example usage:
+    python benchmarks/rerank.py \
+        --claims "./data/8e07ef5c41d7c1805593048efd379e19/ds_claims.jsonl" \
+        --corpus "./data/8e07ef5c41d7c1805593048efd379e19/ds_corpus.jsonl" \
+        --device "cpu" \
+        --precisions fp32 bf16 int8 \
+        --token_budget 32768
+"""
+
+import argparse
+import json
+import sys
+import time
+from typing import Dict, List, Tuple
+
+sys.path.append("ccv/")
+import torch
+from reranker import PRECISIONS, MonoT5Reranker
+
+# Max absolute difference in log-probability allowed from the reference.
+TOLERANCES = {"fp32": 1e-4, "bf16": 0.1, "int8": 0.25}
+
+
+def get_args() -> argparse.Namespace:
+    """Returns the given arguments.
+
+    Returns:
+        argparse.Namespace: The arguments.
+    """
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--claims",
+        type=str,
+        help="claims file, as produced by retrieval.py",
+        default="./data/8e07ef5c41d7c1805593048efd379e19/ds_claims.jsonl",
+    )
+    parser.add_argument(
+        "--corpus",
+        type=str,
+        help="corpus file, as produced by retrieval.py",
+        default="./data/8e07ef5c41d7c1805593048efd379e19/ds_corpus.jsonl",
+    )
+    parser.add_argument(
+        "--device", type=str, help="device to run on", default="cpu"
+    )
+    parser.add_argument("--batch_size", type=int, help="batch size", default=32)
+    parser.add_argument(
+        "--precisions",
+        type=str,
+        nargs="+",
+        choices=PRECISIONS,
+        help="precisions to benchmark",
+        default=PRECISIONS,
+    )
+    parser.add_argument(
+        "--token_budget",
+        type=int,
+        help="token budget of the packed batches",
+        default=32768,
+    )
+    parser.add_argument(
+        "--threads", type=int, help="number of torch cpu threads"
+    )
+
+    return parser.parse_args()
+
+
+def load_queries(claims: str, corpus: str) -> List[Tuple[str, List[str]]]:
+    """Loads each claim together with the abstracts of its documents.
+
+    Args:
+        claims (str): Path to the claims file.
+        corpus (str): Path to the corpus file.
+
+    Returns:
+        List[Tuple[str, List[str]]]: The claims and their abstracts.
+    """
+
+    with open(corpus, "r") as f:
+        docs: Dict[int, str] = {}
+        for line in f:
+            d = json.loads(line)
+            docs[d["doc_id"]] = " ".join(d["abstract"])
+    with open(claims, "r") as f:
+        claims = [json.loads(line) for line in f]
+    return [(c["claim"], [docs[i] for i in c["doc_ids"]]) for c in claims]
+
+
+def run(
+    reranker: MonoT5Reranker, queries: List[Tuple[str, List[str]]]
+) -> Tuple[float, List[float]]:
+    """Scores the documents of each query.
+
+    Args:
+        reranker (MonoT5Reranker): The re-ranker.
+        queries (List[Tuple[str, List[str]]]): The claims and their abstracts.
+
+    Returns:
+        float: Seconds taken.
+        List[float]: The scores of all documents.
+    """
+
+    start = time.perf_counter()
+    scores = [s for q, texts in queries for s in reranker.score(q, texts)]
+    return time.perf_counter() - start, scores
+
+
+def run_packed(
+    reranker: MonoT5Reranker, queries: List[Tuple[str, List[str]]]
+) -> Tuple[float, List[float]]:
+    """Scores the documents of all queries together.
+
+    Args:
+        reranker (MonoT5Reranker): The re-ranker.
+        queries (List[Tuple[str, List[str]]]): The claims and their abstracts.
+
+    Returns:
+        float: Seconds taken.
+        List[float]: The scores of all documents.
+    """
+
+    start = time.perf_counter()
+    scores = [s for scores in reranker.score_many(queries) for s in scores]
+    return time.perf_counter() - start, scores
+
+
+def main() -> None:
+    """Executes the script."""
+
+    args = get_args()
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    queries = load_queries(args.claims, args.corpus)
+    ndocs = sum(len(texts) for _, texts in queries)
+
+    reference = MonoT5Reranker(
+        device=args.device, batch_size=args.batch_size, sort_by_length=False
+    )
+    seconds, expected = run(reference, queries)
+    print(f"reference: {ndocs / seconds:.1f} docs/s")
+    del reference
+
+    failed = False
+    for precision in args.precisions:
+        reranker = MonoT5Reranker(
+            device=args.device, batch_size=args.batch_size, precision=precision
+        )
+        seconds, scores = run(reranker, queries)
+        diff = max(abs(a - b) for a, b in zip(expected, scores))
+        ok = diff <= TOLERANCES[precision]
+        failed = failed or not ok
+        print(
+            f"{precision:>9}: {ndocs / seconds:.1f} docs/s, "
+            f"max score difference {diff:.2e} "
+            f"({'within' if ok else 'above'} {TOLERANCES[precision]})"
+        )
+        del reranker
+
+    reranker = MonoT5Reranker(
+        device=args.device,
+        batch_size=args.batch_size,
+        token_budget=args.token_budget,
+    )
+    seconds, scores = run_packed(reranker, queries)
+    diff = max(abs(a - b) for a, b in zip(expected, scores))
+    ok = diff <= TOLERANCES["fp32"]
+    failed = failed or not ok
+    print(
+        f"{'packed':>9}: {ndocs / seconds:.1f} docs/s, "
+        f"max score difference {diff:.2e} "
+        f"({'within' if ok else 'above'} {TOLERANCES['fp32']})"
+    )
+
+    if failed:
+        sys.exit("Scores are not within tolerance!")
+
+
+if __name__ == "__main__":
+    main()
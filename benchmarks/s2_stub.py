@@ -0,0 +1,301 @@
+"""Local stand-in for the Semantic Scholar Academic Graph API, used to count
+requests and measure latency without network access. Every id resolves to a
+made up, but deterministic, paper, except for ids containing "missing". It
+can answer every n-th request with 429 Too Many Requests, optionally with a
+Retry-After header, to exercise rate limit handling.
+
+Point the system at it by setting utility.api_url (or the SS_API_URL
+environment variable) to StubServer.url.
+
+Example usage:
+    python benchmarks/s2_stub.py --port 8000 --latency 0.2 --throttle 10
+"""
+
+import argparse
+import hashlib
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+from urllib.parse import unquote, urlparse
+
+
+def get_args() -> argparse.Namespace:
+    """Returns the given arguments.
+
+    Returns:
+        argparse.Namespace: The arguments.
+    """
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, help="port to use", default=8000)
+    parser.add_argument(
+        "--latency",
+        type=float,
+        help="seconds to wait before answering a request",
+        default=0,
+    )
+    parser.add_argument(
+        "--throttle",
+        type=int,
+        help="answer every n-th request with 429, 0 to never",
+        default=0,
+    )
+    parser.add_argument(
+        "--retry_after",
+        type=float,
+        help="seconds to send as Retry-After with 429 responses",
+    )
+
+    return parser.parse_args()
+
+
+def fake_corpusid(id: str) -> int:
+    """Returns the made up corpusid of the given paper id.
+
+    Args:
+        id (str): The id of the paper.
+
+    Returns:
+        int: The corpusid of the paper.
+    """
+
+    if id.lower().startswith("corpusid:"):
+        return int(id.split(":", 1)[1])
+    return int(hashlib.md5(id.encode()).hexdigest()[:7], 16)
+
+
+def fake_number(*keys: Any, mod: int = 1000) -> int:
+    """Returns a made up, but deterministic, number for the given keys.
+
+    Args:
+        *keys (Any): The keys.
+        mod (int): The number is below this. Default 1000.
+
+    Returns:
+        int: The number.
+    """
+
+    data = ":".join(str(k) for k in keys).encode()
+    return int(hashlib.md5(data).hexdigest()[:8], 16) % mod
+
+
+def fake_paper(id: str) -> Optional[Dict[str, Any]]:
+    """Returns the made up paper with the given id.
+
+    Args:
+        id (str): The id of the paper.
+
+    Returns:
+        Optional[Dict[str, Any]]: The paper, None if it does not exist.
+    """
+
+    if "missing" in id:
+        return None
+    corpusid = fake_corpusid(id)
+    authors = []
+    for i in range(1 + fake_number(corpusid, "authors", mod=5)):
+        author = fake_number(corpusid, "author", i, mod=300)
+        authors.append(
+            {
+                "authorId": str(author),
+                "name": f"Author {author}",
+                "paperCount": fake_number(author, "papers"),
+                "citationCount": fake_number(author, "citations", mod=10000),
+                "hIndex": fake_number(author, "h", mod=50) or None,
+            }
+        )
+    return {
+        "paperId": f"{corpusid:040x}",
+        "externalIds": {"CorpusId": corpusid},
+        "citationCount": fake_number(corpusid, "citations"),
+        "influentialCitationCount": fake_number(
+            corpusid, "influential", mod=50
+        ),
+        "authors": authors,
+    }
+
+
+def fake_references(id: str) -> Dict[str, Any]:
+    """Returns the made up references of the paper with the given id.
+
+    Args:
+        id (str): The id of the paper.
+
+    Returns:
+        Dict[str, Any]: The references, as returned by the references
+            endpoint.
+    """
+
+    corpusid = fake_corpusid(id)
+    data = []
+    for i in range(fake_number(corpusid, "references", mod=20)):
+        cited = fake_number(corpusid, "reference", i, mod=100_000)
+        data.append(
+            {
+                "citedPaper": {
+                    "paperId": f"{cited:040x}",
+                    "externalIds": {"CorpusId": cited} if i % 7 else None,
+                },
+                "contexts": [f"Context {i}."],
+                "intents": ["background"] if i % 2 else [],
+                "isInfluential": i % 3 == 0,
+            }
+        )
+    return {"offset": 0, "data": data}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers requests to the paper, paper batch and references
+    endpoints."""
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def send_json(
+        self, status: int, body: Any, headers: Dict[str, str] = None
+    ) -> None:
+        """Sends the given body as a JSON response.
+
+        Args:
+            status (int): The status code.
+            body (Any): The body.
+            headers (Dict[str, str]): Additional headers. Default None.
+        """
+
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def handle_request(self, method: str) -> None:
+        """Counts and answers the request.
+
+        Args:
+            method (str): The http method of the request.
+        """
+
+        server = self.server
+        path = urlparse(self.path).path
+        endpoint = "paper"
+        if path.endswith("/paper/batch"):
+            endpoint = "batch"
+        elif path.endswith("/references"):
+            endpoint = "references"
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length) if length else b""
+        with server.lock:
+            server.counts[(method, endpoint)] += 1
+            throttled = bool(server.throttle) and (
+                server.requests % server.throttle == 0
+            )
+            server.throttled += throttled
+        time.sleep(server.latency)
+
+        if throttled:
+            headers = {}
+            if server.retry_after is not None:
+                headers["Retry-After"] = str(server.retry_after)
+            self.send_json(429, {"error": "Too Many Requests"}, headers)
+        elif method == "POST" and endpoint == "batch":
+            ids = json.loads(body)["ids"]
+            self.send_json(200, [fake_paper(id) for id in ids])
+        elif method == "GET" and endpoint == "references":
+            id = unquote(path.split("/paper/", 1)[1].rsplit("/", 1)[0])
+            if fake_paper(id) is None:
+                self.send_json(404, {"error": "Paper not found"})
+            else:
+                self.send_json(200, fake_references(id))
+        elif method == "GET" and "/paper/" in path:
+            id = unquote(path.split("/paper/", 1)[1])
+            paper = fake_paper(id)
+            if paper is None:
+                self.send_json(404, {"error": "Paper not found"})
+            else:
+                self.send_json(200, paper)
+        else:
+            self.send_json(404, {"error": "Not found"})
+
+    def do_GET(self) -> None:
+        self.handle_request("GET")
+
+    def do_POST(self) -> None:
+        self.handle_request("POST")
+
+
+class StubServer(ThreadingHTTPServer):
+    """Stand-in API server running in a background thread."""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        port: int = 0,
+        latency: float = 0,
+        throttle: int = 0,
+        retry_after: Optional[float] = None,
+    ) -> None:
+        """
+        Args:
+            port (int): Port to listen on, 0 picks a free one. Default 0.
+            latency (float): Seconds to wait before answering. Default 0.
+            throttle (int): If not 0, every throttle-th request is answered
+                with 429 Too Many Requests. Default 0.
+            retry_after (Optional[float]): Seconds to send as Retry-After with
+                429 responses, not sent if None. Default None.
+        """
+
+        super().__init__(("127.0.0.1", port), StubHandler)
+        self.latency = latency
+        self.throttle = throttle
+        self.retry_after = retry_after
+        self.throttled = 0
+        self.counts = Counter()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        """The base URL of the stand-in API."""
+
+        return f"http://127.0.0.1:{self.server_address[1]}/graph/v1"
+
+    @property
+    def requests(self) -> int:
+        """The total number of requests received."""
+
+        return sum(self.counts.values())
+
+    def __enter__(self) -> "StubServer":
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+def main() -> None:
+    """Executes the script."""
+
+    args = get_args()
+    with StubServer(
+        args.port, args.latency, args.throttle, args.retry_after
+    ) as server:
+        print(f"Serving stand-in API at {server.url}, press Ctrl+C to stop.")
+        try:
+            server.thread.join()
+        except KeyboardInterrupt:
+            pass
+    print("Requests received:", dict(server.counts))
+
+
+if __name__ == "__main__":
+    main()
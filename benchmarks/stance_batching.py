@@ -0,0 +1,171 @@
+"""Measures the pairs/second of longchecker predicting the stances between
+evidence pairs one pair at a time, as run_query.py used to, against batching
+pairs of similar length under token budgets with LongCheckerSession. Checks
+that the batched predictions agree with the predictions of one pair at a
+time: the same labels and rationales, and probabilities within tolerance.
+The pairs are selected from the documents retrieved for the claims, as
+stance_evidence.py does.
+
+Example usage:
+    python benchmarks/stance_batching.py \
+        --corpus "data/8e07ef5c41d7c1805593048efd379e19/ds_corpus.jsonl" \
+        --predictions "data/8e07ef5c41d7c1805593048efd379e19/ds_result.jsonl" \
+        --device "cpu" \
+        --pairs 500 \
+        --token_budgets 4096 8192 16384
+"""
+
+import argparse
+import sys
+import time
+from itertools import islice
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.append("ccv/")
+import torch
+from stance_evidence import iter_pairs
+from stance_predictor import LongCheckerSession, pair_entries
+
+D = "./data/8e07ef5c41d7c1805593048efd379e19"
+# Max absolute difference in probability allowed from one pair at a time.
+TOLERANCE = 1e-3
+
+
+def get_args() -> argparse.Namespace:
+    """Returns the given arguments.
+
+    Returns:
+        argparse.Namespace: The arguments.
+    """
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--corpus", type=str, help="corpus file", default=f"{D}/ds_corpus.jsonl"
+    )
+    parser.add_argument(
+        "--predictions",
+        type=str,
+        help="predictions file",
+        default=f"{D}/ds_result.jsonl",
+    )
+    parser.add_argument(
+        "--checkpoint_path",
+        type=str,
+        help="longchecker checkpoint",
+        default="longchecker/checkpoints/covidfact.ckpt",
+    )
+    parser.add_argument(
+        "--device", type=str, help="device to run on", default="cpu"
+    )
+    parser.add_argument(
+        "--pairs", type=int, help="number of pairs to predict", default=500
+    )
+    parser.add_argument(
+        "--token_budgets",
+        type=int,
+        nargs="+",
+        help="token budgets of the batches",
+        default=[4096, 8192, 16384],
+    )
+    parser.add_argument(
+        "--threads", type=int, help="number of torch cpu threads"
+    )
+
+    return parser.parse_args()
+
+
+def run(
+    session: LongCheckerSession,
+    entries: List[Dict[str, Any]],
+    token_budget: Optional[int],
+) -> Tuple[float, List[Dict[str, Any]]]:
+    """Predicts the stances of the pairs.
+
+    Args:
+        session (LongCheckerSession): The loaded model.
+        entries (List[Dict[str, Any]]): The entries of the pairs.
+        token_budget (Optional[int]): Token budget of the batches, one pair at
+            a time if None.
+
+    Returns:
+        float: Seconds taken.
+        List[Dict[str, Any]]: The predictions.
+    """
+
+    start = time.perf_counter()
+    predictions = session.predict(
+        entries, str(token_budget), batch_size=1, token_budget=token_budget
+    )
+    return time.perf_counter() - start, predictions
+
+
+def difference(
+    expected: List[Dict[str, Any]], predictions: List[Dict[str, Any]]
+) -> Tuple[int, float]:
+    """Compares predictions against the expected predictions.
+
+    Args:
+        expected (List[Dict[str, Any]]): The expected predictions.
+        predictions (List[Dict[str, Any]]): The predictions.
+
+    Returns:
+        int: Number of predictions whose label or rationale differs.
+        float: Max absolute difference of their probabilities.
+    """
+
+    mismatches, diff = 0, 0.0
+    for a, b in zip(expected, predictions):
+        if (
+            a["claim_id"] != b["claim_id"]
+            or a["predicted_label"] != b["predicted_label"]
+            or a["predicted_rationale"] != b["predicted_rationale"]
+        ):
+            mismatches += 1
+        for key in ["label_probs", "rationale_probs"]:
+            diff = max(
+                [diff] + [abs(x - y) for x, y in zip(a[key], b[key])]
+            )
+    return mismatches, diff
+
+
+def main() -> None:
+    """Executes the script."""
+
+    args = get_args()
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    pair_args = argparse.Namespace(
+        corpus=args.corpus,
+        predictions=args.predictions,
+        pairs="all",
+        top_k=0,
+        similarity="tfidf",
+    )
+    pairs = islice(pair_entries(iter_pairs(pair_args)), args.pairs)
+    entries = [entry for entry, _ in pairs]
+
+    session = LongCheckerSession(args.checkpoint_path, args.device)
+    print(f"loaded longchecker in {session.load_time:.1f}s")
+    seconds, expected = run(session, entries, None)
+    print(f"one at a time: {len(entries) / seconds:.1f} pairs/s")
+
+    failed = False
+    for token_budget in args.token_budgets:
+        seconds, predictions = run(session, entries, token_budget)
+        mismatches, diff = difference(expected, predictions)
+        ok = not mismatches and diff <= TOLERANCE
+        failed = failed or not ok
+        print(
+            f"token_budget={token_budget}: "
+            f"{len(entries) / seconds:.1f} pairs/s, "
+            f"{mismatches} different labels or rationales, "
+            f"max probability difference {diff:.2e} "
+            f"({'within' if diff <= TOLERANCE else 'above'} {TOLERANCE})"
+        )
+
+    if failed:
+        sys.exit("Batched predictions do not agree!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""Finds near-duplicate titles without comparing every pair of titles.
+
+Two titles are duplicates if difflib.SequenceMatcher gives them a ratio of at
+least the threshold. Candidate pairs are proposed from an inverted index of
+character q-grams and only the candidates are compared using SequenceMatcher.
+
+If two strings a and b of length la and lb have a ratio of at least r, they
+have M >= r * (la + lb) / 2 matching characters, spread over at most
+la + lb - 2M + 1 matching blocks. Each block of length n contains n - q + 1
+q-grams, so a and b share at least M - (la + lb - 2M + 1) * (q - 1) q-grams.
+Pairs sharing fewer q-grams can not be duplicates, which allows the index to
+only hold a prefix of each title's q-grams, rarest first (prefix filtering),
+without missing any duplicates. Candidates are then filtered by their length,
+their q-gram overlap and the length of their longest common subsequence, all
+upper bounds of the ratio, before computing the ratio itself.
+"""
+
+
+import math
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Set, Tuple
+
+Q = 2  # length of the q-grams.
+
+
+def qgrams(text: str, q: int = Q) -> List[Tuple[str, int]]:
+    """Returns the q-grams of the given text, numbering repeated q-grams so
+    that the set of q-grams keeps their count.
+
+    Args:
+        text (str): The text.
+        q (int): Length of the q-grams. Default Q.
+
+    Returns:
+        List[Tuple[str, int]]: (q-gram, occurrence) pairs of the text.
+    """
+
+    seen = Counter()
+    grams = []
+    for i in range(len(text) - q + 1):
+        g = text[i : i + q]
+        grams.append((g, seen[g]))
+        seen[g] += 1
+    return grams
+
+
+def min_matches(la: int, lb: int, threshold: float) -> int:
+    """Returns a lower bound of the number of matching characters two strings
+    of the given lengths need to have to reach the threshold ratio.
+
+    Args:
+        la (int): Length of the first string.
+        lb (int): Length of the second string.
+        threshold (float): The ratio threshold.
+
+    Returns:
+        int: The lower bound, kept one lower than needed to be safe against
+            floating point rounding.
+    """
+
+    return math.ceil(threshold * (la + lb) / 2) - 1
+
+
+def min_overlap(la: int, lb: int, threshold: float, q: int = Q) -> int:
+    """Returns a lower bound of the number of q-grams two strings of the given
+    lengths share if they reach the threshold ratio.
+
+    Args:
+        la (int): Length of the first string.
+        lb (int): Length of the second string.
+        threshold (float): The ratio threshold.
+        q (int): Length of the q-grams. Default Q.
+
+    Returns:
+        int: The lower bound.
+    """
+
+    m = min_matches(la, lb, threshold)
+    return m - (la + lb - 2 * m + 1) * (q - 1)
+
+
+def length_compatible(la: int, lb: int, threshold: float) -> bool:
+    """Checks whether strings of the given lengths can reach the threshold
+    ratio, which is at most 2 * min(la, lb) / (la + lb).
+
+    Args:
+        la (int): Length of the first string.
+        lb (int): Length of the second string.
+        threshold (float): The ratio threshold.
+
+    Returns:
+        bool: False if the strings can not reach the threshold.
+    """
+
+    return 2 * min(la, lb) >= threshold * (la + lb) - 1e-6
+
+
+def filter_overlap(la: int, threshold: float) -> int:
+    """Returns the lowest number of q-grams a string of the given length
+    shares with any string it can reach the threshold ratio with.
+
+    Args:
+        la (int): Length of the string.
+        threshold (float): The ratio threshold.
+
+    Returns:
+        int: The lower bound.
+    """
+
+    lo = math.floor(la * threshold / (2 - threshold))
+    hi = math.ceil(la * (2 - threshold) / threshold)
+    return min(
+        min_overlap(la, lb, threshold)
+        for lb in range(lo, hi + 1)
+        if length_compatible(la, lb, threshold)
+    )
+
+
+def char_masks(text: str) -> Dict[str, int]:
+    """Returns a bit mask for each character of the text, marking where in
+    the text the character occurs.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        Dict[str, int]: The mask of each character.
+    """
+
+    masks: Dict[str, int] = {}
+    for i, c in enumerate(text):
+        masks[c] = masks.get(c, 0) | (1 << i)
+    return masks
+
+
+def lcs_length(a: str, b: str, masks: Dict[str, int] = None) -> int:
+    """Returns the length of the longest common subsequence of the two
+    strings, computed bit-parallel (Hyyrö, 2004). The matching blocks found
+    by SequenceMatcher form a common subsequence, so this bounds M.
+
+    Args:
+        a (str): The first string.
+        b (str): The second string.
+        masks (Dict[str, int]): char_masks of a, if already computed.
+            Default None.
+
+    Returns:
+        int: The length of the longest common subsequence.
+    """
+
+    masks = char_masks(a) if masks is None else masks
+    full = (1 << len(a)) - 1
+    v = full
+    for c in b:
+        u = v & masks.get(c, 0)
+        v = ((v + u) | (v - u)) & full
+    return len(a) - bin(v).count("1")
+
+
+def build_index(
+    grams: List[Set[Tuple[str, int]]], lengths: List[int], threshold: float
+) -> Tuple[Dict[Tuple[str, int], List[int]], List[int]]:
+    """Indexes the rarest q-grams of each title, as many as needed for any
+    duplicate of the title to share at least one of them.
+
+    Args:
+        grams (List[Set[Tuple[str, int]]]): The q-grams of each title.
+        lengths (List[int]): The length of each title.
+        threshold (float): The ratio threshold.
+
+    Returns:
+        Dict[Tuple[str, int], List[int]]: The titles of each indexed q-gram.
+        List[int]: Titles too short to be filtered, which are compared to
+            every other title.
+    """
+
+    frequency = Counter(g for gs in grams for g in gs)
+    unfiltered = []
+    index: Dict[Tuple[str, int], List[int]] = defaultdict(list)
+    for i, gs in enumerate(grams):
+        t = filter_overlap(lengths[i], threshold)
+        if t <= 0:
+            unfiltered.append(i)
+            continue
+        prefix = sorted(gs, key=lambda g: (frequency[g], g))
+        for g in prefix[: max(len(prefix) - t + 1, 0)]:
+            index[g].append(i)
+    return index, unfiltered
+
+
+def candidate_pairs(
+    index: Dict[Tuple[str, int], List[int]], unfiltered: List[int], n: int
+) -> Set[Tuple[int, int]]:
+    """Returns the pairs of titles sharing an indexed q-gram, and the pairs
+    of the unfiltered titles with every other title.
+
+    Args:
+        index (Dict[Tuple[str, int], List[int]]): The index, from
+            build_index.
+        unfiltered (List[int]): The unfiltered titles, from build_index.
+        n (int): Number of titles.
+
+    Returns:
+        Set[Tuple[int, int]]: Index pairs (i, j), with i < j, of candidates.
+    """
+
+    candidates: Set[Tuple[int, int]] = set()
+    for postings in index.values():
+        for x in range(len(postings)):
+            for y in range(x + 1, len(postings)):
+                candidates.add((postings[x], postings[y]))
+    for i in unfiltered:
+        for j in range(n):
+            if i != j:
+                candidates.add((min(i, j), max(i, j)))
+    return candidates
+
+
+def is_duplicate(
+    a: str,
+    b: str,
+    grams: Tuple[Set[Tuple[str, int]], Set[Tuple[str, int]]],
+    masks: Dict[str, int],
+    threshold: float,
+) -> bool:
+    """Checks whether a candidate pair reaches the threshold ratio, ruling it
+    out by its lengths, q-gram overlap and longest common subsequence before
+    computing the ratio.
+
+    Args:
+        a (str): The first title.
+        b (str): The second title.
+        grams (Tuple[Set[Tuple[str, int]], Set[Tuple[str, int]]]): The
+            q-grams of both titles.
+        masks (Dict[str, int]): char_masks of a.
+        threshold (float): The ratio threshold.
+
+    Returns:
+        bool: Whether the titles are duplicates.
+    """
+
+    la, lb = len(a), len(b)
+    if not length_compatible(la, lb, threshold):
+        return False
+    overlap = len(grams[0].intersection(grams[1]))
+    if overlap < min_overlap(la, lb, threshold):
+        return False
+    if 2 * lcs_length(a, b, masks) < threshold * (la + lb) - 1e-6:
+        return False
+    return SequenceMatcher(a=a, b=b).ratio() >= threshold
+
+
+def find_duplicates(
+    titles: List[str], threshold: float = 0.825
+) -> List[Tuple[int, int]]:
+    """Finds all pairs of titles with a SequenceMatcher ratio of at least the
+    threshold.
+
+    Args:
+        titles (List[str]): The titles.
+        threshold (float): The ratio threshold. Default 0.825.
+
+    Returns:
+        List[Tuple[int, int]]: Index pairs (i, j), with i < j, of duplicate
+            titles, in the same order as comparing every pair would give.
+    """
+
+    lengths = [len(t) for t in titles]
+    grams = [set(qgrams(t)) for t in titles]
+    index, unfiltered = build_index(grams, lengths, threshold)
+    masks: List[Optional[Dict[str, int]]] = [None] * len(titles)
+
+    duplicates = []
+    for i, j in sorted(candidate_pairs(index, unfiltered, len(titles))):
+        if masks[i] is None:
+            masks[i] = char_masks(titles[i])
+        pair_grams = (grams[i], grams[j])
+        if is_duplicate(titles[i], titles[j], pair_grams, masks[i], threshold):
+            duplicates.append((i, j))
+    return duplicates
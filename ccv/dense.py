@@ -0,0 +1,536 @@
+"""Dense first-stage retrieval over the indexed CORD-19 abstracts. Running the
+script embeds the title and abstract of every document in the index once and
+saves the embeddings in a dense index that retrieval can memory-map, search
+on cpu and fuse with the BM25 hits.
+
+The dense index is a folder containing:
+    meta.json: The model, max_length and dtype used.
+    docids.npy: The docid of each row of the embeddings.
+    embeddings.npy: The normalized embedding of each document, as float16,
+        or as int8 together with scales.npy holding the scale of each row.
+    centroids.npy, ivf_rows.npy, ivf_offsets.npy: Optionally, an inverted
+        file (IVF) of k-means partitions, the rows of partition p being
+        ivf_rows[ivf_offsets[p] : ivf_offsets[p + 1]].
+
+example usage:
+    python ccv/dense.py \
+        --index "./anserini/indexes/lucene-index-cord19-abstract-2022-02-07" \
+        --output "./data/dense_index" \
+        --device "cuda:0" \
+        --dtype "int8" \
+        --nlist 1024
+"""
+
+
+import argparse
+import json
+from itertools import islice
+from pathlib import Path
+from typing import Any, Generator, Iterable, List, Optional, Tuple
+
+import numpy as np
+import torch
+from pyserini.search.lucene import LuceneSearcher
+from tqdm import tqdm
+from transformers import AutoModel, AutoTokenizer
+
+DTYPES = ["float16", "int8"]
+
+
+def get_args() -> argparse.Namespace:
+    """Returns the given arguments.
+
+    Returns:
+        argparse.Namespace: The arguments.
+    """
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--index", type=str, help="index file path", required=True
+    )
+    parser.add_argument(
+        "--output", type=str, help="dense index folder to create", required=True
+    )
+    parser.add_argument(
+        "--model",
+        type=str,
+        help="embedding model",
+        default="pritamdeka/S-PubMedBert-MS-MARCO",
+    )
+    parser.add_argument(
+        "--device", type=str, help="device to embed on", default="cpu"
+    )
+    parser.add_argument(
+        "--batch_size", type=int, help="batch size when embedding", default=64
+    )
+    parser.add_argument(
+        "--max_length",
+        type=int,
+        help="documents are truncated to this many tokens",
+        default=256,
+    )
+    parser.add_argument(
+        "--dtype",
+        type=str,
+        choices=DTYPES,
+        help="dtype to store the embeddings as",
+        default="float16",
+    )
+    parser.add_argument(
+        "--nlist",
+        type=int,
+        help="if given, number of IVF partitions to build",
+    )
+
+    return parser.parse_args()
+
+
+class DenseEncoder:
+    """Embeds texts as the normalized mean of the token embeddings of a
+    transformer model."""
+
+    def __init__(
+        self,
+        model_name: str = "pritamdeka/S-PubMedBert-MS-MARCO",
+        device: str = "cpu",
+        batch_size: int = 64,
+        max_length: int = 256,
+    ) -> None:
+        """
+        Args:
+            model_name (str): Name of the model. Default
+                "pritamdeka/S-PubMedBert-MS-MARCO".
+            device (str): The device to run the model on. Default "cpu".
+            batch_size (int): Batch size. Default 64.
+            max_length (int): Texts are truncated to this many tokens.
+                Default 256.
+        """
+
+        self.model_name = model_name
+        self.device = device
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name).to(device)
+        self.model.eval()
+        self.dim = self.model.config.hidden_size
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embeds the texts, batching texts of similar length together.
+
+        Args:
+            texts (List[str]): The texts.
+
+        Returns:
+            np.ndarray: The float32 embedding of each text, one per row.
+        """
+
+        inputs = self.tokenizer(
+            texts, truncation=True, max_length=self.max_length
+        )["input_ids"]
+        order = sorted(range(len(inputs)), key=lambda i: len(inputs[i]))
+        embeddings = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start : start + self.batch_size]
+            input = self.tokenizer.pad(
+                {"input_ids": [inputs[i] for i in batch]},
+                padding="longest",
+                return_attention_mask=True,
+                return_tensors="pt",
+            )
+            attention = input["attention_mask"].to(self.device)
+            with torch.no_grad():
+                tokens = self.model(
+                    input["input_ids"].to(self.device),
+                    attention_mask=attention,
+                )[0]
+            mask = attention.unsqueeze(-1).to(tokens.dtype)
+            mean = (tokens * mask).sum(1) / mask.sum(1).clamp(min=1e-9)
+            mean = torch.nn.functional.normalize(mean.float(), dim=1)
+            embeddings[batch] = mean.cpu().numpy()
+        return embeddings
+
+
+def doc_text(raw: str) -> str:
+    """Returns the text of a document to embed.
+
+    Args:
+        raw (str): The raw contents of the document in the index.
+
+    Returns:
+        str: The title and abstract of the document.
+    """
+
+    metadata = json.loads(raw)["csv_metadata"]
+    return f"{metadata['title']} {metadata['abstract']}"
+
+
+def quantize(embeddings: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Quantizes each row to int8 using its own scale.
+
+    Args:
+        embeddings (np.ndarray): The float32 embeddings.
+
+    Returns:
+        np.ndarray: The int8 embeddings.
+        np.ndarray: The scale of each row.
+    """
+
+    scales = np.abs(embeddings).max(axis=1) / 127
+    scales[scales == 0] = 1
+    values = np.rint(embeddings / scales[:, None]).astype(np.int8)
+    return values, scales.astype(np.float32)
+
+
+def kmeans(
+    vectors: np.ndarray, k: int, iterations: int = 10, seed: int = 0
+) -> np.ndarray:
+    """Clusters normalized vectors using spherical k-means.
+
+    Args:
+        vectors (np.ndarray): The float32 vectors, one per row.
+        k (int): Number of clusters.
+        iterations (int): Number of iterations. Default 10.
+        seed (int): Random seed. Default 0.
+
+    Returns:
+        np.ndarray: The normalized centroid of each cluster.
+    """
+
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        centroids = np.zeros_like(centroids)
+        np.add.at(centroids, assign, vectors)
+        empty = np.bincount(assign, minlength=k) == 0
+        # restart empty clusters at random vectors.
+        centroids[empty] = vectors[rng.integers(len(vectors), size=empty.sum())]
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        centroids /= np.maximum(norms, 1e-9)
+    return centroids
+
+
+class DenseIndex:
+    """Memory-mapped document embeddings that can be searched for the
+    documents most similar to a query, by inner product."""
+
+    def __init__(self, path: str, block_size: int = 65536) -> None:
+        """
+        Args:
+            path (str): Path to the dense index folder.
+            block_size (int): Number of rows scored at a time. Default 65536.
+        """
+
+        path = Path(path)
+        with open(path / "meta.json", "r") as f:
+            self.meta = json.load(f)
+        self.docids = np.load(path / "docids.npy", mmap_mode="r")
+        self.embeddings = np.load(path / "embeddings.npy", mmap_mode="r")
+        self.scales = None
+        if self.meta["dtype"] == "int8":
+            self.scales = np.load(path / "scales.npy", mmap_mode="r")
+        self.centroids = None
+        if (path / "centroids.npy").exists():
+            self.centroids = np.load(path / "centroids.npy")
+            self.ivf_rows = np.load(path / "ivf_rows.npy", mmap_mode="r")
+            self.ivf_offsets = np.load(path / "ivf_offsets.npy")
+        self.block_size = block_size
+
+    def __len__(self) -> int:
+        return len(self.docids)
+
+    def vectors(self, rows: Any) -> np.ndarray:
+        """Returns the given rows of the embeddings as float32.
+
+        Args:
+            rows (Any): A slice or an array of row indices.
+
+        Returns:
+            np.ndarray: The embeddings of the rows.
+        """
+
+        vectors = np.asarray(self.embeddings[rows], dtype=np.float32)
+        if self.scales is not None:
+            vectors *= np.asarray(self.scales[rows])[:, None]
+        return vectors
+
+    def search(
+        self, queries: np.ndarray, k: int, nprobe: int = None
+    ) -> List[List[Tuple[str, float]]]:
+        """Finds the k documents with the highest inner product with each
+        query, scanning all rows, or only the rows of the nprobe partitions
+        closest to the query if the index has an IVF.
+
+        Args:
+            queries (np.ndarray): The float32 embedding of each query.
+            k (int): Number of documents to return per query.
+            nprobe (int): Number of IVF partitions to scan, all rows are
+                scanned if None. Default None.
+
+        Returns:
+            List[List[Tuple[str, float]]]: The docids and scores of the top k
+                documents of each query, best first.
+        """
+
+        queries = np.atleast_2d(queries).astype(np.float32)
+        if nprobe and self.centroids is not None:
+            return [self.search_ivf(q, k, nprobe) for q in queries]
+
+        m = len(queries)
+        best_scores = np.full((m, 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((m, 0), dtype=np.int64)
+        for start in range(0, len(self), self.block_size):
+            stop = min(start + self.block_size, len(self))
+            scores = queries @ self.vectors(slice(start, stop)).T
+            rows = np.broadcast_to(np.arange(start, stop), scores.shape)
+            best_scores = np.concatenate([best_scores, scores], axis=1)
+            best_rows = np.concatenate([best_rows, rows], axis=1)
+            if best_scores.shape[1] > k:
+                top = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(best_scores, top, axis=1)
+                best_rows = np.take_along_axis(best_rows, top, axis=1)
+        return [self.ranked(r, s, k) for r, s in zip(best_rows, best_scores)]
+
+    def search_ivf(
+        self, query: np.ndarray, k: int, nprobe: int
+    ) -> List[Tuple[str, float]]:
+        """Finds the k documents with the highest inner product with the
+        query among the rows of the nprobe closest IVF partitions.
+
+        Args:
+            query (np.ndarray): The float32 embedding of the query.
+            k (int): Number of documents to return.
+            nprobe (int): Number of partitions to scan.
+
+        Returns:
+            List[Tuple[str, float]]: The docids and scores of the top k
+                documents, best first.
+        """
+
+        nprobe = min(nprobe, len(self.centroids))
+        probe = np.argpartition(-(self.centroids @ query), nprobe - 1)
+        rows = np.sort(
+            np.concatenate(
+                [
+                    self.ivf_rows[self.ivf_offsets[p] : self.ivf_offsets[p + 1]]
+                    for p in probe[:nprobe]
+                ]
+            )
+        )
+        return self.ranked(rows, self.vectors(rows) @ query, k)
+
+    def ranked(
+        self, rows: np.ndarray, scores: np.ndarray, k: int
+    ) -> List[Tuple[str, float]]:
+        """Returns the k best rows as docids and scores, best first, ties
+        broken by row.
+
+        Args:
+            rows (np.ndarray): The rows.
+            scores (np.ndarray): The score of each row.
+            k (int): Number of rows to return.
+
+        Returns:
+            List[Tuple[str, float]]: The docids and scores.
+        """
+
+        order = np.lexsort((rows, -scores))[:k]
+        return [
+            (self.docids[rows[i]].decode(), float(scores[i])) for i in order
+        ]
+
+
+class DenseHit:
+    """Stands in for the pyserini hit of a document only found by the dense
+    index."""
+
+    def __init__(self, docid: str, score: float, raw: str) -> None:
+        """
+        Args:
+            docid (str): The docid of the document.
+            score (float): The score of the document.
+            raw (str): The raw contents of the document.
+        """
+
+        self.docid = docid
+        self.score = score
+        self.raw = raw
+
+
+def rrf(rankings: List[List[str]], k: int = 60) -> List[str]:
+    """Fuses rankings using reciprocal rank fusion, each document scoring the
+    sum of 1 / (k + rank) over the rankings it appears in.
+
+    Args:
+        rankings (List[List[str]]): The docids of each ranking, best first.
+        k (int): Constant dampening the weight of the top ranks. Default 60.
+
+    Returns:
+        List[str]: The fused ranking, ties broken by first appearance.
+    """
+
+    scores = {}
+    for ranking in rankings:
+        for rank, docid in enumerate(ranking):
+            scores[docid] = scores.get(docid, 0.0) + 1 / (k + rank + 1)
+    return sorted(scores, key=lambda d: -scores[d])
+
+
+def dense_search(
+    searcher: LuceneSearcher,
+    index: DenseIndex,
+    encoder: DenseEncoder,
+    claims: List[str],
+    k: int,
+    bm25_hits: Optional[Iterable[List[Any]]] = None,
+    nprobe: int = None,
+    chunk_size: int = 64,
+) -> Generator[List[Any], None, None]:
+    """Searches the dense index for each of the given claims, fusing the
+    results with the BM25 hits if given.
+
+    Args:
+        searcher (LuceneSearcher): The searcher, used to fetch the documents
+            only found by the dense index.
+        index (DenseIndex): The dense index.
+        encoder (DenseEncoder): The encoder the dense index was built with.
+        claims (List[str]): The claims to search for.
+        k (int): Number of hits to return per claim.
+        bm25_hits (Optional[Iterable[List[Any]]]): The BM25 hits of each
+            claim, in the order of the claims. Default None.
+        nprobe (int): Number of IVF partitions to scan. Default None.
+        chunk_size (int): Number of claims to embed at a time. Default 64.
+
+    Yields:
+        List[Any]: The hits for each claim, in the order of the claims.
+    """
+
+    bm25_hits = iter(bm25_hits) if bm25_hits is not None else None
+    for start in range(0, len(claims), chunk_size):
+        chunk = claims[start : start + chunk_size]
+        dense = index.search(encoder.encode(chunk), k, nprobe)
+        for results in dense:
+            hits = {d: DenseHit(d, s, None) for d, s in results}
+            if bm25_hits is None:
+                ranking = [d for d, _ in results]
+            else:
+                bm25 = list(next(bm25_hits))
+                ranking = rrf([[h.docid for h in bm25], list(hits)])[:k]
+                hits.update((h.docid, h) for h in bm25)
+            for d in ranking:
+                if hits[d].raw is None:
+                    hits[d].raw = searcher.doc(d).raw()
+            yield [hits[d] for d in ranking]
+
+
+def build(
+    index: str,
+    output: str,
+    encoder: DenseEncoder,
+    dtype: str = "float16",
+    nlist: int = None,
+    chunk_size: int = 4096,
+) -> None:
+    """Embeds all documents in the index and saves them as a dense index.
+
+    Args:
+        index (str): Path to the index.
+        output (str): Path to the dense index folder to create.
+        encoder (DenseEncoder): The encoder to use.
+        dtype (str): One of DTYPES. Default "float16".
+        nlist (int): If given, number of IVF partitions to build. Default
+            None.
+        chunk_size (int): Number of documents to embed at a time. Default
+            4096.
+    """
+
+    searcher = LuceneSearcher(index)
+    n = searcher.num_docs
+    output = Path(output)
+    output.mkdir(parents=True, exist_ok=True)
+    embeddings = np.lib.format.open_memmap(
+        output / "embeddings.npy",
+        mode="w+",
+        dtype=dtype,
+        shape=(n, encoder.dim),
+    )
+    scales = np.zeros(n, dtype=np.float32)
+
+    docs = (searcher.doc(i) for i in range(n))
+    docids = []
+    with tqdm(total=n) as progress:
+        for start in range(0, n, chunk_size):
+            chunk = list(islice(docs, chunk_size))
+            docids.extend(d.docid() for d in chunk)
+            vectors = encoder.encode([doc_text(d.raw()) for d in chunk])
+            stop = start + len(chunk)
+            if dtype == "int8":
+                embeddings[start:stop], scales[start:stop] = quantize(vectors)
+            else:
+                embeddings[start:stop] = vectors
+            progress.update(len(chunk))
+    embeddings.flush()
+    del embeddings
+
+    np.save(output / "docids.npy", np.array(docids, dtype=np.bytes_))
+    if dtype == "int8":
+        np.save(output / "scales.npy", scales)
+    with open(output / "meta.json", "w") as f:
+        json.dump(
+            {
+                "model": encoder.model_name,
+                "max_length": encoder.max_length,
+                "dtype": dtype,
+            },
+            f,
+        )
+    if nlist:
+        build_ivf(str(output), nlist)
+
+
+def build_ivf(
+    path: str, nlist: int, sample: int = 100_000, seed: int = 0
+) -> None:
+    """Partitions the rows of a dense index with k-means, trained on a
+    sample of the rows, and saves the partitions as an IVF.
+
+    Args:
+        path (str): Path to the dense index folder.
+        nlist (int): Number of partitions.
+        sample (int): Number of rows to train k-means on. Default 100,000.
+        seed (int): Random seed. Default 0.
+    """
+
+    index = DenseIndex(path)
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(len(index), min(sample, len(index)), False))
+    centroids = kmeans(index.vectors(rows), nlist, seed=seed)
+
+    assign = np.zeros(len(index), dtype=np.int64)
+    for start in range(0, len(index), index.block_size):
+        stop = min(start + index.block_size, len(index))
+        scores = index.vectors(slice(start, stop)) @ centroids.T
+        assign[start:stop] = np.argmax(scores, axis=1)
+
+    path = Path(path)
+    np.save(path / "centroids.npy", centroids)
+    np.save(path / "ivf_rows.npy", np.argsort(assign, kind="stable"))
+    np.save(
+        path / "ivf_offsets.npy",
+        np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=nlist))]),
+    )
+
+
+def main() -> None:
+    """Executes the script."""
+
+    args = get_args()
+    encoder = DenseEncoder(
+        args.model, args.device, args.batch_size, args.max_length
+    )
+    build(args.index, args.output, encoder, args.dtype, args.nlist)
+
+
+if __name__ == "__main__":
+    main()
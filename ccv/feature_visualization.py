@@ -9,7 +9,9 @@ example usage:
         --corpus "./data/predict_corpus.jsonl" \
         --predictions "./data/predict_result.jsonl" \
         --erelations "./data/erelations.jsonl" \
-        --emap "./data/emap.json"
+        --emap "./data/emap.npy" \
+        --metadata_cache "./data/metadata_cache.sqlite" \
+        --workers 4
 """
 
 
@@ -69,12 +71,27 @@ get_features() saved dict structure:
 
 
 import argparse
+from collections import deque
 from graph import create_graph
+import graph_store
 import json
+from multiprocessing import Pool
 import pandas as pd
 from tqdm import tqdm
-from typing import Dict, Any, List
-from utility import get_request
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+import utility
+from metadata_cache import MetadataCache
+from pair_map import PairMap
+from utility import get_request, get_requests, post_request
 
 
 def get_args() -> argparse.Namespace:
@@ -95,50 +112,67 @@ def get_args() -> argparse.Namespace:
     parser.add_argument(
         "--erelations", type=str, help="evidence relations file"
     )
-    parser.add_argument("--emap", type=str, help="evidence map file")
+    parser.add_argument(
+        "--emap", type=str, help="evidence map file, binary (.npy) or JSON"
+    )
+    parser.add_argument(
+        "--metadata_cache",
+        type=str,
+        help="cache file of paper, author and reference information",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="only use the metadata cache, leaving out uncached documents",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="number of processes building graphs",
+        default=1,
+    )
+    parser.add_argument(
+        "--graph_store",
+        type=str,
+        help="graph store folder to look up information in, see graph_store.py",
+    )
 
     return parser.parse_args()
 
 
-def process_paper(corpusid: str) -> Dict[str, Any]:
-    """Retrieves various information related to the document associated with
-    the given corpusid.
+paper_fields = ["citationCount", "influentialCitationCount"]
+author_fields = [
+    "authors.name",
+    "authors.paperCount",
+    "authors.citationCount",
+    "authors.hIndex",
+]
+reference_fields = ["externalIds", "contexts", "intents", "isInfluential"]
+
+
+def parse_paper(res: Dict[str, Any]) -> Dict[str, Any]:
+    """Extracts the paper information from a response of the API.
 
     Args:
-        corpusid (str): The corpusid of a document.
+        res (Dict[str, Any]): The paper as returned by the API.
 
     Returns:
         Dict[str, Any]: Dict containing various information about the document.
     """
 
-    fields = ",".join(["citationCount", "influentialCitationCount"])
-    url = f"https://api.semanticscholar.org/graph/v1/paper/corpusid:{corpusid}?fields={fields}"
-    res = get_request(url)
-    res.pop("paperId")
-    return res
+    return {k: res[k] for k in paper_fields}
 
 
-def process_authors(corpusid: str) -> Dict[str, Any]:
-    """Retrieves various information related to the authors of the paper
-    associated with the given corpusid.
+def parse_authors(res: Dict[str, Any]) -> Dict[str, Any]:
+    """Extracts the author information from a response of the API.
 
     Args:
-        corpusid (str): The corpusid of a document.
+        res (Dict[str, Any]): The paper as returned by the API.
 
     Returns:
         Dict[str, Any]: Dict containing various author related information.
     """
 
-    fields = ",".join(
-        [
-            "authors.name",
-            "authors.paperCount",
-            "authors.citationCount",
-            "authors.hIndex",
-        ]
-    )
-    url = f"https://api.semanticscholar.org/graph/v1/paper/corpusid:{corpusid}?fields={fields}"
-    res = get_request(url)
     authors = res["authors"]
 
     d = dict(zip(authors[0].keys(), zip(*[a.values() for a in authors])))
@@ -155,21 +189,16 @@ def process_authors(corpusid: str) -> Dict[str, Any]:
     return result
 
 
-def process_references(corpusid: str) -> Dict[str, Any]:
-    """Retrieves various information related to the references of the paper
-    associated with the given corpusid.
+def parse_references(res: Dict[str, Any]) -> Dict[str, Any]:
+    """Extracts the reference information from a response of the API.
 
     Args:
-        corpusid (str): The corpusid of a document.
+        res (Dict[str, Any]): The references as returned by the API.
 
     Returns:
         Dict[str, Any]: Dict containing various reference related information.
     """
 
-    fields = ",".join(["externalIds", "contexts", "intents", "isInfluential"])
-    url = f"https://api.semanticscholar.org/graph/v1/paper/corpusid:{corpusid}/references?fields={fields}&limit=1000"
-    res = get_request(url)
-
     d = res["data"]
 
     d = {
@@ -182,9 +211,247 @@ def process_references(corpusid: str) -> Dict[str, Any]:
     return d
 
 
+def process_paper(corpusid: str) -> Dict[str, Any]:
+    """Retrieves various information related to the document associated with
+    the given corpusid.
+
+    Args:
+        corpusid (str): The corpusid of a document.
+
+    Returns:
+        Dict[str, Any]: Dict containing various information about the document.
+    """
+
+    store = graph_store.get_store()
+    if store is not None:
+        pinfo = store.paper(corpusid)
+        if pinfo is not None:
+            return pinfo
+    fields = ",".join(paper_fields)
+    url = f"{utility.api_url}/paper/corpusid:{corpusid}?fields={fields}"
+    return parse_paper(get_request(url))
+
+
+def process_authors(corpusid: str) -> Dict[str, Any]:
+    """Retrieves various information related to the authors of the paper
+    associated with the given corpusid.
+
+    Args:
+        corpusid (str): The corpusid of a document.
+
+    Returns:
+        Dict[str, Any]: Dict containing various author related information.
+    """
+
+    store = graph_store.get_store()
+    if store is not None:
+        ainfo = store.authors_of(corpusid)
+        if ainfo is not None:
+            return ainfo
+    fields = ",".join(author_fields)
+    url = f"{utility.api_url}/paper/corpusid:{corpusid}?fields={fields}"
+    return parse_authors(get_request(url))
+
+
+def process_references(corpusid: str) -> Dict[str, Any]:
+    """Retrieves various information related to the references of the paper
+    associated with the given corpusid.
+
+    Args:
+        corpusid (str): The corpusid of a document.
+
+    Returns:
+        Dict[str, Any]: Dict containing various reference related information.
+    """
+
+    store = graph_store.get_store()
+    if store is not None:
+        rinfo = store.references(corpusid)
+        if rinfo is not None:
+            return rinfo
+    return parse_references(get_request(references_url(corpusid)))
+
+
+def references_url(corpusid: str) -> str:
+    """Returns the URL of the references of the given document.
+
+    Args:
+        corpusid (str): The corpusid of a document.
+
+    Returns:
+        str: The URL.
+    """
+
+    fields = ",".join(reference_fields)
+    url = f"{utility.api_url}/paper/corpusid:{corpusid}/references"
+    return url + f"?fields={fields}&limit=1000"
+
+
+def process_papers(
+    corpusids: List[str], lookup_store: bool = True
+) -> Dict[str, Dict[str, Any]]:
+    """Retrieves the paper and author information of all the given documents
+    together, looking them up in the graph store if there is one, and using
+    as few requests to the paper batch endpoint as possible for the rest.
+    Documents the batch endpoint does not return are retrieved on their own.
+
+    Args:
+        corpusids (List[str]): The corpusids of the documents.
+        lookup_store (bool): Whether to look the documents up in the graph
+            store, False if the caller already did. Default True.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: The "pinfo" and "ainfo" of each document.
+    """
+
+    corpusids = list(dict.fromkeys(corpusids))
+    fields = ",".join(paper_fields + author_fields)
+    url = f"{utility.api_url}/paper/batch?fields={fields}"
+    result = {}
+    store = graph_store.get_store() if lookup_store else None
+    if store is not None:
+        for corpusid in corpusids:
+            pinfo = store.paper(corpusid)
+            if pinfo is not None:
+                ainfo = store.authors_of(corpusid)
+                result[corpusid] = {"pinfo": pinfo, "ainfo": ainfo}
+        corpusids = [c for c in corpusids if c not in result]
+    for i in range(0, len(corpusids), utility.batch_limit):
+        chunk = corpusids[i : i + utility.batch_limit]
+        r = post_request(url, {"ids": [f"corpusid:{c}" for c in chunk]})
+        if not isinstance(r, list):
+            continue
+        for corpusid, paper in zip(chunk, r):
+            if paper:
+                result[corpusid] = {
+                    "pinfo": parse_paper(paper),
+                    "ainfo": parse_authors(paper),
+                }
+    # The rest is not in the store, so is requested from the API directly.
+    for corpusid in corpusids:
+        if corpusid not in result:
+            paper = get_request(
+                f"{utility.api_url}/paper/corpusid:{corpusid}?fields={fields}"
+            )
+            result[corpusid] = {
+                "pinfo": parse_paper(paper),
+                "ainfo": parse_authors(paper),
+            }
+    return result
+
+
+def store_metadata(result: Dict[str, Dict[str, Any]], kinds: List[str]) -> None:
+    """Fills in the information of the documents found in the graph store, if
+    there is one.
+
+    Args:
+        result (Dict[str, Dict[str, Any]]): The information of each document
+            found so far, filled in place.
+        kinds (List[str]): The kinds of information to look up.
+    """
+
+    store = graph_store.get_store()
+    if store is None:
+        return
+    for c, info in result.items():
+        for kind in kinds:
+            value = store.get(c, kind)
+            if value is not None:
+                info[kind] = value
+
+
+def cached_metadata(
+    result: Dict[str, Dict[str, Any]], kinds: List[str], cache: MetadataCache
+) -> None:
+    """Fills in the information of the documents still missing that is fresh
+    in the cache.
+
+    Args:
+        result (Dict[str, Dict[str, Any]]): The information of each document
+            found so far, filled in place.
+        kinds (List[str]): The kinds of information to look up.
+        cache (MetadataCache): Cache of fetched information.
+    """
+
+    for c, info in result.items():
+        for kind in kinds:
+            if kind in info:
+                continue
+            value = cache.get(c, kind)
+            if value is not None:
+                info[kind] = value
+
+
+def fetch_metadata(
+    result: Dict[str, Dict[str, Any]], cache: MetadataCache = None
+) -> None:
+    """Fetches the information of the documents still missing from the API,
+    storing it in the cache, even if fetching or parsing fails part way.
+    Each document is fetched once, the references of all documents
+    concurrently.
+
+    Args:
+        result (Dict[str, Dict[str, Any]]): The information of each document
+            found so far, filled in place.
+        cache (MetadataCache): Cache of fetched information. Default None.
+    """
+
+    fetched = []
+    try:
+        missing = [
+            c for c, v in result.items() if "pinfo" not in v or "ainfo" not in v
+        ]
+        # The graph store was looked up already.
+        papers = process_papers(missing, lookup_store=False)
+        for c, info in papers.items():
+            for kind in ["pinfo", "ainfo"]:
+                if kind not in result[c]:
+                    result[c][kind] = info[kind]
+                    fetched.append((c, kind, info[kind]))
+        missing = [c for c, v in result.items() if "rinfo" not in v]
+        urls = [references_url(c) for c in missing]
+        responses = get_requests(urls) if urls else []
+        for c, res in zip(missing, responses):
+            result[c]["rinfo"] = parse_references(res)
+            fetched.append((c, "rinfo", result[c]["rinfo"]))
+    finally:
+        # What was fetched before a failure is kept.
+        if cache is not None:
+            cache.put_many(fetched)
+
+
+def get_metadata(
+    corpusids: List[str], cache: MetadataCache = None
+) -> Dict[str, Dict[str, Any]]:
+    """Returns the paper, author and reference information of the given
+    documents, taken from the graph store if there is one, from the cache
+    where fresh, and fetched otherwise. In offline mode nothing is fetched,
+    and documents not fully in the store or cache are left out.
+
+    Args:
+        corpusids (List[str]): The corpusids of the documents.
+        cache (MetadataCache): Cache of fetched information. Default None.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: The "pinfo", "ainfo" and "rinfo" of each
+            document.
+    """
+
+    kinds = ["pinfo", "ainfo", "rinfo"]
+    result = {c: {} for c in dict.fromkeys(corpusids)}
+    store_metadata(result, kinds)
+    if cache is not None:
+        cached_metadata(result, kinds, cache)
+        if cache.offline:
+            return {c: v for c, v in result.items() if len(v) == len(kinds)}
+    fetch_metadata(result, cache)
+    return result
+
+
 def get_ref_links(dinfo: Dict[str, Any]) -> Dict[str, Any]:
     """Looks for reference links between documents identified as evidence to a
-    claim.
+    claim. The corpusid and aliases of each document are indexed, so that
+    each reference is only looked up once.
 
     Args:
         dinfo (Dict[str, Any]): Dictionary containing various claim related
@@ -196,33 +463,38 @@ def get_ref_links(dinfo: Dict[str, Any]) -> Dict[str, Any]:
             reference.
     """
 
-    d = {}
+    # Maps each corpusid and alias to the positions of the documents it
+    # identifies.
+    index = {}
     docs = list(dinfo.keys())
+    for i, d2 in enumerate(docs):
+        for id in dinfo[d2]["aliases"] + [d2]:
+            positions = index.setdefault(id, [])
+            if not positions or positions[-1] != i:
+                positions.append(i)
+
+    d = {}
     for d1 in docs:
-        for d2 in docs:
-            references = dinfo[d1]["rinfo"].keys()
-            ids = dinfo[d2]["aliases"].copy()
-            ids.append(d2)
-            for id in ids:
-                if id in references:
-                    if not d.get(d1, None):
-                        d[d1] = []
-                    d[d1].append(
-                        {
-                            "reference": d2,
-                            "isInfluential": dinfo[d1]["rinfo"][d2][
-                                "isInfluential"
-                            ],
-                            "intent": dinfo[d1]["rinfo"][d2]["intents"],
-                        }
-                    )
-                    break
+        rinfo = dinfo[d1]["rinfo"]
+        found = set()
+        for id in rinfo:
+            found.update(index.get(id, ()))
+        for j in sorted(found):
+            d2 = docs[j]
+            d.setdefault(d1, []).append(
+                {
+                    "reference": d2,
+                    "isInfluential": rinfo[d2]["isInfluential"],
+                    "intent": rinfo[d2]["intents"],
+                }
+            )
     return d
 
 
 def get_aut_links(dinfo: Dict[str, Any]) -> Dict[str, Any]:
     """Looks for common authors between documents identified as evidence to a
-    claim.
+    claim. Each document is linked to the last document after it with a
+    common author, found using the last position each author appears at.
 
     Args:
         dinfo (Dict[str, Any]): Dictionary containing various claim related
@@ -233,118 +505,412 @@ def get_aut_links(dinfo: Dict[str, Any]) -> Dict[str, Any]:
             have common authors.
     """
 
-    d = {}
     docs = list(dinfo.keys())
-    for i in range(len(docs)):
-        for j in range(i + 1, len(docs)):
-            d1, d2 = docs[i], docs[j]
-            a1 = set(dinfo[d1]["ainfo"]["authors"].keys())
-            a2 = set(dinfo[d2]["ainfo"]["authors"].keys())
-            common = a1.intersection(a2)
-            if common:
-                d[d1] = {"doc": d2, "common": list(common)}
+    authors = [set(dinfo[doc]["ainfo"]["authors"].keys()) for doc in docs]
+    last = {}
+    for j, a in enumerate(authors):
+        for author in a:
+            last[author] = j
+
+    d = {}
+    for i, a1 in enumerate(authors):
+        j = max((last[author] for author in a1), default=i)
+        if j > i:
+            common = a1.intersection(authors[j])
+            d[docs[i]] = {"doc": docs[j], "common": list(common)}
     return d
 
 
-def get_evi_links(
-    evidence_relations: pd.DataFrame, emap: Dict[str, Any]
-) -> Dict[str, List[Dict[str, Any]]]:
-    """Loads the evidence stances from the given datastructures.
+def get_evi_link(
+    evidence: Dict[str, Any], link: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Adds the stance predicted between two evidence sentences to the
+    information about the pair.
 
     Args:
-        evidence_relations (pd.DataFrame): Result from longchecker
-            ran on the output from stance_evidence.py
-        emap (Dict[str, Any]): Mapping claim ids from output of
-            stance_evidence.py to various information.
+        evidence (Dict[str, Any]): Evidence predicted by longchecker for the
+            pair, as found in the output from longchecker ran on the output
+            from stance_evidence.py.
+        link (Dict[str, Any]): Information about the pair, as found in the
+            map output from stance_evidence.py.
 
     Returns:
-        Dict[str, List[Dict[str, Any]]]: Dictionary where a key is a claim_id
-            and its value is a list of evidence links for that claim.
+        Dict[str, Any]: The evidence link, without the claim_id.
     """
 
-    evi_links = {}
-    for _, er in evidence_relations.iterrows():
-        evidence = er["evidence"]
+    k = list(evidence.keys())[0]
+    d = link
+    d["label"] = evidence[k]["label"]
+    d["label_prob"] = evidence[k]["label_probs"][
+        0 if d["label"] == "CONTRADICT" else 2
+    ]
+    d["sent_prob"] = evidence[k]["sentences_probs"][0]
+    d.pop("claim_id")
+    return d
+
+
+def mirror_evi_link(link: Dict[str, Any]) -> Dict[str, Any]:
+    """Returns the evidence link in the other direction, with the same stance.
+
+    Args:
+        link (Dict[str, Any]): The evidence link.
+
+    Returns:
+        Dict[str, Any]: The mirrored evidence link.
+    """
+
+    d = dict(link)
+    d["fdoc_id"], d["sdoc_id"] = link["sdoc_id"], link["fdoc_id"]
+    d["fdoc_e_num"], d["sdoc_e_num"] = link["sdoc_e_num"], link["fdoc_e_num"]
+    return d
+
+
+def iter_evi_links(
+    erelations: str, emap: str
+) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+    """Reads the evidence stances from the given files one claim at a time.
+    The relations are read incrementally and joined on the id of the pair
+    with the map. A binary map is looked up on disk, a JSON map is read whole,
+    so large maps are best converted with pair_map.py first. Pairs whose
+    stance was predicted in one direction only are mirrored.
+
+    Args:
+        erelations (str): Result from longchecker ran on the output from
+            stance_evidence.py.
+        emap (str): Map output from stance_evidence.py, mapping the ids of
+            evidence pairs to various information, either binary (.npy) or
+            JSON.
+
+    Returns:
+        Iterator[Tuple[int, List[Dict[str, Any]]]]: The claim_id and evidence
+            links of each claim with pairs, see group_evi_links.
+    """
+
+    if emap.endswith(".npy"):
+        # Pairs are looked up directly by their id in a binary map.
+        get_link = PairMap(emap).link
+    else:
+        with open(emap, "r") as f:
+            pairs = json.load(f)
+
+        def get_link(id: int) -> Dict[str, Any]:
+            return pairs[str(id)]
+
+    with open(erelations, "r") as f:
+        yield from group_evi_links(
+            (er["evidence"], get_link(er["id"]))
+            for er in map(json.loads, f)
+        )
+
+
+def group_evi_links(
+    stances: Iterable[Tuple[Dict[str, Any], Dict[str, Any]]]
+) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+    """Groups the stances of consecutive evidence pairs of the same claim into
+    the evidence links of the claim. Pairs whose stance was predicted in one
+    direction only are mirrored.
+
+    Args:
+        stances (Iterable[Tuple[Dict[str, Any], Dict[str, Any]]]): The
+            evidence predicted by longchecker for each pair and the
+            information about the pair, as found in the map output from
+            stance_evidence.py, in the order of the pairs.
+
+    Returns:
+        Iterator[Tuple[int, List[Dict[str, Any]]]]: The claim_id and evidence
+            links of each claim with pairs, no links if no pair has a stance.
+    """
+
+    claim_id, claim_links = None, None
+    for evidence, link in stances:
+        if link["claim_id"] != claim_id:
+            if claim_links is not None:
+                yield claim_id, claim_links
+            claim_id, claim_links = link["claim_id"], []
         if not evidence:
             continue
-        k = list(evidence.keys())[0]
-        d = emap[str(er["id"])]
-        d["label"] = evidence[k]["label"]
-        d["label_prob"] = evidence[k]["label_probs"][
-            0 if d["label"] == "CONTRADICT" else 2
-        ]
-        d["sent_prob"] = evidence[k]["sentences_probs"][0]
-        id = d.pop("claim_id")
-        if id not in evi_links:
-            evi_links[id] = []
-        evi_links[id].append(d)
-    return evi_links
+        link = dict(link)
+        mirror = link.pop("mirror", False)
+        claim_links.append(get_evi_link(evidence, link))
+        if mirror:  # The stance of the pair was predicted once.
+            claim_links.append(mirror_evi_link(claim_links[-1]))
+    if claim_links is not None:
+        yield claim_id, claim_links
+
+
+class EviLinks:
+    """Looks up the evidence links of claims in increasing order of their id,
+    as their graphs are built, reading them from iter_evi_links or
+    group_evi_links as they are needed. Every claim with pairs is read, even
+    if none has a stance, so looking up a claim reads no further than the
+    claim, except for a claim without pairs, which reads the links of the
+    next claim with pairs ahead."""
+
+    def __init__(
+        self, links: Iterator[Tuple[int, List[Dict[str, Any]]]]
+    ) -> None:
+        """
+        Args:
+            links (Iterator[Tuple[int, List[Dict[str, Any]]]]): The evidence
+                links of each claim, in increasing order of the claims.
+        """
+
+        self.links = links
+        self.pending = {}  # links of claims read before they are needed.
+
+    def get(self, claim_id: int) -> Union[List[Dict[str, Any]], Dict]:
+        """Returns the evidence links of the given claim.
+
+        Args:
+            claim_id (int): The claim.
+
+        Returns:
+            Union[List[Dict[str, Any]], Dict]: The evidence links of the
+                claim, {} if it has none.
+        """
+
+        # Claims are written in increasing order of their id, so once a later
+        # claim is read the given claim has no more links to come.
+        if max(self.pending, default=claim_id - 1) < claim_id:
+            for id, links in self.links:
+                self.pending.setdefault(id, []).extend(links)
+                if id >= claim_id:
+                    break
+        links = self.pending.pop(claim_id, None) or {}
+        # Links of skipped claims are no longer needed.
+        for id in [id for id in self.pending if id < claim_id]:
+            del self.pending[id]
+        return links
+
 
+def build_graph(info: Dict[str, Any]) -> str:
+    """Finds the links between the evidence documents of a claim and builds
+    its graph. Run in the worker processes of get_features.
 
-def get_features(args: argparse.Namespace) -> None:
+    Args:
+        info (Dict[str, Any]): The claim, its evidence documents and evidence
+            links, as collected by get_features.
+
+    Returns:
+        str: The graph of the claim, as JSON.
+    """
+
+    info["alinks"] = get_aut_links(info["docs"])
+    info["rlinks"] = get_ref_links(info["docs"])
+    return json.dumps(create_graph(info))
+
+
+def doc_features(
+    evidence: Dict[str, Any], doc: pd.Series, metadata: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Collects the features of an evidence document of a claim.
+
+    Args:
+        evidence (Dict[str, Any]): The prediction of longchecker for the
+            document.
+        doc (pd.Series): The document, as found in the corpus.
+        metadata (Dict[str, Any]): The paper, author and reference
+            information of the document, from get_metadata.
+
+    Returns:
+        Dict[str, Any]: The features of the document.
+    """
+
+    d = {}
+    d["label"] = evidence["label"]
+    d["label_prob"] = evidence["label_probs"][
+        0 if evidence["label"] == "CONTRADICT" else 2
+    ]
+    d["title"] = doc["title"]
+    d["evidence"] = [
+        {
+            "text": doc["abstract"][s],
+            "prob": evidence["sentences_probs"][s],
+        }
+        for s in evidence["sentences"]
+    ]
+    d["aliases"] = doc["aliases"]
+    d["pinfo"] = metadata["pinfo"]
+    d["ainfo"] = metadata["ainfo"]
+    d["rinfo"] = metadata["rinfo"]
+    try:
+        d["publish_time"] = doc["publish_time"].strftime("%Y-%m-%d")
+    except ValueError:
+        d["publish_time"] = None
+    d["journal"] = doc["journal"]
+    return d
+
+
+def claim_features(
+    claim: str,
+    claim_id: int,
+    evidence_dict: Dict[str, Any],
+    corpus: pd.DataFrame,
+    metadata: Dict[str, Dict[str, Any]],
+) -> Tuple[Dict[str, Any], int]:
+    """Collects the claim and the features of its evidence documents, leaving
+    out the documents without metadata.
+
+    Args:
+        claim (str): The claim.
+        claim_id (int): The id of the claim.
+        evidence_dict (Dict[str, Any]): The prediction of longchecker for
+            each evidence document of the claim.
+        corpus (pd.DataFrame): The corpus, indexed by doc_id.
+        metadata (Dict[str, Dict[str, Any]]): The metadata of each document,
+            from get_metadata.
+
+    Returns:
+        Tuple[Dict[str, Any], int]: The claim and its documents, and the
+            number of documents left out.
+    """
+
+    info = {"claim": claim, "claim_id": claim_id, "docs": {}}
+    nleftout = 0
+    for doc_id, evidence in evidence_dict.items():
+        if doc_id not in metadata:
+            nleftout += 1
+            continue
+        doc = corpus.loc[int(doc_id)]
+        info["docs"][doc_id] = doc_features(evidence, doc, metadata[doc_id])
+    return info, nleftout
+
+
+def open_cache(args: argparse.Namespace) -> Optional[MetadataCache]:
+    """Opens the metadata cache, if one was given.
+
+    Args:
+        args (argparse.Namespace): The provided arguments.
+
+    Raises:
+        ValueError: If offline without a metadata cache.
+
+    Returns:
+        Optional[MetadataCache]: The metadata cache, None if there is none.
+    """
+
+    if args.offline and not args.metadata_cache:
+        raise ValueError("Offline mode requires a metadata cache!")
+    if not args.metadata_cache:
+        return None
+    return MetadataCache(args.metadata_cache, offline=args.offline)
+
+
+def load_evi_links(
+    args: argparse.Namespace,
+    stances: Optional[Iterable[Tuple[Dict[str, Any], Dict[str, Any]]]],
+) -> Optional[EviLinks]:
+    """Opens the evidence links of the claims, if any were given.
+
+    Args:
+        args (argparse.Namespace): The provided arguments.
+        stances (Optional[Iterable[Tuple[Dict[str, Any], Dict[str, Any]]]]):
+            The stances between evidences, see get_features.
+
+    Returns:
+        Optional[EviLinks]: The evidence links, None if there are none.
+    """
+
+    if stances is not None:
+        return EviLinks(group_evi_links(stances))
+    if not (args.erelations and args.emap):
+        return None
+    return EviLinks(iter_evi_links(args.erelations, args.emap))
+
+
+def write_graphs(
+    infos: Iterable[Dict[str, Any]], output: str, workers: int, total: int
+) -> None:
+    """Builds the graph of each claim and writes them in the order of the
+    claims.
+
+    Args:
+        infos (Iterable[Dict[str, Any]]): The information of each claim, as
+            taken by build_graph.
+        output (str): The output file.
+        workers (int): Number of processes building graphs.
+        total (int): Number of claims, for the progress bar.
+    """
+
+    with open(output, "w") as f:
+        if workers > 1:
+            # Graphs are built in the order of the claims, with a bounded
+            # number of claims waiting to be built or written at a time.
+            with Pool(workers) as pool:
+                pending = deque()
+                for info in tqdm(infos, total=total):
+                    pending.append(pool.apply_async(build_graph, (info,)))
+                    if len(pending) >= 4 * workers:
+                        f.write(pending.popleft().get() + "\n")
+                while pending:
+                    f.write(pending.popleft().get() + "\n")
+        else:
+            for info in tqdm(infos, total=total):
+                f.write(build_graph(info) + "\n")
+
+
+def get_features(
+    args: argparse.Namespace,
+    stances: Optional[Iterable[Tuple[Dict[str, Any], Dict[str, Any]]]] = None,
+) -> None:
     """Extracts features used for visualization.
 
     Args:
         args (argparse.Namespace): The provided arguments.
+        stances (Optional[Iterable[Tuple[Dict[str, Any], Dict[str, Any]]]]):
+            The stances between evidences, as taken by group_evi_links, to
+            use instead of reading them from args.erelations and args.emap.
+            Default None.
     """
 
+    cache = open_cache(args)
     claims = pd.read_json(args.claims, lines=True).set_index("id")
     corpus = pd.read_json(args.corpus, lines=True).set_index("doc_id")
     predictions = pd.read_json(args.predictions, lines=True).set_index("id")
 
-    if args.erelations and args.emap:
-        evidence_relations = pd.read_json(args.erelations, lines=True)
-        with open(args.emap, "r") as f:
-            emap = json.load(f)
+    if args.graph_store:
+        graph_store.configure(args.graph_store)
+    evi_links = load_evi_links(args, stances)
 
-    evi_links = get_evi_links(evidence_relations, emap)
+    # Documents are often evidence for several claims, fetch each only once.
+    evidence_dicts = [e for e in predictions.iloc[:, 0] if e]
+    metadata = get_metadata([d for e in evidence_dicts for d in e], cache)
+    nleftout = 0  # number of documents left out, not in the cache.
 
-    with open(args.output, "w") as f:
-        for index, row in tqdm(
-            predictions.iterrows(), total=predictions.shape[0]
-        ):
-            evidence_dict = row.iloc[0]
-            if not evidence_dict:  # Did not find any evidence for claim.
-                continue
+    def infos() -> Iterator[Dict[str, Any]]:
+        """Collects the claim, evidence documents and evidence links of each
+        claim with evidence, which is all build_graph needs."""
 
-            info = {}
-            info["claim"] = claims.loc[index][0]
-            info["claim_id"] = index
-            info["docs"] = {}
-            for doc_id, evidence in evidence_dict.items():
-                doc = corpus.loc[int(doc_id)]
-
-                d = {}
-                d["label"] = evidence["label"]
-                d["label_prob"] = evidence["label_probs"][
-                    0 if evidence["label"] == "CONTRADICT" else 2
-                ]
-                d["title"] = doc["title"]
-                d["evidence"] = [
-                    {
-                        "text": doc["abstract"][s],
-                        "prob": evidence["sentences_probs"][s],
-                    }
-                    for s in evidence["sentences"]
-                ]
-                d["aliases"] = doc["aliases"]
-                d["pinfo"] = process_paper(doc_id)
-                d["ainfo"] = process_authors(doc_id)
-                d["rinfo"] = process_references(doc_id)
-                try:
-                    d["publish_time"] = doc["publish_time"].strftime("%Y-%m-%d")
-                except ValueError:
-                    d["publish_time"] = None
-                d["journal"] = doc["journal"]
-
-                info["docs"][doc_id] = d
-            info["alinks"] = get_aut_links(info["docs"])
-            info["rlinks"] = get_ref_links(info["docs"])
-            if args.erelations and args.emap:
-                info["elinks"] = evi_links.get(info["claim_id"], {})
-
-            graph = create_graph(info)
-            f.write(json.dumps(graph) + "\n")
+        nonlocal nleftout
+        for index, row in predictions.iterrows():
+            if not row.iloc[0]:  # Did not find any evidence for claim.
+                continue
+            info, n = claim_features(
+                claims.loc[index].iloc[0], index, row.iloc[0], corpus, metadata
+            )
+            nleftout += n
+            if not info["docs"]:
+                continue
+            if evi_links is not None:
+                info["elinks"] = evi_links.get(index)
+                if n:  # Links of documents left out would have no nodes.
+                    info["elinks"] = [
+                        link
+                        for link in info["elinks"]
+                        if link["fdoc_id"] in info["docs"]
+                        and link["sdoc_id"] in info["docs"]
+                    ]
+            yield info
+
+    write_graphs(infos(), args.output, args.workers, predictions.shape[0])
+
+    print("Number of Semantic Scholar API requests:", utility.request_count())
+    if cache is not None:
+        print("Metadata cache:")
+        print(cache.summary())
+        cache.close()
+    if args.offline:
+        print("Number of documents left out, not in cache:", nleftout)
 
 
 def main():
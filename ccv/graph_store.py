@@ -0,0 +1,813 @@
+"""Local store of the Semantic Scholar academic graph, built from the bulk
+dataset files (JSONL shards, optionally gzipped) of the papers, authors,
+citations and paper-ids datasets. Running the script ingests the given shards
+into columnar tables, after which the paper, author and reference information
+of documents and the corpusids of papers are looked up in the store instead
+of requesting them from the API. Documents and ids not in the store are still
+requested from the API.
+
+The tables are written a chunk of rows at a time, each chunk sorted and the
+sorted chunks merged on disk, so that ingesting holds only a chunk of a
+dataset in memory.
+
+The store is a folder containing:
+    papers/: corpusid.npy (sorted), citation_count.npy, influential_count.npy,
+        author_starts.npy, author_ends.npy: The papers, and the range of
+        author slots of each.
+    slots/: author_id.npy (-1 if unknown), name_offsets.npy, names.bin: The
+        author slots of all papers and the name each paper gives the author.
+    authors/: author_id.npy (sorted), paper_count.npy, citation_count.npy,
+        h_index.npy: The authors.
+    citations/: citing.npy (sorted), cited.npy, influential.npy, intents.npy,
+        context_starts.npy, context_ends.npy, context_offsets.npy,
+        contexts.bin: The citations, with the intents as bit mask of INTENTS.
+    ids/: {type}_keys.npy (sorted), {type}_corpusid.npy: The corpusid of each
+        id of the types of utility.type_map.
+    datasets.json: The datasets ingested.
+
+example usage:
+    python ccv/graph_store.py \
+        --papers ./data/s2/papers/*.jsonl.gz \
+        --authors ./data/s2/authors/*.jsonl.gz \
+        --citations ./data/s2/citations/*.jsonl.gz \
+        --paper_ids ./data/s2/paper-ids/*.jsonl.gz \
+        --output "./data/graph_store"
+"""
+
+
+import argparse
+import gzip
+import json
+import mmap
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from tqdm import tqdm
+
+# Types of ids of utility.type_map and the external id of papers they are.
+EXTERNAL_IDS = {
+    "doi": "DOI",
+    "arxiv": "ArXiv",
+    "mag": "MAG",
+    "acl": "ACL",
+    "pubmed": "PubMed",
+    "pmc": "PubMedCentral",
+}
+INTENTS = ["background", "methodology", "result"]
+# Number of rows of a table held in memory while ingesting it.
+CHUNK_ROWS = 1 << 20
+
+
+def get_args() -> argparse.Namespace:
+    """Returns the given arguments.
+
+    Returns:
+        argparse.Namespace: The arguments.
+    """
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--papers", type=str, nargs="*", help="papers dataset shards"
+    )
+    parser.add_argument(
+        "--authors", type=str, nargs="*", help="authors dataset shards"
+    )
+    parser.add_argument(
+        "--citations", type=str, nargs="*", help="citations dataset shards"
+    )
+    parser.add_argument(
+        "--paper_ids", type=str, nargs="*", help="paper-ids dataset shards"
+    )
+    parser.add_argument(
+        "--output", type=str, help="store folder to create", required=True
+    )
+
+    return parser.parse_args()
+
+
+def store_key(id: str, type: str) -> str:
+    """Returns the key of an id of the given type in the store, the id the
+    way utility.format_id formats it, without the prefix of its type.
+
+    Args:
+        id (str): The id of the paper.
+        type (str): The type of id.
+
+    Returns:
+        str: The key.
+    """
+
+    id = str(id)
+    if type == "pmc" and id.upper().startswith("PMC"):
+        id = id[3:]
+    if type in ["doi", "s2"]:
+        id = id.lower()
+    return id
+
+
+def read_shards(files: List[str]) -> Iterator[Dict[str, Any]]:
+    """Reads the records of the given dataset shards.
+
+    Args:
+        files (List[str]): Paths to the shards, gzipped if ending in ".gz".
+
+    Returns:
+        Iterator[Dict[str, Any]]: The records.
+    """
+
+    for file in tqdm(files or []):
+        opener = gzip.open if file.endswith(".gz") else open
+        with opener(file, "rt") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def merge_runs(
+    runs: List[Dict[str, np.ndarray]], key: str, block: int
+) -> Iterator[Dict[str, np.ndarray]]:
+    """Merges runs of rows sorted by the key column, reading a block of rows of
+    each run at a time. Rows with equal keys keep the order of their runs.
+
+    Args:
+        runs (List[Dict[str, np.ndarray]]): The columns of each run.
+        key (str): Name of the key column.
+        block (int): Number of rows of each run read at a time.
+
+    Returns:
+        Iterator[Dict[str, np.ndarray]]: The columns of consecutive pieces of
+            the merged rows.
+    """
+
+    positions = [0] * len(runs)
+    while True:
+        live = [i for i, run in enumerate(runs) if positions[i] < len(run[key])]
+        if not live:
+            return
+        windows = {
+            i: runs[i][key][positions[i] : positions[i] + block] for i in live
+        }
+        # Rows up to the smallest last key of a window not reaching the end of
+        # its run are merged, ties broken by the order of the runs, as later
+        # rows of that run may have the same key.
+        bounds = [
+            (windows[i][-1], i)
+            for i in live
+            if positions[i] + block < len(runs[i][key])
+        ]
+        ends = {i: positions[i] + len(windows[i]) for i in live}
+        if bounds:
+            bound, last = min(bounds)
+            for i in live:
+                side = "right" if i <= last else "left"
+                ends[i] = positions[i] + int(
+                    np.searchsorted(windows[i], bound, side=side)
+                )
+        piece = {
+            name: np.concatenate(
+                [runs[i][name][positions[i] : ends[i]] for i in live]
+            )
+            for name in runs[0]
+        }
+        order = np.argsort(piece[key], kind="stable")
+        yield {name: column[order] for name, column in piece.items()}
+        for i in live:
+            positions[i] = ends[i]
+
+
+class TableWriter:
+    """Writes the columns of a table a chunk of rows at a time. Each chunk is
+    sorted by the key column and saved as a run, and the runs are merged into
+    the columns on disk, so only a chunk of the table is held in memory."""
+
+    def __init__(
+        self,
+        folder: Path,
+        columns: Dict[str, Any],
+        key: Optional[str] = None,
+        chunk_rows: Optional[int] = None,
+    ) -> None:
+        """
+        Args:
+            folder (Path): The folder of the table, created if it does not
+                exist.
+            columns (Dict[str, Any]): The dtype of each column, np.bytes_ for
+                strings of bytes.
+            key (Optional[str]): Name of the key column, None to keep the
+                order of the rows. Default None.
+            chunk_rows (Optional[int]): Number of rows held in memory,
+                CHUNK_ROWS if None. Default None.
+        """
+
+        folder.mkdir(parents=True, exist_ok=True)
+        self.folder = folder
+        self.dtypes = {name: np.dtype(dtype) for name, dtype in columns.items()}
+        self.key = key
+        self.chunk_rows = chunk_rows or CHUNK_ROWS
+        self.chunk = {name: [] for name in columns}
+        self.chunked = 0  # number of rows held in memory.
+        self.runs = Path(tempfile.mkdtemp(prefix="runs", dir=folder))
+        self.nruns = 0
+        self.nrows = 0
+
+    def add(self, *row: Any) -> None:
+        """Adds a row.
+
+        Args:
+            *row (Any): The value of each column, in the order of the columns.
+        """
+
+        for values, value in zip(self.chunk.values(), row):
+            values.append(value)
+        self.chunked += 1
+        self.nrows += 1
+        if self.chunked >= self.chunk_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        """Saves the rows held in memory as a run."""
+
+        if not self.chunked:
+            return
+        columns = {
+            name: np.array(values, dtype=self.dtypes[name])
+            for name, values in self.chunk.items()
+        }
+        if self.key is not None:
+            order = np.argsort(columns[self.key], kind="stable")
+            columns = {name: c[order] for name, c in columns.items()}
+        for name, column in columns.items():
+            np.save(self.runs / f"{self.nruns}_{name}.npy", column)
+            self.chunk[name] = []
+        self.chunked = 0
+        self.nruns += 1
+
+    def close(self) -> None:
+        """Merges the runs into the columns of the table."""
+
+        self.flush()
+        runs = [
+            {
+                name: np.load(self.runs / f"{i}_{name}.npy", mmap_mode="r")
+                for name in self.dtypes
+            }
+            for i in range(self.nruns)
+        ]
+        outputs = {}
+        for name, dtype in self.dtypes.items():
+            if dtype.kind == "S":  # As wide as the widest string.
+                width = max((r[name].dtype.itemsize for r in runs), default=1)
+                dtype = np.dtype((np.bytes_, width))
+            if not self.nrows:
+                np.save(self.folder / f"{name}.npy", np.zeros(0, dtype=dtype))
+                continue
+            outputs[name] = np.lib.format.open_memmap(
+                self.folder / f"{name}.npy",
+                mode="w+",
+                dtype=dtype,
+                shape=(self.nrows,),
+            )
+        if self.key is None:
+            pieces = iter(runs)
+        else:
+            block = max(self.chunk_rows // max(len(runs), 1), 1)
+            pieces = merge_runs(runs, self.key, block)
+        start = 0
+        for piece in pieces:
+            n = len(piece[next(iter(self.dtypes))])
+            for name, output in outputs.items():
+                output[start : start + n] = piece[name]
+            start += n
+        for output in outputs.values():
+            output.flush()
+        del runs, outputs, pieces
+        shutil.rmtree(self.runs)
+
+
+class StringsWriter:
+    """Writes strings one after another to a blob, and their offsets to a
+    column of the same folder."""
+
+    def __init__(self, folder: Path, blob: str, offsets: str) -> None:
+        """
+        Args:
+            folder (Path): The folder of the blob.
+            blob (str): Name of the blob to create, without ".bin".
+            offsets (str): Name of the column of the offsets of the strings.
+        """
+
+        self.file = open(folder / f"{blob}.bin", "wb")
+        self.offsets = TableWriter(folder, {offsets: np.int64})
+        self.offsets.add(0)
+        self.end = 0
+
+    def __len__(self) -> int:
+        return self.offsets.nrows - 1
+
+    def add(self, s: str) -> int:
+        """Adds a string.
+
+        Args:
+            s (str): The string.
+
+        Returns:
+            int: The index of the string.
+        """
+
+        data = s.encode()
+        self.file.write(data)
+        self.end += len(data)
+        self.offsets.add(self.end)
+        return len(self) - 1
+
+    def close(self) -> None:
+        """Closes the blob and saves the offsets."""
+
+        self.file.close()
+        self.offsets.close()
+
+
+class Strings:
+    """Memory-mapped strings written by StringsWriter."""
+
+    def __init__(self, blob: Path, offsets: Path) -> None:
+        """
+        Args:
+            blob (Path): Path to the blob.
+            offsets (Path): Path to the offsets of the strings.
+        """
+
+        self.offsets = np.load(offsets, mmap_mode="r").view(np.ndarray)
+        with open(blob, "rb") as f:
+            self.blob = b""
+            if f.seek(0, 2) > 0:
+                self.blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __getitem__(self, i: int) -> str:
+        return self.blob[self.offsets[i] : self.offsets[i + 1]].decode()
+
+
+def ingest_papers(files: List[str], output: Path) -> None:
+    """Ingests the papers dataset, and the external ids of the papers.
+
+    Args:
+        files (List[str]): The shards.
+        output (Path): The store folder.
+    """
+
+    papers = TableWriter(
+        output / "papers",
+        {
+            "corpusid": np.int64,
+            "citation_count": np.int64,
+            "influential_count": np.int64,
+            "author_starts": np.int64,
+            "author_ends": np.int64,
+        },
+        key="corpusid",
+    )
+    slots = TableWriter(output / "slots", {"author_id": np.int64})
+    names = StringsWriter(output / "slots", "names", "name_offsets")
+    ids = {type: ids_writer(output, type) for type in EXTERNAL_IDS}
+    for paper in read_shards(files):
+        corpusid = int(paper["corpusid"])
+        start = slots.nrows
+        for author in paper.get("authors") or []:
+            author_id = author.get("authorId")
+            slots.add(int(author_id) if author_id else -1)
+            names.add(author.get("name") or "")
+        papers.add(
+            corpusid,
+            paper.get("citationcount") or 0,
+            paper.get("influentialcitationcount") or 0,
+            start,
+            slots.nrows,
+        )
+        external_ids = paper.get("externalids") or {}
+        for type, name in EXTERNAL_IDS.items():
+            if external_ids.get(name):
+                key = store_key(external_ids[name], type)
+                ids[type].add(key.encode(), corpusid)
+
+    for writer in [papers, slots, names, *ids.values()]:
+        writer.close()
+
+
+def ingest_paper_ids(files: List[str], output: Path) -> None:
+    """Ingests the paper-ids dataset, the corpusids of the sha ids of papers.
+
+    Args:
+        files (List[str]): The shards.
+        output (Path): The store folder.
+    """
+
+    ids = ids_writer(output, "s2")
+    for record in read_shards(files):
+        key = store_key(record["sha"], "s2")
+        ids.add(key.encode(), int(record["corpusid"]))
+    ids.close()
+
+
+def ids_writer(output: Path, type: str) -> TableWriter:
+    """Returns the writer of the corpusids of the ids of the given type.
+
+    Args:
+        output (Path): The store folder.
+        type (str): The type of the ids.
+
+    Returns:
+        TableWriter: The writer, taking the key and corpusid of each id.
+    """
+
+    return TableWriter(
+        output / "ids",
+        {f"{type}_keys": np.bytes_, f"{type}_corpusid": np.int64},
+        key=f"{type}_keys",
+    )
+
+
+def ingest_authors(files: List[str], output: Path) -> None:
+    """Ingests the authors dataset.
+
+    Args:
+        files (List[str]): The shards.
+        output (Path): The store folder.
+    """
+
+    authors = TableWriter(
+        output / "authors",
+        {
+            "author_id": np.int64,
+            "paper_count": np.int64,
+            "citation_count": np.int64,
+            "h_index": np.int64,
+        },
+        key="author_id",
+    )
+    for author in read_shards(files):
+        authors.add(
+            int(author["authorid"]),
+            author.get("papercount") or 0,
+            author.get("citationcount") or 0,
+            author.get("hindex") or 0,
+        )
+    authors.close()
+
+
+def intent_mask(intents: List[Any]) -> int:
+    """Returns the bit mask of the given intents of a citation.
+
+    Args:
+        intents (List[Any]): The intents, or the intents of each context.
+
+    Returns:
+        int: The bit mask of INTENTS.
+    """
+
+    mask = 0
+    for intent in intents or []:
+        for i in intent if isinstance(intent, list) else [intent]:
+            if i in INTENTS:
+                mask |= 1 << INTENTS.index(i)
+    return mask
+
+
+def ingest_citations(files: List[str], output: Path) -> None:
+    """Ingests the citations dataset. Citations of papers without a corpusid
+    are left out, as the API leaves them out of the references of a paper.
+
+    Args:
+        files (List[str]): The shards.
+        output (Path): The store folder.
+    """
+
+    citations = TableWriter(
+        output / "citations",
+        {
+            "citing": np.int64,
+            "cited": np.int64,
+            "influential": np.bool_,
+            "intents": np.int8,
+            "context_starts": np.int64,
+            "context_ends": np.int64,
+        },
+        key="citing",
+    )
+    contexts = StringsWriter(
+        output / "citations", "contexts", "context_offsets"
+    )
+    for citation in read_shards(files):
+        if citation.get("citingcorpusid") is None:
+            continue
+        if citation.get("citedcorpusid") is None:
+            continue
+        start = len(contexts)
+        for context in citation.get("contexts") or []:
+            contexts.add(context)
+        citations.add(
+            int(citation["citingcorpusid"]),
+            int(citation["citedcorpusid"]),
+            bool(citation.get("isinfluential")),
+            intent_mask(citation.get("intents")),
+            start,
+            len(contexts),
+        )
+
+    citations.close()
+    contexts.close()
+
+
+def build(
+    output: str,
+    papers: Optional[List[str]] = None,
+    authors: Optional[List[str]] = None,
+    citations: Optional[List[str]] = None,
+    paper_ids: Optional[List[str]] = None,
+) -> None:
+    """Ingests the given dataset shards into a store. Tables without shards
+    are created empty, and the datasets with shards are listed in
+    datasets.json.
+
+    Args:
+        output (str): Path to the store folder to create.
+        papers (Optional[List[str]]): Papers dataset shards. Default None.
+        authors (Optional[List[str]]): Authors dataset shards. Default None.
+        citations (Optional[List[str]]): Citations dataset shards. Default
+            None.
+        paper_ids (Optional[List[str]]): Paper-ids dataset shards. Default
+            None.
+    """
+
+    output = Path(output)
+    output.mkdir(parents=True, exist_ok=True)
+    ingest_papers(papers, output)
+    ingest_authors(authors, output)
+    ingest_citations(citations, output)
+    ingest_paper_ids(paper_ids, output)
+    datasets = {
+        "papers": papers,
+        "authors": authors,
+        "citations": citations,
+        "paper_ids": paper_ids,
+    }
+    with open(output / "datasets.json", "w") as f:
+        json.dump([name for name, files in datasets.items() if files], f)
+
+
+def find(keys: np.ndarray, key: Any) -> Tuple[int, int]:
+    """Finds the rows of the given key in a sorted key column.
+
+    Args:
+        keys (np.ndarray): The key column.
+        key (Any): The key.
+
+    Returns:
+        Tuple[int, int]: The range of rows of the key, empty if not found.
+    """
+
+    return (
+        int(np.searchsorted(keys, key, side="left")),
+        int(np.searchsorted(keys, key, side="right")),
+    )
+
+
+class GraphStore:
+    """Memory-mapped tables of a store, answering lookups in the format of
+    the parsed responses of the API."""
+
+    def __init__(self, path: str) -> None:
+        """
+        Args:
+            path (str): Path to the store folder.
+        """
+
+        path = Path(path)
+
+        def load(table: str) -> Dict[str, np.ndarray]:
+            """Memory-maps the columns of a table, as plain arrays, as
+            indexing memmap arrays is much slower."""
+
+            return {
+                f.stem: np.load(f, mmap_mode="r").view(np.ndarray)
+                for f in sorted((path / table).glob("*.npy"))
+            }
+
+        self.papers = load("papers")
+        self.slots = load("slots")
+        self.names = Strings(
+            path / "slots" / "names.bin", path / "slots" / "name_offsets.npy"
+        )
+        self.authors = load("authors")
+        self.citations = load("citations")
+        self.contexts = Strings(
+            path / "citations" / "contexts.bin",
+            path / "citations" / "context_offsets.npy",
+        )
+        self.ids = load("ids")
+        # Datasets without shards leave their tables empty, so lookups
+        # needing them are answered by the API instead.
+        self.datasets = set()
+        if (path / "datasets.json").exists():
+            with open(path / "datasets.json", "r") as f:
+                self.datasets = set(json.load(f))
+        self.hits = 0
+        self.misses = 0
+
+    def count(self, found: bool) -> None:
+        """Counts a lookup as a hit or a miss."""
+
+        if found:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def paper_row(self, corpusid: str) -> Optional[int]:
+        """Returns the row of the given paper, None if not in the store."""
+
+        start, end = find(self.papers["corpusid"], int(corpusid))
+        return start if start < end else None
+
+    def paper(self, corpusid: str) -> Optional[Dict[str, Any]]:
+        """Looks up the paper information of the given document.
+
+        Args:
+            corpusid (str): The corpusid of the document.
+
+        Returns:
+            Optional[Dict[str, Any]]: The information, as parse_paper of
+                feature_visualization.py returns it, None if not in the store.
+        """
+
+        row = self.paper_row(corpusid)
+        self.count(row is not None)
+        if row is None:
+            return None
+        return {
+            "citationCount": int(self.papers["citation_count"][row]),
+            "influentialCitationCount": int(
+                self.papers["influential_count"][row]
+            ),
+        }
+
+    def authors_of(self, corpusid: str) -> Optional[Dict[str, Any]]:
+        """Looks up the author information of the given document.
+
+        Args:
+            corpusid (str): The corpusid of the document.
+
+        Returns:
+            Optional[Dict[str, Any]]: The information, as parse_authors of
+                feature_visualization.py returns it, None if not in the store
+                or the authors dataset was not ingested.
+        """
+
+        row = None
+        if "authors" in self.datasets:
+            row = self.paper_row(corpusid)
+        self.count(row is not None)
+        if row is None:
+            return None
+        start = int(self.papers["author_starts"][row])
+        end = int(self.papers["author_ends"][row])
+        author_ids = self.slots["author_id"][start:end]
+        keys = self.authors["author_id"]
+        rows = np.searchsorted(keys, author_ids)
+        rows = np.minimum(rows, max(len(keys) - 1, 0))
+        known = (author_ids >= 0) & (keys[rows] == author_ids)
+        if not len(keys):
+            known[:] = False
+
+        result = {"authors": {}}
+        for slot, author_id in zip(range(start, end), author_ids.tolist()):
+            key = str(author_id) if author_id >= 0 else None
+            result["authors"][key] = self.names[slot]
+        for column, name in [
+            ("paper_count", "paperCounts"),
+            ("citation_count", "citationCounts"),
+            ("h_index", "hIndices"),
+        ]:
+            values = np.where(known, self.authors[column][rows], 0)
+            result[name] = values.tolist()
+        return result
+
+    def references(self, corpusid: str) -> Optional[Dict[str, Any]]:
+        """Looks up the reference information of the given document.
+
+        Args:
+            corpusid (str): The corpusid of the document.
+
+        Returns:
+            Optional[Dict[str, Any]]: The information, as parse_references of
+                feature_visualization.py returns it, None if the document is
+                not in the store or the citations dataset was not ingested.
+        """
+
+        start, end = find(self.citations["citing"], int(corpusid))
+        found = "citations" in self.datasets and (
+            start < end or self.paper_row(corpusid) is not None
+        )
+        self.count(found)
+        if not found:
+            return None
+        columns = {
+            k: self.citations[k][start:end].tolist()
+            for k in [
+                "cited",
+                "influential",
+                "intents",
+                "context_starts",
+                "context_ends",
+            ]
+        }
+        result = {}
+        for cited, influential, mask, a, b in zip(*columns.values()):
+            result[str(cited)] = {
+                "contexts": [self.contexts[i] for i in range(a, b)],
+                "intents": [
+                    intent
+                    for i, intent in enumerate(INTENTS)
+                    if mask & (1 << i)
+                ],
+                "isInfluential": influential,
+            }
+        return result
+
+    def get(self, corpusid: str, kind: str) -> Optional[Any]:
+        """Looks up the information of the given kind of a document.
+
+        Args:
+            corpusid (str): The corpusid of the document.
+            kind (str): "pinfo", "ainfo" or "rinfo".
+
+        Returns:
+            Optional[Any]: The information, None if not in the store.
+        """
+
+        lookup = {
+            "pinfo": self.paper,
+            "ainfo": self.authors_of,
+            "rinfo": self.references,
+        }
+        return lookup[kind](corpusid)
+
+    def corpusid(self, id: str, type: str) -> Optional[int]:
+        """Looks up the corpusid of the paper with the given id.
+
+        Args:
+            id (str): The id of the paper.
+            type (str): The type of id, one of utility.type_map.
+
+        Returns:
+            Optional[int]: The corpusid, None if not in the store.
+        """
+
+        keys = self.ids.get(f"{type}_keys")
+        start, end = 0, 0
+        if keys is not None:
+            start, end = find(keys, store_key(id, type).encode())
+        self.count(start < end)
+        if start == end:
+            return None
+        return int(self.ids[f"{type}_corpusid"][start])
+
+
+store: Optional[GraphStore] = None  # the store used instead of the API.
+
+
+def configure(path: Optional[str]) -> None:
+    """Sets the store that is looked up before requesting the API.
+
+    Args:
+        path (Optional[str]): Path to the store folder, None to only use the
+            API.
+    """
+
+    global store
+
+    store = GraphStore(path) if path else None
+
+
+def get_store() -> Optional[GraphStore]:
+    """Returns the store set by configure, if any.
+
+    Returns:
+        Optional[GraphStore]: The store.
+    """
+
+    return store
+
+
+def main() -> None:
+    """Executes the script."""
+
+    args = get_args()
+    build(
+        args.output, args.papers, args.authors, args.citations, args.paper_ids
+    )
+
+
+if __name__ == "__main__":
+    main()
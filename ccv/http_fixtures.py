@@ -0,0 +1,100 @@
+"""Store of recorded responses of the Semantic Scholar API, used by s2_client
+to record the responses of a run and replay them later without the API.
+Responses are keyed by the http method, the URL and the JSON data sent.
+"""
+
+
+import json
+import sqlite3
+from typing import Any, Dict, Optional, Tuple
+
+
+def data_key(data: Optional[Dict[str, Any]]) -> str:
+    """Returns the key of the JSON data sent with a request.
+
+    Args:
+        data (Optional[Dict[str, Any]]): The data, if any.
+
+    Returns:
+        str: The data as canonical JSON, "" if None.
+    """
+
+    return "" if data is None else json.dumps(data, sort_keys=True)
+
+
+class FixtureStore:
+    """SQLite backed store of the status and body of the final response to
+    each request."""
+
+    def __init__(self, path: str) -> None:
+        """
+        Args:
+            path (str): Path to the store file, created if it does not exist.
+        """
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS fixtures ("
+            "method TEXT NOT NULL, "
+            "url TEXT NOT NULL, "
+            "data TEXT NOT NULL, "
+            "status INTEGER NOT NULL, "
+            "body TEXT NOT NULL, "
+            "PRIMARY KEY (method, url, data))"
+        )
+        self.conn.commit()
+
+    def get(
+        self, method: str, url: str, data: Optional[Dict[str, Any]] = None
+    ) -> Optional[Tuple[int, str]]:
+        """Looks up the response recorded for a request.
+
+        Args:
+            method (str): The http method.
+            url (str): The URL.
+            data (Optional[Dict[str, Any]]): The data sent as JSON. Default
+                None.
+
+        Returns:
+            Optional[Tuple[int, str]]: The status and body of the response,
+                None if the request was not recorded.
+        """
+
+        row = self.conn.execute(
+            "SELECT status, body FROM fixtures "
+            "WHERE method = ? AND url = ? AND data = ?",
+            (method, url, data_key(data)),
+        ).fetchone()
+        return None if row is None else (row[0], row[1])
+
+    def put(
+        self,
+        method: str,
+        url: str,
+        data: Optional[Dict[str, Any]],
+        status: int,
+        body: str,
+    ) -> None:
+        """Records the response to a request, replacing an earlier one.
+
+        Args:
+            method (str): The http method.
+            url (str): The URL.
+            data (Optional[Dict[str, Any]]): The data sent as JSON.
+            status (int): The status of the response.
+            body (str): The body of the response.
+        """
+
+        self.conn.execute(
+            "INSERT OR REPLACE INTO fixtures VALUES (?, ?, ?, ?, ?)",
+            (method, url, data_key(data), status, body),
+        )
+        self.conn.commit()
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM fixtures").fetchone()[0]
+
+    def close(self) -> None:
+        """Closes the store file."""
+
+        self.conn.close()
@@ -0,0 +1,222 @@
+"""Persistent cache mapping external paper ids to corpusids. Running the
+script prebuilds the cache from the CORD-19 metadata, so that retrieval does
+not have to look up any corpusids using the Semantic Scholar API.
+
+example usage:
+    python ccv/id_cache.py \
+        --metadata "./anserini/collections/cord19-2022-02-07/metadata.csv" \
+        --cache "./data/corpusid_cache.sqlite"
+"""
+
+
+import argparse
+import csv
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from tqdm import tqdm
+
+import utility
+
+
+def get_args() -> argparse.Namespace:
+    """Returns the given arguments.
+
+    Returns:
+        argparse.Namespace: The arguments.
+    """
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--metadata", type=str, help="CORD-19 metadata file", required=True
+    )
+    parser.add_argument(
+        "--cache", type=str, help="cache file to fill", required=True
+    )
+    parser.add_argument(
+        "--chunk_size",
+        type=int,
+        default=5000,
+        help="number of papers to resolve at a time",
+    )
+
+    return parser.parse_args()
+
+
+class CorpusIdCache:
+    """SQLite backed cache keyed by (id type, external id). Ids that could
+    not be resolved are stored as well, with an empty corpusid, so that they
+    are not looked up again."""
+
+    def __init__(self, path: str) -> None:
+        """
+        Args:
+            path (str): Path to the cache file, created if it does not exist.
+        """
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS corpusids ("
+            "type TEXT NOT NULL, "
+            "id TEXT NOT NULL, "
+            "corpusid TEXT NOT NULL, "
+            "PRIMARY KEY (type, id))"
+        )
+        self.conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, type: str, id: str) -> Optional[Union[int, str]]:
+        """Looks up the corpusid of the given id.
+
+        Args:
+            type (str): The type of id.
+            id (str): The id of the paper.
+
+        Returns:
+            Optional[Union[int, str]]: None if the id is not cached, "" if it
+                is cached as unresolvable, otherwise the corpusid.
+        """
+
+        row = self.conn.execute(
+            "SELECT corpusid FROM corpusids WHERE type = ? AND id = ?",
+            (type, str(id)),
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return int(row[0]) if row[0] else ""
+
+    def put(self, type: str, id: str, corpusid: Union[int, str]) -> None:
+        """Stores the corpusid of the given id.
+
+        Args:
+            type (str): The type of id.
+            id (str): The id of the paper.
+            corpusid (Union[int, str]): The corpusid, "" if not found.
+        """
+
+        self.put_many([(type, id, corpusid)])
+
+    def put_many(
+        self, items: Iterable[Tuple[str, str, Union[int, str]]]
+    ) -> None:
+        """Stores the corpusids of the given ids.
+
+        Args:
+            items (Iterable[Tuple[str, str, Union[int, str]]]): (type, id,
+                corpusid) triples to store, corpusid is "" if not found.
+        """
+
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO corpusids VALUES (?, ?, ?)",
+            [(t, str(i), str(c) if c else "") for t, i, c in items],
+        )
+        self.conn.commit()
+
+    def close(self) -> None:
+        """Closes the cache file."""
+
+        self.conn.close()
+
+
+def resolve_corpusids(
+    keys: Iterable[Tuple[str, str]], cache: CorpusIdCache = None
+) -> Dict[Tuple[str, str], Union[int, str]]:
+    """Finds the corpusids of the given ids, only sending the ids not in the
+    cache to the paper batch endpoint.
+
+    Args:
+        keys (Iterable[Tuple[str, str]]): (type, id) pairs of papers.
+        cache (CorpusIdCache): Cache of resolved ids. Default None.
+
+    Returns:
+        Dict[Tuple[str, str], Union[int, str]]: The corpusid of each given
+            pair, "" if the paper was not found. Pairs that could not be
+            looked up are left out.
+    """
+
+    resolved, missing = {}, []
+    for type, id in keys:
+        corpusid = cache.get(type, id) if cache is not None else None
+        if corpusid is None:
+            missing.append((type, id))
+        else:
+            resolved[(type, id)] = corpusid
+
+    if missing:
+        found = utility.get_corpusids(missing)
+        if cache is not None:
+            cache.put_many([(t, i, c) for (t, i), c in found.items()])
+        resolved.update(found)
+    return resolved
+
+
+def resolve_doc_ids(
+    metadatas: List[Dict[str, str]], cache: CorpusIdCache = None
+) -> List[Union[int, str]]:
+    """Retrieves the corpusids of the given papers. Papers without a corpusid
+    in their metadata are looked up using their other ids, one id type at a
+    time in the order of utility.id_keys, so that every paper ends up with
+    the same corpusid as when looking up its ids one by one.
+
+    Args:
+        metadatas (List[Dict[str, str]]): CORD-19 metadata of the papers.
+        cache (CorpusIdCache): Cache of resolved ids. Default None.
+
+    Returns:
+        List[Union[int, str]]: The corpusid of each paper, "" if not found.
+    """
+
+    ids = [m["s2_id"] for m in metadatas]
+    pending = [i for i, id in enumerate(ids) if not id]
+    for key, type in utility.id_keys:
+        if not pending:
+            break
+        resolved = resolve_corpusids(
+            {(type, metadatas[i][key]) for i in pending if metadatas[i][key]},
+            cache,
+        )
+        unresolved = []
+        for i in pending:
+            id = metadatas[i][key]
+            corpusid = resolved.get((type, id), "") if id else ""
+            if corpusid:
+                ids[i] = corpusid
+            else:
+                unresolved.append(i)
+        pending = unresolved
+    return ids
+
+
+def prebuild(metadata: str, cache: CorpusIdCache, chunk_size: int) -> None:
+    """Resolves the corpusid of every paper in the CORD-19 metadata that does
+    not have one, and stores the results in the cache.
+
+    Args:
+        metadata (str): Path to the CORD-19 metadata file.
+        cache (CorpusIdCache): The cache to fill.
+        chunk_size (int): Number of papers to resolve at a time.
+    """
+
+    with open(metadata, newline="") as f:
+        rows = [r for r in csv.DictReader(f) if not r["s2_id"]]
+
+    for i in tqdm(range(0, len(rows), chunk_size)):
+        resolve_doc_ids(rows[i : i + chunk_size], cache)
+
+
+def main() -> None:
+    """Executes the script."""
+
+    args = get_args()
+    cache = CorpusIdCache(args.cache)
+    prebuild(args.metadata, cache, args.chunk_size)
+    print("Number of ids already cached:", cache.hits)
+    print("Number of ids looked up:", cache.misses)
+    cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""Persistent cache of the paper ("pinfo"), author ("ainfo") and reference
+("rinfo") information of documents, as used by feature_visualization.py.
+Each kind of information expires after its own time to live. Running the
+script warms the cache up by fetching the information of all documents of a
+corpus file, after which graphs can be built offline.
+
+example usage:
+    python ccv/metadata_cache.py \
+        --corpus "./data/8e07ef5c41d7c1805593048efd379e19/ds_corpus.jsonl" \
+        --cache "./data/metadata_cache.sqlite"
+"""
+
+
+import argparse
+import json
+import sqlite3
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from tqdm import tqdm
+
+DAY = 24 * 60 * 60
+# Seconds after which each kind of information is fetched again.
+TTLS = {"pinfo": 7 * DAY, "ainfo": 30 * DAY, "rinfo": 90 * DAY}
+
+
+def get_args() -> argparse.Namespace:
+    """Returns the given arguments.
+
+    Returns:
+        argparse.Namespace: The arguments.
+    """
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--corpus", type=str, help="corpus file to prefetch", required=True
+    )
+    parser.add_argument(
+        "--cache", type=str, help="cache file to fill", required=True
+    )
+    parser.add_argument(
+        "--chunk_size",
+        type=int,
+        default=500,
+        help="number of documents to fetch at a time",
+    )
+
+    return parser.parse_args()
+
+
+class MetadataCache:
+    """SQLite backed cache keyed by (corpusid, kind of information). Entries
+    older than the time to live of their kind count as misses, unless the
+    cache is offline, in which case they are used regardless of age."""
+
+    def __init__(
+        self,
+        path: str,
+        ttls: Optional[Dict[str, float]] = None,
+        offline: bool = False,
+    ) -> None:
+        """
+        Args:
+            path (str): Path to the cache file, created if it does not exist.
+            ttls (Optional[Dict[str, float]]): Seconds each kind of
+                information stays fresh. Default TTLS.
+            offline (bool): Whether to use entries regardless of age, as
+                nothing can be fetched. Default False.
+        """
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS metadata ("
+            "corpusid TEXT NOT NULL, "
+            "kind TEXT NOT NULL, "
+            "value TEXT NOT NULL, "
+            "fetched REAL NOT NULL, "
+            "PRIMARY KEY (corpusid, kind))"
+        )
+        self.conn.commit()
+        self.ttls = ttls if ttls is not None else TTLS
+        self.offline = offline
+        self.hits = Counter()
+        self.misses = Counter()
+        self.expired = Counter()
+
+    def get(self, corpusid: str, kind: str) -> Optional[Any]:
+        """Looks up the information of the given kind of a document.
+
+        Args:
+            corpusid (str): The corpusid of the document.
+            kind (str): "pinfo", "ainfo" or "rinfo".
+
+        Returns:
+            Optional[Any]: The information, None if not cached or expired.
+        """
+
+        row = self.conn.execute(
+            "SELECT value, fetched FROM metadata "
+            "WHERE corpusid = ? AND kind = ?",
+            (str(corpusid), kind),
+        ).fetchone()
+        if row is None:
+            self.misses[kind] += 1
+            return None
+        if not self.offline and time.time() - row[1] > self.ttls[kind]:
+            self.expired[kind] += 1
+            return None
+        self.hits[kind] += 1
+        return json.loads(row[0])
+
+    def put_many(self, items: Iterable[Tuple[str, str, Any]]) -> None:
+        """Stores the given information, fetched now.
+
+        Args:
+            items (Iterable[Tuple[str, str, Any]]): (corpusid, kind,
+                information) triples to store.
+        """
+
+        now = time.time()
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?)",
+            [(str(c), k, json.dumps(v), now) for c, k, v in items],
+        )
+        self.conn.commit()
+
+    def summary(self) -> str:
+        """Returns the hits, expired entries and misses of each kind.
+
+        Returns:
+            str: The statistics, one line per kind.
+        """
+
+        return "\n".join(
+            f"{kind}: {self.hits[kind]} hits, {self.expired[kind]} expired, "
+            f"{self.misses[kind]} misses"
+            for kind in self.ttls
+        )
+
+    def close(self) -> None:
+        """Closes the cache file."""
+
+        self.conn.close()
+
+
+def main() -> None:
+    """Executes the script."""
+
+    # Imported here, as feature_visualization itself imports this module.
+    from feature_visualization import get_metadata
+
+    args = get_args()
+    with open(args.corpus, "r") as f:
+        corpusids = [str(json.loads(line)["doc_id"]) for line in f]
+    corpusids = list(dict.fromkeys(corpusids))
+
+    cache = MetadataCache(args.cache)
+    for i in tqdm(range(0, len(corpusids), args.chunk_size)):
+        get_metadata(corpusids[i : i + args.chunk_size], cache)
+    print(cache.summary())
+    cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""Binary map of the evidence pairs written by stance_evidence.py, mapping the
+id of each pair to the claim and the two evidences of the pair. The map is a
+NumPy structured array saved as .npy, with one row per pair in the order of
+the pair ids, which get_features memory-maps instead of loading a JSON
+object of all pairs. The map is a side index of the stances of the pairs:
+they are read in the order of the pairs, one claim after the other, and each
+is joined with its row by the id of the pair.
+
+Evidence sentences are given ids packing the claim, document and evidence
+numbers into the bits of one integer, see evidence_doc_id.
+
+Running the script converts a JSON map, as written by earlier versions of
+stance_evidence.py, into a binary map.
+
+example usage:
+    python ccv/pair_map.py \
+        --emap "./data/emap.json" \
+        --output "./data/emap.npy"
+"""
+
+
+import argparse
+import json
+from typing import Any, Dict, Iterable, List, Tuple
+
+import numpy as np
+
+PAIR_DTYPE = np.dtype(
+    [
+        ("pair_id", np.int64),
+        ("claim_id", np.int64),
+        ("fdoc_id", np.int64),
+        ("fdoc_e_num", np.int32),
+        ("sdoc_id", np.int64),
+        ("sdoc_e_num", np.int32),
+        ("mirror", np.bool_),
+    ]
+)
+
+# Bits of an evidence id holding the document and evidence numbers, the claim
+# number takes the bits above them.
+DOC_BITS = 16
+EVIDENCE_BITS = 16
+
+
+def get_args() -> argparse.Namespace:
+    """Returns the given arguments.
+
+    Returns:
+        argparse.Namespace: The arguments.
+    """
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--emap", type=str, help="JSON evidence map file", required=True
+    )
+    parser.add_argument(
+        "--output", type=str, help="binary evidence map file", required=True
+    )
+
+    return parser.parse_args()
+
+
+def evidence_doc_id(claim_num: int, doc_num: int, evidence_num: int) -> int:
+    """Returns the id of an evidence sentence, unique for every claim,
+    document and evidence number.
+
+    Args:
+        claim_num (int): The number of the claim.
+        doc_num (int): The number of the document among the evidence
+            documents of the claim.
+        evidence_num (int): The number of the evidence among the evidences of
+            the document.
+
+    Returns:
+        int: The id.
+    """
+
+    if doc_num >= 1 << DOC_BITS or evidence_num >= 1 << EVIDENCE_BITS:
+        raise ValueError(
+            f"Too many documents or evidences for an evidence id: {doc_num}, "
+            f"{evidence_num}!"
+        )
+    return (
+        (claim_num << DOC_BITS | doc_num) << EVIDENCE_BITS
+    ) | evidence_num
+
+
+def pair_rows(pairs: Iterable[Tuple]) -> np.ndarray:
+    """Packs pairs into rows of a binary map.
+
+    Args:
+        pairs (Iterable[Tuple]): The fields of each pair, in the order of
+            PAIR_DTYPE.
+
+    Returns:
+        np.ndarray: The rows.
+    """
+
+    return np.array(list(pairs), dtype=PAIR_DTYPE)
+
+
+def save_pair_map(path: str, rows: List[np.ndarray]) -> None:
+    """Saves the rows of the pairs as a binary map.
+
+    Args:
+        path (str): The .npy file.
+        rows (List[np.ndarray]): The rows, in order of their pair ids, which
+            must number them from 0.
+    """
+
+    rows = np.concatenate(rows) if rows else np.zeros(0, dtype=PAIR_DTYPE)
+    if not np.array_equal(rows["pair_id"], np.arange(len(rows))):
+        raise ValueError("The pair ids must number the pairs from 0!")
+    np.save(path, rows)
+
+
+def convert(emap: str, output: str) -> None:
+    """Converts a JSON evidence map into a binary map.
+
+    Args:
+        emap (str): JSON evidence map file.
+        output (str): Binary evidence map file.
+    """
+
+    with open(emap, "r") as f:
+        pairs = json.load(f)
+    rows = pair_rows(
+        (
+            int(id),
+            p["claim_id"],
+            int(p["fdoc_id"]),
+            p["fdoc_e_num"],
+            int(p["sdoc_id"]),
+            p["sdoc_e_num"],
+            p.get("mirror", False),
+        )
+        for id, p in sorted(pairs.items(), key=lambda item: int(item[0]))
+    )
+    save_pair_map(output, [rows])
+
+
+class PairMap:
+    """Memory-mapped binary evidence map."""
+
+    def __init__(self, path: str) -> None:
+        """
+        Args:
+            path (str): The .npy file.
+        """
+
+        # Indexing a plain view of the memory-map is much faster.
+        self.rows = np.load(path, mmap_mode="r").view(np.ndarray)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def link(self, pair_id: int) -> Dict[str, Any]:
+        """Returns the information about a pair.
+
+        Args:
+            pair_id (int): The pair.
+
+        Returns:
+            Dict[str, Any]: The claim_id, fdoc_id, fdoc_e_num, sdoc_id,
+                sdoc_e_num and mirror of the pair, as in a JSON map.
+        """
+
+        row = self.rows[pair_id]
+        return {
+            "claim_id": int(row["claim_id"]),
+            # Documents are keyed by their doc_id as a string.
+            "fdoc_id": str(row["fdoc_id"]),
+            "fdoc_e_num": int(row["fdoc_e_num"]),
+            "sdoc_id": str(row["sdoc_id"]),
+            "sdoc_e_num": int(row["sdoc_e_num"]),
+            "mirror": bool(row["mirror"]),
+        }
+
+
+def main() -> None:
+    """Executes the script."""
+
+    args = get_args()
+    convert(args.emap, args.output)
+
+
+if __name__ == "__main__":
+    main()
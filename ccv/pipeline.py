@@ -0,0 +1,177 @@
+"""Runs the stages of a computation in their own threads, connected by bounded
+queues, so that the stages work on consecutive items at the same time. Each
+stage has a single thread, so items come out in the order they went in.
+
+The source is iterated on the calling thread, so it may make calls that have
+to stay on that thread, such as calls into the JVM through pyjnius. The
+stages run on threads of their own, which should only be handed plain Python
+data, as threads calling into the JVM have to detach from it before exiting.
+"""
+
+
+import queue
+import threading
+from itertools import chain
+from typing import Any, Callable, Generator, Iterable, List
+
+DONE = object()  # marks the end of the items in a queue.
+
+
+class Failure:
+    """Carries an exception raised by a stage down the pipeline."""
+
+    def __init__(self, error: BaseException) -> None:
+        """
+        Args:
+            error (BaseException): The exception raised.
+        """
+
+        self.error = error
+
+
+def put(q: queue.Queue, item: Any, stop: threading.Event) -> bool:
+    """Puts the item in the queue, giving up if the pipeline is stopped.
+
+    Args:
+        q (queue.Queue): The queue.
+        item (Any): The item.
+        stop (threading.Event): Set when the pipeline is stopped.
+
+    Returns:
+        bool: Whether the item was put in the queue.
+    """
+
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def get(q: queue.Queue, stop: threading.Event) -> Any:
+    """Gets the next item from the queue, or DONE if the pipeline is stopped.
+
+    Args:
+        q (queue.Queue): The queue.
+        stop (threading.Event): Set when the pipeline is stopped.
+
+    Returns:
+        Any: The item.
+    """
+
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            pass
+    return DONE
+
+
+def results(q: queue.Queue, wait: bool) -> Generator[Any, None, None]:
+    """Takes the results waiting in the last queue, up to DONE.
+
+    Args:
+        q (queue.Queue): The last queue.
+        wait (bool): Whether to wait for results until DONE, else only the
+            results already waiting are taken.
+
+    Raises:
+        BaseException: The exception a stage raised.
+
+    Yields:
+        Any: The results, and DONE last if it was reached.
+    """
+
+    while True:
+        try:
+            item = q.get() if wait else q.get_nowait()
+        except queue.Empty:
+            return
+        if isinstance(item, Failure):
+            raise item.error
+        yield item
+        if item is DONE:
+            return
+
+
+def work(
+    stage: Callable[[Any], Any],
+    inp: queue.Queue,
+    out: queue.Queue,
+    stop: threading.Event,
+) -> None:
+    """Applies the stage to each item of one queue and puts the results in
+    the next.
+
+    Args:
+        stage (Callable[[Any], Any]): The stage.
+        inp (queue.Queue): The queue to take items from.
+        out (queue.Queue): The queue to put results in.
+        stop (threading.Event): Set when the pipeline is stopped.
+    """
+
+    while True:
+        item = get(inp, stop)
+        if item is DONE or isinstance(item, Failure):
+            put(out, item, stop)
+            return
+        try:
+            result = stage(item)
+        except BaseException as e:
+            put(out, Failure(e), stop)
+            return
+        if not put(out, result, stop):
+            return
+
+
+def run_pipeline(
+    source: Iterable[Any],
+    stages: List[Callable[[Any], Any]],
+    queue_size: int = 2,
+) -> Generator[Any, None, None]:
+    """Passes the items of the source through the stages, one after another.
+    The source is iterated on the calling thread and each stage runs in its
+    own thread, and at most queue_size items wait between two stages. An
+    exception raised by the source or a stage is raised here.
+
+    Args:
+        source (Iterable[Any]): The items.
+        stages (List[Callable[[Any], Any]]): The stages.
+        queue_size (int): Max number of items waiting between two stages.
+            Default 2.
+
+    Yields:
+        Any: The result of the last stage for each item, in order.
+    """
+
+    stop = threading.Event()
+    queues = [queue.Queue(queue_size) for _ in range(len(stages) + 1)]
+    threads = [
+        threading.Thread(target=work, args=(s, queues[i], queues[i + 1], stop))
+        for i, s in enumerate(stages)
+    ]
+    for t in threads:
+        t.daemon = True
+        t.start()
+
+    try:
+        for item in chain(source, [DONE]):
+            # Results are passed on while waiting for room for the item, as
+            # the stages can not make room while the last queue is full.
+            while True:
+                yield from results(queues[-1], wait=False)
+                try:
+                    queues[0].put(item, timeout=0.01)
+                    break
+                except queue.Full:
+                    pass
+        for item in results(queues[-1], wait=True):
+            if item is DONE:
+                return
+            yield item
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
@@ -0,0 +1,186 @@
+"""Persistent cache of longchecker predictions, keyed by the content of their
+inputs, so that (claim, document) and (rationale, rationale) inputs that have
+already been predicted by the same checkpoint are not predicted again, in the
+same run or in later ones."""
+
+
+import hashlib
+import json
+import os
+import sqlite3
+from collections import defaultdict
+from typing import Any, Dict, Iterable
+
+# Number of keys looked up per query, below the SQLite variable limit.
+LOOKUP_SIZE = 500
+# Fields of a prediction kept in the cache, the ids of the claim and document
+# are those of the entry it is looked up for.
+FIELDS = [
+    "predicted_label",
+    "label_probs",
+    "predicted_rationale",
+    "rationale_probs",
+]
+
+
+def file_digest(path: str) -> str:
+    """Hashes the content of a file.
+
+    Args:
+        path (str): The file.
+
+    Returns:
+        str: The hash of the file.
+    """
+
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def prediction_key(model: str, to_tensorize: Dict[str, Any]) -> str:
+    """Hashes the model and the text of an input of longchecker.
+
+    Args:
+        model (str): Digest of the model and its settings.
+        to_tensorize (Dict[str, Any]): The claim, sentences and title of the
+            input.
+
+    Returns:
+        str: The hash of the input.
+    """
+
+    text = json.dumps(
+        [
+            model,
+            to_tensorize["claim"],
+            to_tensorize["title"],
+            to_tensorize["sentences"],
+        ]
+    )
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+class PredictionCache:
+    """SQLite backed cache of predictions keyed by prediction_key, counting
+    the hits and misses of each stage."""
+
+    def __init__(self, path: str) -> None:
+        """
+        Args:
+            path (str): Path to the cache file, created if it does not exist.
+        """
+
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS predictions ("
+            "key TEXT PRIMARY KEY, "
+            "prediction TEXT NOT NULL)"
+        )
+        # Checkpoints are hashed again only when their size or time of
+        # modification changes, as hashing a checkpoint takes seconds.
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS checkpoints ("
+            "path TEXT PRIMARY KEY, "
+            "size INTEGER NOT NULL, "
+            "mtime REAL NOT NULL, "
+            "digest TEXT NOT NULL)"
+        )
+        self.conn.commit()
+        self.hits = defaultdict(int)
+        self.misses = defaultdict(int)
+
+    def checkpoint_digest(self, path: str) -> str:
+        """Returns the digest of a checkpoint.
+
+        Args:
+            path (str): Path to the checkpoint.
+
+        Returns:
+            str: The hash of the checkpoint.
+        """
+
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        row = self.conn.execute(
+            "SELECT digest FROM checkpoints WHERE path = ? AND size = ? "
+            "AND mtime = ?",
+            (path, stat.st_size, stat.st_mtime),
+        ).fetchone()
+        if row is not None:
+            return row[0]
+        digest = file_digest(path)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?)",
+            (path, stat.st_size, stat.st_mtime, digest),
+        )
+        self.conn.commit()
+        return digest
+
+    def get_many(
+        self, keys: Iterable[str], stage: str
+    ) -> Dict[str, Dict[str, Any]]:
+        """Looks up the predictions of the given keys, counting the hits and
+        misses of the distinct keys towards the stage.
+
+        Args:
+            keys (Iterable[str]): Keys of the inputs, from prediction_key.
+            stage (str): The stage looking up the inputs.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: The predictions found in the cache.
+        """
+
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        for i in range(0, len(keys), LOOKUP_SIZE):
+            chunk = keys[i : i + LOOKUP_SIZE]
+            rows = self.conn.execute(
+                "SELECT key, prediction FROM predictions WHERE key IN "
+                f"({', '.join('?' * len(chunk))})",
+                chunk,
+            )
+            found.update((key, json.loads(p)) for key, p in rows)
+        self.hits[stage] += len(found)
+        self.misses[stage] += len(keys) - len(found)
+        return found
+
+    def put_many(self, predictions: Dict[str, Dict[str, Any]]) -> None:
+        """Stores the given predictions.
+
+        Args:
+            predictions (Dict[str, Dict[str, Any]]): The prediction of each
+                key.
+        """
+
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO predictions VALUES (?, ?)",
+            [
+                (key, json.dumps({k: prediction[k] for k in FIELDS}))
+                for key, prediction in predictions.items()
+            ],
+        )
+        self.conn.commit()
+
+    def summary(self) -> str:
+        """Returns the hits, misses and hit rate of each stage.
+
+        Returns:
+            str: The statistics, one line per stage.
+        """
+
+        lines = []
+        for stage, misses in self.misses.items():
+            hits = self.hits[stage]
+            lines.append(
+                f"{stage}: {hits} hits, {misses} misses, "
+                f"{100 * hits / max(hits + misses, 1):.1f}% hit rate"
+            )
+        return "\n".join(lines)
+
+    def close(self) -> None:
+        """Closes the cache file."""
+
+        self.conn.close()
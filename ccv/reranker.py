@@ -0,0 +1,227 @@
+"""Contains the monoT5 re-ranker used to re-rank the documents retrieved for
+a claim."""
+
+
+from typing import Generator, List, Tuple
+
+import torch
+from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+
+PRECISIONS = ["fp32", "bf16", "int8"]
+
+
+class MonoT5Reranker:
+    """Scores how relevant documents are to a query using monoT5. The model is
+    placed on the device once, inputs are tokenized once, and batches are made
+    of inputs of similar length so that little padding is needed. Batches can
+    be limited by a token budget instead of a fixed size, and can be filled
+    with inputs from several queries.
+
+    With fp32 the scores match scoring the documents in their original order
+    up to floating point noise (below 1e-4). bf16 and int8 (dynamic
+    quantization of the linear layers, cpu only) are faster on cpu but
+    approximate, benchmarks/rerank.py checks them against a tolerance.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "castorini/monot5-base-med-msmarco",
+        device: str = "cpu",
+        batch_size: int = 64,
+        precision: str = "fp32",
+        max_length: int = 512,
+        sort_by_length: bool = True,
+        token_budget: int = None,
+    ) -> None:
+        """
+        Args:
+            model_name (str): Name of the model. Default
+                "castorini/monot5-base-med-msmarco".
+            device (str): The device to run the model on. Default "cpu".
+            batch_size (int): Batch size. Default 64.
+            precision (str): One of PRECISIONS. Default "fp32".
+            max_length (int): Inputs are truncated to this many tokens.
+                Default 512.
+            sort_by_length (bool): Whether to batch inputs of similar length
+                together. Default True.
+            token_budget (int): If given, batches are filled with as many
+                inputs as fit in this many (padded) tokens, instead of
+                batch_size inputs. Default None.
+
+        Raises:
+            ValueError: The precision is not known or not supported on the
+                given device.
+        """
+
+        if precision not in PRECISIONS:
+            raise ValueError(f"{precision} is not a known precision!")
+        if precision == "int8" and device != "cpu":
+            raise ValueError("int8 is only supported on cpu!")
+
+        self.model_name = model_name
+        self.device = device
+        self.batch_size = batch_size
+        self.precision = precision
+        self.max_length = max_length
+        self.sort_by_length = sort_by_length
+        self.token_budget = token_budget
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+        if precision == "int8":
+            model = torch.quantization.quantize_dynamic(
+                model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+        elif precision == "bf16":
+            model = model.to(torch.bfloat16)
+        self.model = model.to(device)
+        self.model.eval()
+
+        vocab = self.tokenizer.get_vocab()
+        self.token_false_id = vocab["▁false"]
+        self.token_true_id = vocab["▁true"]
+
+    def encode(self, query: str, texts: List[str]) -> List[List[int]]:
+        """Tokenizes the query together with each of the texts.
+
+        Args:
+            query (str): The query.
+            texts (List[str]): The texts.
+
+        Returns:
+            List[List[int]]: The token ids of each input, truncated.
+        """
+
+        data = [
+            f"'Query: {query} Document: {text} Relevant:'" for text in texts
+        ]
+        return self.tokenizer(
+            data, truncation=True, max_length=self.max_length
+        )["input_ids"]
+
+    def score(self, query: str, texts: List[str]) -> List[float]:
+        """Scores how relevant each of the texts is to the query.
+
+        Args:
+            query (str): The query.
+            texts (List[str]): The texts to score.
+
+        Returns:
+            List[float]: The log-probability of each text being relevant.
+        """
+
+        return self.score_encoded(self.encode(query, texts))
+
+    def score_many(
+        self, queries: List[Tuple[str, List[str]]]
+    ) -> List[List[float]]:
+        """Scores the texts of several queries together, so that batches are
+        filled with inputs from different queries.
+
+        Args:
+            queries (List[Tuple[str, List[str]]]): Each query and the texts
+                to score for it.
+
+        Returns:
+            List[List[float]]: The scores of the texts of each query.
+        """
+
+        inputs = [x for q, texts in queries for x in self.encode(q, texts)]
+        scores = iter(self.score_encoded(inputs))
+        return [[next(scores) for _ in texts] for _, texts in queries]
+
+    def batches(
+        self, inputs: List[List[int]]
+    ) -> Generator[List[int], None, None]:
+        """Splits the inputs into batches, either of batch_size inputs or of
+        as many inputs as fit in the token budget when padded.
+
+        Args:
+            inputs (List[List[int]]): Token ids of each input.
+
+        Yields:
+            List[int]: Indices of the inputs in the next batch.
+        """
+
+        order = list(range(len(inputs)))
+        if self.sort_by_length:
+            order.sort(key=lambda i: len(inputs[i]))
+
+        if self.token_budget is None:
+            for i in range(0, len(order), self.batch_size):
+                yield order[i : i + self.batch_size]
+            return
+
+        batch, longest = [], 0
+        for i in order:
+            length = max(longest, len(inputs[i]))
+            if batch and (len(batch) + 1) * length > self.token_budget:
+                yield batch
+                batch, length = [], len(inputs[i])
+            batch.append(i)
+            longest = length
+        if batch:
+            yield batch
+
+    def score_encoded(self, inputs: List[List[int]]) -> List[float]:
+        """Scores already tokenized inputs.
+
+        Args:
+            inputs (List[List[int]]): Token ids of each input.
+
+        Returns:
+            List[float]: The log-probability of each input being relevant, in
+                the order of the inputs.
+        """
+
+        scores = [0.0] * len(inputs)
+        for batch in self.batches(inputs):
+            for j, s in zip(batch, self.forward([inputs[j] for j in batch])):
+                scores[j] = s
+        return scores
+
+    # Code derived from parts of https://github.com/castorini/pygaggle,
+    # mainly https://github.com/castorini/pygaggle/blob/dcfaacbff62298da39098ff0d296dc541fadcc9c/pygaggle/rerank/transformer.py#L98
+    def forward(self, inputs: List[List[int]]) -> List[float]:
+        """Runs the model on one batch of tokenized inputs, padded to the
+        longest of them.
+
+        Args:
+            inputs (List[List[int]]): Token ids of each input.
+
+        Returns:
+            List[float]: The log-probability of each input being relevant.
+        """
+
+        input = self.tokenizer.pad(
+            {"input_ids": inputs},
+            padding="longest",
+            return_attention_mask=True,
+            return_tensors="pt",
+        )
+        input_ids = input["input_ids"].to(self.device)
+        attention = input["attention_mask"].to(self.device)
+
+        with torch.no_grad():
+            decode_ids = torch.full(
+                (input_ids.size(0), 1),
+                self.model.config.decoder_start_token_id,
+                dtype=torch.long,
+            ).to(self.device)
+            input = self.model.get_encoder()(
+                input_ids, attention_mask=attention
+            )
+            input = self.model.prepare_inputs_for_generation(
+                decode_ids,
+                encoder_outputs=input,
+                past=None,
+                attention_mask=attention,
+                use_cache=True,
+            )
+            outputs = self.model(**input)
+            scores = outputs[0][:, -1, :].float()
+
+        scores = scores[:, [self.token_false_id, self.token_true_id]]
+        scores = torch.nn.functional.log_softmax(scores, dim=1)
+
+        return scores[:, 1].tolist()
@@ -12,7 +12,27 @@ example usage:
         --output_corpus "./data/predict_corpus.jsonl" \
         --rerank \
         --device "cuda:0" \
-        --batch_size 100
+        --batch_size 100 \
+        --precision "fp32" \
+        --token_budget 32768 \
+        --score_cache "./data/score_cache.sqlite" \
+        --threads 8 \
+        --chunk_size 64 \
+        --queue_size 2
+
+    With hybrid BM25 and dense retrieval, see dense.py:
+    python ccv/retrieval.py \
+        --index "./anserini/indexes/lucene-index-cord19-abstract-2022-02-07" \
+        --nkeep 20 \
+        --ninit 50 \
+        --input "./data/covidfact.jsonl" \
+        --claim_col "claim" \
+        --output_claims "./data/predict_claims.jsonl" \
+        --output_corpus "./data/predict_corpus.jsonl" \
+        --rerank \
+        --device "cuda:0" \
+        --dense_index "./data/dense_index" \
+        --nprobe 64
 
     Without re-ranking:
     python ccv/retrieval.py \
@@ -27,31 +47,46 @@ example usage:
 
 import argparse
 import json
-import re
-from difflib import SequenceMatcher
+import time
+from itertools import islice
 from pathlib import Path
-from typing import Any, Dict, Generator, List, TextIO
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    Set,
+    TextIO,
+    Tuple,
+)
 
 import pandas as pd
 import torch
-from nltk import (
-    corpus,
-    ne_chunk,
-    pos_tag,
-    word_tokenize,
-    sent_tokenize,
-    download,
-)
-from nltk.tree import Tree
+from nltk import download
 from pyserini.search.lucene import LuceneSearcher
 from tqdm import tqdm
-from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
 
+import graph_store
 import utility
+from dedup import find_duplicates
+from dense import DenseEncoder, DenseIndex, dense_search
+from id_cache import CorpusIdCache, resolve_doc_ids
+from pipeline import run_pipeline
+from reranker import PRECISIONS, MonoT5Reranker
+from score_cache import ScoreCache
+from segment_abstracts import get_sentences
+from sentence_store import SentenceStore
 
 nunavail = 0  # number of docs not having the corpusid initially available.
 nmissed = 0  # number of docs where the corpusid could not be found.
 
+# Indices, claims and documents of a chunk of claims passing the pipeline.
+Chunk = Tuple[Tuple[int, ...], Tuple[str, ...], List[List[Dict[str, Any]]]]
+# The docid and CORD-19 metadata of a hit.
+Hit = Tuple[str, Dict[str, str]]
+
 
 def get_args() -> argparse.Namespace:
     """Returns the given arguments.
@@ -106,117 +141,193 @@ def get_args() -> argparse.Namespace:
     parser.add_argument(
         "--batch_size", type=int, help="batch-size to use when re-ranking"
     )
+    parser.add_argument(
+        "--token_budget",
+        type=int,
+        help="if given, re-rank the documents of a chunk of claims together, "
+        "in batches of at most this many tokens instead of batch_size pairs",
+    )
+    parser.add_argument(
+        "--precision",
+        type=str,
+        choices=PRECISIONS,
+        default="fp32",
+        help="precision to use when re-ranking, int8 only on cpu",
+    )
+    parser.add_argument(
+        "--dense_index",
+        type=str,
+        help="if given, dense index folder to search, see dense.py",
+    )
+    parser.add_argument(
+        "--dense_mode",
+        type=str,
+        choices=["hybrid", "dense"],
+        default="hybrid",
+        help="fuse the dense hits with the BM25 hits, or only use the dense",
+    )
+    parser.add_argument(
+        "--nprobe",
+        type=int,
+        help="number of IVF partitions of the dense index to scan, all "
+        "documents are scanned if not given",
+    )
+    parser.add_argument(
+        "--id_cache", type=str, help="corpusid cache file, see id_cache.py"
+    )
+    parser.add_argument(
+        "--score_cache", type=str, help="re-ranker score cache file"
+    )
+    parser.add_argument(
+        "--score_cache_size",
+        type=int,
+        default=1_000_000,
+        help="max number of scores kept in the score cache",
+    )
+    parser.add_argument(
+        "--sentence_store",
+        type=str,
+        help="precomputed sentence store folder, see segment_abstracts.py",
+    )
+    parser.add_argument(
+        "--graph_store",
+        type=str,
+        help="graph store folder to resolve corpusids in, see graph_store.py",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=1,
+        help="number of threads to use for searching, 1 searches serially",
+    )
+    parser.add_argument(
+        "--chunk_size",
+        type=int,
+        default=64,
+        help="number of claims passed through the pipeline at a time, and "
+        "searched together when using threads",
+    )
+    parser.add_argument(
+        "--queue_size",
+        type=int,
+        default=2,
+        help="max number of chunks waiting between two pipeline stages",
+    )
 
     return parser.parse_args()
 
 
-def split_fullstopless(text: str) -> List[str]:
-    """Tries to split text without fullstops into sentences.
+def load_claims(input: str, delimiter: str = None) -> pd.DataFrame:
+    """Loads the claims from the given file.
 
     Args:
-        text (str): Text without fullstops
+        input (str): Path to the file containing the claims.
+        delimiter (str): If not json, which delimiter. Default None.
 
     Returns:
-        List[str]: List of produced sentences
+        pd.DataFrame: The claims.
     """
 
-    tokens = word_tokenize(text.replace(".", ""))
-    chunks = ne_chunk(pos_tag(tokens))
+    file_type = input.split(".")[-1]
+    if file_type == "jsonl":
+        return pd.read_json(Path(input), lines=True)
+    if file_type == "json":
+        return pd.read_json(Path(input))
+    return pd.read_csv(Path(input), delimiter=delimiter)
+
+
+def search(
+    searcher: LuceneSearcher,
+    claims: List[str],
+    k: int,
+    threads: int = 1,
+    chunk_size: int = 64,
+) -> Generator[List[Any], None, None]:
+    """Searches the index for each of the given claims. If more than one
+    thread is given, the claims are searched in chunks using batch_search,
+    which returns the same hits as searching them one at a time.
+
+    Args:
+        searcher (LuceneSearcher): The searcher to use.
+        claims (List[str]): The claims to search for.
+        k (int): Number of hits to return per claim.
+        threads (int): Number of threads to use. Default 1.
+        chunk_size (int): Number of claims per batch_search call. Default 64.
+
+    Yields:
+        List[Any]: The hits for each claim, in the order of the claims.
+    """
 
-    # Lowercase entities
-    tokens = []
-    for c in chunks:
-        if isinstance(c, Tree):
-            tokens.append(" ".join([w for w, _ in c.leaves()]).lower())
-        else:
-            tokens.append(c[0])
-
-    # Combine words with special tokens.
-    new_tokens = []
-    for i, token in enumerate(tokens):
-        if token in "?!.,:;'\"-%)" or token == "'s":
-            new_tokens[-1] = new_tokens[-1] + token
-        elif i != 0 and new_tokens[-1] == "(":
-            new_tokens[-1] = new_tokens[-1] + token
-        else:
-            new_tokens.append(token)
-
-    # Detect spaces after lower-case character and before capitalized word.
-    text = " ".join(new_tokens)
-    regex = r"(?<=[a-z])\s(?=\b[A-Z][a-z]+\b)"
-    sentences = re.split(regex, text)
-
-    # If last word in sentence is a stopword, continue sentence.
-    new_sentences = []
-    for i, s in enumerate(sentences):
-        if i != 0 and word_tokenize(new_sentences[-1])[
-            -1
-        ] in corpus.stopwords.words("english"):
-            new_sentences[-1] = new_sentences[-1] + " " + s
-        else:
-            new_sentences.append(s)
+    if threads <= 1:
+        for claim in claims:
+            yield searcher.search(claim, k)
+        return
 
-    # Add fullstops to sentences.
-    new_sentences = [s + "." for s in new_sentences]
-    return new_sentences
+    for start in range(0, len(claims), chunk_size):
+        chunk = claims[start : start + chunk_size]
+        qids = [str(start + i) for i in range(len(chunk))]
+        hits = searcher.batch_search(chunk, qids, k, threads)
+        for qid in qids:
+            yield hits[qid]
 
 
-def get_sentences(
-    metadata: Dict[str, str],
-) -> List[str]:
-    """Retrieves sentences from a hit's abstract.
+def parse_hits(hits: List[Any]) -> List[Hit]:
+    """Reads the docid and metadata of the hits. Reading a hit calls into the
+    JVM, so the hits are read on the thread that searched, and only the read
+    hits are handed on to the pipeline threads.
 
     Args:
-        hit (Dict[str, Any]): The metadata associated with the hit to retrieve
-            abstract sentences from.
+        hits (List[Any]): The hits from a query.
 
     Returns:
-        List[str]: The sentences from a hit's abstract.
+        List[Hit]: The docid and CORD-19 metadata of each hit.
     """
 
-    abstract = metadata["abstract"]
-    sentences = sent_tokenize(abstract)
+    return [(h.docid, json.loads(h.raw)["csv_metadata"]) for h in hits]
 
-    # Sometimes the abstract has missing fullstops, tries to salvage that.
-    if len(sentences) == 1:
-        sentences = split_fullstopless(abstract)
 
-    return sentences
+def batched(
+    iterable: Iterable[Any], n: int
+) -> Generator[List[Any], None, None]:
+    """Splits the given iterable into lists of n elements, the last one
+    possibly shorter.
 
+    Args:
+        iterable (Iterable[Any]): The iterable to split.
+        n (int): Number of elements per list.
+
+    Yields:
+        List[Any]: The next n elements.
+    """
 
-def get_doc_id(metadata: Dict[str, str]) -> str:
-    """Retrives the corpusid from the hit metadata.
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, n))
+        if not batch:
+            return
+        yield batch
+
+
+def get_doc_ids(
+    metadatas: List[Dict[str, str]], cache: CorpusIdCache = None
+) -> List[str]:
+    """Retrives the corpusids from the metadata of the given hits, looking up
+    the missing ones in bulk.
 
     Args:
-        metadata (Dict[str, str]): Metadata of the given hit.
+        metadatas (List[Dict[str, str]]): Metadata of the given hits.
+        cache (CorpusIdCache): Cache of resolved ids. Default None.
 
     Returns:
-        str: corpusid of the given hit
+        List[str]: corpusid of each of the given hits.
     """
     global nunavail
     global nmissed
 
-    id = metadata["s2_id"]
-    if not id:
-        nunavail += 1
-        # look through the other associated ids and use them to try
-        # and find the corpusid.
-        for (key, type,) in [
-            ("arxiv_id", "arxiv"),
-            ("doi", "doi"),
-            ("pubmed_id", "pubmed"),
-            ("pmcid", "pmc"),
-            ("mag_id", "mag"),
-            ("sha", "s2"),
-        ]:
-            id = metadata[key]
-            if id:
-                id = utility.get_corpusid(id, type)
-                if id:
-                    break
-    if not id:
-        nmissed += 1
-    return id
+    nunavail += sum(1 for m in metadatas if not m["s2_id"])
+    ids = resolve_doc_ids(metadatas, cache)
+    nmissed += sum(1 for id in ids if not id)
+    return ids
 
 
 def remove_duplicates(docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
@@ -229,14 +340,7 @@ def remove_duplicates(docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         Dict[str, Any]: List of unique documents.
     """
 
-    duplicates = []
-    for i in range(len(docs)):
-        for j in range(i + 1, len(docs)):
-            t1 = docs[i]["title"].lower()
-            t2 = docs[j]["title"].lower()
-            r = SequenceMatcher(a=t1, b=t2).ratio()
-            if r >= 0.825:
-                duplicates.append((i, j))
+    duplicates = find_duplicates([d["title"].lower() for d in docs], 0.825)
     remove = []
     for i1, i2 in duplicates:
         b = len(docs[i1]["abstract"]) > len(docs[i2]["abstract"])
@@ -253,28 +357,35 @@ def remove_duplicates(docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     return docs
 
 
-def process_hits(hits: Dict[str, Any]) -> List[Dict[str, Any]]:
+def process_hits(
+    hits: List[Hit], doc_ids: List[str], store: SentenceStore = None
+) -> List[Dict[str, Any]]:
     """Processes the hits from a query.
 
     Args:
-        hits (Dict[str, Any]): The hits from a query.
+        hits (List[Hit]): The hits from a query, from parse_hits.
+        doc_ids (List[str]): The corpusid of each hit.
+        store (SentenceStore): Store of precomputed sentences, abstracts not
+            in it are split into sentences on the spot. Default None.
 
     Returns:
         List[Dict[str, Any]]: List of documents.
     """
 
     doc_dict = {  # also removes duplicate corpusids
-        get_doc_id(json.loads(h.raw)["csv_metadata"]): h for h in hits
+        doc_id: h for doc_id, h in zip(doc_ids, hits)
     }
     docs = []
-    for k, v in doc_dict.items():
+    for k, (docid, metadata) in doc_dict.items():
         if k == "":
             continue
-        metadata = json.loads(v.raw)["csv_metadata"]
+        sentences = store.get(docid) if store is not None else None
+        if sentences is None:
+            sentences = get_sentences(metadata)
         doc = {
             "doc_id": int(k),
             "title": metadata["title"],
-            "abstract": get_sentences(metadata),
+            "abstract": sentences,
             "journal": metadata["journal"],
             "publish_time": metadata["publish_time"],
             "aliases": [],
@@ -285,14 +396,98 @@ def process_hits(hits: Dict[str, Any]) -> List[Dict[str, Any]]:
     return docs
 
 
+def process_batch(
+    batch: List[List[Hit]],
+    cache: CorpusIdCache = None,
+    store: SentenceStore = None,
+) -> List[List[Dict[str, Any]]]:
+    """Processes the hits from several queries, resolving the missing
+    corpusids of all of them together.
+
+    Args:
+        batch (List[List[Hit]]): The hits from each query, from parse_hits.
+        cache (CorpusIdCache): Cache of resolved ids. Default None.
+        store (SentenceStore): Store of precomputed sentences. Default None.
+
+    Returns:
+        List[List[Dict[str, Any]]]: List of documents for each query.
+    """
+
+    metadatas = [metadata for hits in batch for _, metadata in hits]
+    doc_ids = iter(get_doc_ids(metadatas, cache))
+    return [
+        process_hits(hits, [next(doc_ids) for _ in hits], store)
+        for hits in batch
+    ]
+
+
+def score_docs(
+    claims: List[str],
+    docs: List[List[Dict[str, Any]]],
+    reranker: MonoT5Reranker,
+    cache: ScoreCache = None,
+    packed: bool = False,
+) -> List[List[float]]:
+    """Scores the documents of each claim, only running the re-ranker on the
+    (claim, document) pairs not found in the cache.
+
+    Args:
+        claims (List[str]): The claims.
+        docs (List[List[Dict[str, Any]]]): The documents of each claim.
+        reranker (MonoT5Reranker): The re-ranker to use.
+        cache (ScoreCache): Cache of scores. Default None.
+        packed (bool): Whether to score the pairs of all claims together.
+            Default False.
+
+    Returns:
+        List[List[float]]: The score of each document of each claim.
+    """
+
+    scores = [[None] * len(cdocs) for cdocs in docs]
+    if cache is not None:
+        found = cache.get_many(
+            (claim, d["doc_id"])
+            for claim, cdocs in zip(claims, docs)
+            for d in cdocs
+        )
+        for claim, cdocs, cscores in zip(claims, docs, scores):
+            for i, d in enumerate(cdocs):
+                cscores[i] = found.get((claim, d["doc_id"]))
+
+    misses = [
+        [i for i, s in enumerate(cscores) if s is None] for cscores in scores
+    ]
+    queries = [
+        (claim, [" ".join(cdocs[i]["abstract"]) for i in cmisses])
+        for claim, cdocs, cmisses in zip(claims, docs, misses)
+        if cmisses
+    ]
+    start = time.perf_counter()
+    if packed:
+        computed = reranker.score_many(queries) if queries else []
+    else:
+        computed = [reranker.score(claim, texts) for claim, texts in queries]
+    seconds = time.perf_counter() - start
+
+    computed = iter(computed)
+    new = {}
+    for claim, cdocs, cscores, cmisses in zip(claims, docs, scores, misses):
+        if not cmisses:
+            continue
+        for i, s in zip(cmisses, next(computed)):
+            cscores[i] = s
+            new[(claim, cdocs[i]["doc_id"])] = s
+    if cache is not None and new:
+        cache.put_many(new, seconds)
+    return scores
+
+
 def rerank(
     claim: str,
     docs: List[Dict[str, Any]],
-    model: AutoModelForSeq2SeqLM,
-    tokenizer: AutoTokenizer,
+    reranker: MonoT5Reranker,
     nkeep: int,
-    device: str,
-    batch_size: int = 64,
+    cache: ScoreCache = None,
 ) -> List[Dict[str, Any]]:
     """Takes a claim and the associated retrieved evidence documents,
     re-ranks them, and returns the top nkeep.
@@ -300,91 +495,49 @@ def rerank(
     Args:
         claim (str): The claim.
         docs (List[Dict[str, Any]]): The lists of documents.
-        model (AutoModelForSeq2SeqLM): The model to use for re-ranking.
-        tokenizer (AutoTokenizer): The model's tokenizer.
+        reranker (MonoT5Reranker): The re-ranker to use.
         nkeep (int): How many of the top documents to return.
-        device: The device to run the model on.
-        batch_size (int): Batch size. Default 64.
+        cache (ScoreCache): Cache of scores. Default None.
 
     Returns:
         List[Dict[str, Any]]: Reranked and (possibly) truncated list of
             documents.
     """
 
-    def chunks(lst: List[str], k: int) -> Generator[List[str], None, None]:
-        for i in range(0, len(lst), k):
-            yield lst[i : i + k]
-
-    texts = [" ".join(d["abstract"]) for d in docs]
-    scores = []
-    for batch in chunks(texts, batch_size):
-        scores.extend(perform_rerank(claim, batch, model, tokenizer, device))
+    scores = score_docs([claim], [docs], reranker, cache)[0]
     sdocs = sorted(zip(docs, scores), key=lambda x: x[-1], reverse=True)
-    docs, _ = zip(*sdocs)
-    return list(docs)[:nkeep]
+    return [d for d, _ in sdocs][:nkeep]
 
 
-# Code derived from parts of https://github.com/castorini/pygaggle,
-# mainly https://github.com/castorini/pygaggle/blob/dcfaacbff62298da39098ff0d296dc541fadcc9c/pygaggle/rerank/transformer.py#L98
-def perform_rerank(
-    query: str,
-    texts: List[str],
-    model: AutoModelForSeq2SeqLM,
-    tokenizer: AutoTokenizer,
-    device: str,
-) -> List[float]:
-    """Takes a ranking and re-ranks it using a specified model.
+def rerank_many(
+    claims: List[str],
+    docs: List[List[Dict[str, Any]]],
+    reranker: MonoT5Reranker,
+    nkeep: int,
+    cache: ScoreCache = None,
+) -> List[List[Dict[str, Any]]]:
+    """Re-ranks the documents of several claims together, so that batches
+    are filled with (claim, document) pairs from different claims, and
+    returns the top nkeep documents of each claim.
 
     Args:
-        query (str): The claim.
-        rankings (List[str]): Initial texts to rank.
-        model (AutoModelForSeq2SeqLM): Model to use for re-ranking
-        tokenizer (AutoTokenizer): Tokenizer to tokenize the text.
-        device (str): Device to use.
+        claims (List[str]): The claims.
+        docs (List[List[Dict[str, Any]]]): The documents of each claim.
+        reranker (MonoT5Reranker): The re-ranker to use.
+        nkeep (int): How many of the top documents to return per claim.
+        cache (ScoreCache): Cache of scores. Default None.
 
     Returns:
-        List[float]: Returns a list of scores.
+        List[List[Dict[str, Any]]]: Reranked and (possibly) truncated list of
+            documents for each claim.
     """
 
-    model.to(device)
-    model.eval()
-
-    data = [f"'Query: {query} Document: {text} Relevant:'" for text in texts]
-    input = tokenizer.batch_encode_plus(
-        data,
-        return_attention_mask=True,
-        padding="longest",
-        truncation=True,
-        return_tensors="pt",
-        max_length=512,
-    )
-    input["tokens"] = list(map(tokenizer.tokenize, data))
-    input_ids = input["input_ids"].to(device)
-    attention = input["attention_mask"].to(device)
-
-    with torch.no_grad():
-        decode_ids = torch.full(
-            (input_ids.size(0), 1),
-            model.config.decoder_start_token_id,
-            dtype=torch.long,
-        ).to(device)
-        input = model.get_encoder()(input_ids, attention_mask=attention)
-        input = model.prepare_inputs_for_generation(
-            decode_ids,
-            encoder_outputs=input,
-            past=None,
-            attention_mask=attention,
-            use_cache=True,
-        )
-        outputs = model(**input)
-        scores = outputs[0][:, -1, :]
-
-    token_false_id = tokenizer.get_vocab()["▁false"]
-    token_true_id = tokenizer.get_vocab()["▁true"]
-    scores = scores[:, [token_false_id, token_true_id]]
-    scores = torch.nn.functional.log_softmax(scores, dim=1)
-
-    return scores[:, 1].tolist()
+    ranked = []
+    all_scores = score_docs(claims, docs, reranker, cache, packed=True)
+    for cdocs, scores in zip(docs, all_scores):
+        sdocs = sorted(zip(cdocs, scores), key=lambda x: x[-1], reverse=True)
+        ranked.append([d for d, _ in sdocs][:nkeep])
+    return ranked
 
 
 def write_claim(
@@ -412,81 +565,250 @@ def write_claim(
     )
 
 
-def write_doc(
-    file: TextIO, doc: Dict[str, Any], written_docs: List[int]
-) -> None:
-    """Writes the given document representation to the given file.
+class CorpusWriter:
+    """Writes documents to the corpus file, each document only once."""
+
+    def __init__(self, file: TextIO) -> None:
+        """
+        Args:
+            file (TextIO): File to write to.
+        """
+
+        self.file = file
+        self.written: Set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self.written)
+
+    def write(self, doc: Dict[str, Any]) -> None:
+        """Writes the given document representation, unless a document with
+        the same id was already written.
+
+        Args:
+            doc (Dict[str, Any]): Document to write to file.
+        """
+
+        if doc["doc_id"] not in self.written:
+            self.file.write(json.dumps(doc) + "\n")
+            self.written.add(doc["doc_id"])
+
+
+def search_hits(
+    args: argparse.Namespace, searcher: LuceneSearcher, texts: List[str]
+) -> Generator[List[Hit], None, None]:
+    """Searches the BM25 index, and the dense index if given, for each of the
+    claims.
 
     Args:
-        file (TextIO): File to write to.
-        doc (Dict[str, Any]): Document to write to file.
-        written_docs (List[int]): Document already written to file.
+        args (argparse.Namespace): The provided arguments.
+        searcher (LuceneSearcher): The searcher to use.
+        texts (List[str]): The claims.
+
+    Yields:
+        List[Hit]: The hits for each claim, in the order of the claims.
     """
 
-    if doc["doc_id"] not in written_docs:
-        file.write(json.dumps(doc) + "\n")
-        written_docs.append(doc["doc_id"])
+    k = args.ninit if args.ninit else args.nkeep
+    all_hits = search(searcher, texts, k, args.threads, args.chunk_size)
+    if args.dense_index:
+        dense_index = DenseIndex(args.dense_index)
+        encoder = DenseEncoder(
+            dense_index.meta["model"],
+            args.device if args.device else "cpu",
+            max_length=dense_index.meta["max_length"],
+        )
+        all_hits = dense_search(
+            searcher,
+            dense_index,
+            encoder,
+            texts,
+            k,
+            all_hits if args.dense_mode == "hybrid" else None,
+            args.nprobe,
+            args.chunk_size,
+        )
+    for hits in all_hits:
+        yield parse_hits(hits)
 
 
-def retrieval(args: argparse.Namespace) -> None:
-    """Performs the actual retrival based on the given arguments.
+def load_reranker(
+    args: argparse.Namespace,
+) -> Tuple[MonoT5Reranker, ScoreCache]:
+    """Loads the re-ranker and its score cache, if re-ranking.
 
     Args:
         args (argparse.Namespace): The provided arguments.
+
+    Returns:
+        MonoT5Reranker: The re-ranker, None if not re-ranking.
+        ScoreCache: Cache of scores, None if not given.
     """
 
-    download("averaged_perceptron_tagger")
-    download("maxent_ne_chunker")
-    download("words")
-    download("stopwords")
+    if not args.rerank:
+        return None, None
+    reranker = MonoT5Reranker(
+        device=args.device,
+        batch_size=args.batch_size,
+        precision=args.precision,
+        token_budget=args.token_budget,
+    )
+    if not args.score_cache:
+        return reranker, None
+    score_cache = ScoreCache(
+        args.score_cache,
+        reranker.model_name,
+        reranker.max_length,
+        reranker.precision,
+        args.score_cache_size,
+    )
+    return reranker, score_cache
 
-    searcher = LuceneSearcher(args.index)
 
-    file_type = args.input.split(".")[-1]
-    if file_type == "jsonl":
-        claims = pd.read_json(Path(args.input), lines=True)
-    elif file_type == "json":
-        claims = pd.read_json(Path(args.input))
-    else:
-        claims = pd.read_csv(Path(args.input), delimiter=args.delimiter)
+def pipeline_stages(
+    args: argparse.Namespace,
+    cache: CorpusIdCache = None,
+    store: SentenceStore = None,
+    reranker: MonoT5Reranker = None,
+    score_cache: ScoreCache = None,
+) -> List[Callable[[Any], Chunk]]:
+    """Returns the stages the chunks of claims pass through: processing their
+    hits and, if re-ranking, re-ranking their documents.
+
+    Args:
+        args (argparse.Namespace): The provided arguments.
+        cache (CorpusIdCache): Cache of resolved ids. Default None.
+        store (SentenceStore): Store of precomputed sentences. Default None.
+        reranker (MonoT5Reranker): The re-ranker, None if not re-ranking.
+            Default None.
+        score_cache (ScoreCache): Cache of scores. Default None.
+
+    Returns:
+        List[Callable[[Any], Chunk]]: The stages.
+    """
+
+    def process_chunk(chunk: List[Tuple[int, str, List[Hit]]]) -> Chunk:
+        indices, chunk_claims, chunk_hits = zip(*chunk)
+        return indices, chunk_claims, process_batch(chunk_hits, cache, store)
+
+    def rerank_chunk(chunk: Chunk) -> Chunk:
+        indices, chunk_claims, chunk_docs = chunk
+        if args.token_budget:
+            chunk_docs = rerank_many(
+                chunk_claims, chunk_docs, reranker, args.nkeep, score_cache
+            )
+        else:
+            chunk_docs = [
+                rerank(claim, docs, reranker, args.nkeep, score_cache)
+                for claim, docs in zip(chunk_claims, chunk_docs)
+            ]
+        return indices, chunk_claims, chunk_docs
+
+    return [process_chunk] + ([rerank_chunk] if reranker is not None else [])
 
-    if args.rerank:
-        model_name = "castorini/monot5-base-med-msmarco"
-        tokenizer = AutoTokenizer.from_pretrained(model_name)
-        model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
 
-    written_docs = []
+def write_results(
+    args: argparse.Namespace, nclaims: int, chunks: Iterable[Chunk]
+) -> int:
+    """Writes the claims and their documents as the chunks come out of the
+    pipeline.
+
+    Args:
+        args (argparse.Namespace): The provided arguments.
+        nclaims (int): Number of claims, for the progress bar.
+        chunks (Iterable[Chunk]): The chunks of claims and their documents.
+
+    Returns:
+        int: Number of unique documents written.
+    """
+
     with open(Path(args.output_claims), "w") as cl, open(
         Path(args.output_corpus), "w"
     ) as co:
-        for index, row in tqdm(claims.iterrows(), total=claims.shape[0]):
-            claim = row[args.claim_col]
-            hits = searcher.search(
-                claim, args.ninit if args.ninit else args.nkeep
-            )
-            docs = process_hits(hits)
-            if args.rerank:
-                docs = rerank(
-                    claim,
-                    docs,
-                    model,
-                    tokenizer,
-                    args.nkeep,
-                    args.device,
-                    args.batch_size,
-                )
-            write_claim(cl, index, claim, docs)
-            for d in docs:
-                write_doc(co, d, written_docs)
-
-        if args.device != "cpu":
-            del model
-            torch.cuda.empty_cache()
+        writer = CorpusWriter(co)
+        progress = tqdm(total=nclaims)
+        for indices, chunk_claims, chunk_docs in chunks:
+            for index, claim, docs in zip(indices, chunk_claims, chunk_docs):
+                write_claim(cl, index, claim, docs)
+                for d in docs:
+                    writer.write(d)
+            progress.update(len(indices))
+        progress.close()
+    return len(writer)
+
+
+def print_statistics(
+    ndocs: int,
+    cache: CorpusIdCache = None,
+    store: SentenceStore = None,
+    score_cache: ScoreCache = None,
+) -> None:
+    """Prints the statistics of the retrieval, closing the caches.
+
+    Args:
+        ndocs (int): Number of unique documents kept.
+        cache (CorpusIdCache): Cache of resolved ids. Default None.
+        store (SentenceStore): Store of precomputed sentences. Default None.
+        score_cache (ScoreCache): Cache of scores. Default None.
+    """
 
     print("Done")
-    print("Number of unique documents kept:", len(written_docs))
+    print("Number of unique documents kept:", ndocs)
     print("Number of documents without corpusid:", nunavail)
     print("Number of documents where corpusid not resolved:", nmissed)
+    print("Number of Semantic Scholar API requests:", utility.request_count())
+    if cache is not None:
+        print("Number of corpusid cache hits:", cache.hits)
+        print("Number of corpusid cache misses:", cache.misses)
+        cache.close()
+    if store is not None:
+        print("Number of abstracts found in sentence store:", store.hits)
+        print("Number of abstracts not in sentence store:", store.misses)
+    if score_cache is not None:
+        hits, total = score_cache.hits, score_cache.hits + score_cache.misses
+        rate = hits / total if total else 0.0
+        saved = score_cache.time_saved
+        print(f"Score cache hit rate: {rate:.1%} ({hits}/{total})")
+        print(f"Re-ranking time saved by score cache: {saved:.1f}s")
+        score_cache.close()
+
+
+def retrieval(args: argparse.Namespace) -> None:
+    """Performs the actual retrival based on the given arguments.
+
+    Args:
+        args (argparse.Namespace): The provided arguments.
+    """
+
+    download("averaged_perceptron_tagger")
+    download("maxent_ne_chunker")
+    download("words")
+    download("stopwords")
+
+    searcher = LuceneSearcher(args.index)
+    cache = CorpusIdCache(args.id_cache) if args.id_cache else None
+    store = SentenceStore(args.sentence_store) if args.sentence_store else None
+    if args.graph_store:
+        graph_store.configure(args.graph_store)
+    reranker, score_cache = load_reranker(args)
+
+    claims = load_claims(args.input, args.delimiter)
+    texts = claims[args.claim_col].tolist()
+    # Searching runs on this thread, as it calls into the JVM, while
+    # processing and re-ranking run in their own threads, so the next chunk
+    # is searched and processed while the current one is re-ranked. Chunks
+    # still come out in order.
+    rows = zip(claims.index, texts, search_hits(args, searcher, texts))
+    chunks = run_pipeline(
+        batched(rows, args.chunk_size),
+        pipeline_stages(args, cache, store, reranker, score_cache),
+        args.queue_size,
+    )
+    ndocs = write_results(args, claims.shape[0], chunks)
+
+    if reranker is not None and args.device != "cpu":
+        del reranker
+        torch.cuda.empty_cache()
+    print_statistics(ndocs, cache, store, score_cache)
 
 
 def main() -> None:
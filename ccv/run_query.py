@@ -13,14 +13,21 @@ import hashlib
 import json
 import os
 import sys
+from typing import Any, Dict, Iterator, Tuple
 
 from feature_visualization import get_features
+from prediction_cache import PredictionCache
 from retrieval import retrieval
-from stance_evidence import produce_files
+from stance_evidence import iter_pairs, write_pairs
+from stance_predictor import (
+    LongCheckerSession,
+    document_entries,
+    format_prediction,
+    write_stances,
+)
 
 sys.path.append("longchecker/")
 sys.path.append("longchecker/longchecker/")
-from longchecker.predict import get_predictions
 from longchecker.util import load_jsonl, write_jsonl
 
 
@@ -45,6 +52,11 @@ def get_args() -> argparse.Namespace:
         help="device to run the models on.",
         default="cuda:0",
     )
+    parser.add_argument(
+        "--write_pairs",
+        action="store_true",
+        help="also write the files of the evidence pairs and their stances.",
+    )
     args = parser.parse_args()
 
     if not args.exe_id:
@@ -83,13 +95,31 @@ def run_retrieval(claim: str, exe_id: str, device: str) -> None:
     args.rerank = True
     args.device = device
     args.batch_size = 100
+    args.precision = "fp32"
+    args.token_budget = 32768
+    args.id_cache = "data/corpusid_cache.sqlite"
+    args.score_cache = "data/score_cache.sqlite"
+    args.score_cache_size = 1_000_000
+    args.sentence_store = (
+        "data/sentence_store" if os.path.exists("data/sentence_store") else None
+    )
+    args.dense_index = (
+        "data/dense_index" if os.path.exists("data/dense_index") else None
+    )
+    args.graph_store = (
+        "data/graph_store" if os.path.exists("data/graph_store") else None
+    )
+    args.dense_mode = "hybrid"
+    args.nprobe = 64
+    args.threads = 8
+    args.chunk_size = 64
+    args.queue_size = 2
 
     retrieval(args)
 
 
 # modified version of format_predictions from longchecker/predict.py
-def format_predictions(args, predictions_all):
-    claims = load_jsonl(args.input_file)
+def format_predictions(claims, predictions_all):
     claim_ids = [x["id"] for x in claims]
     assert len(claim_ids) == len(set(claim_ids))
 
@@ -97,19 +127,8 @@ def format_predictions(args, predictions_all):
 
     # Dict keyed by claim.
     for prediction in predictions_all:
-        # If it's NEI, skip it.
-        if prediction["predicted_label"] == "NEI":
-            continue
-
-        # Add prediction.
-        formatted_entry = {
-            prediction["abstract_id"]: {
-                "label": prediction["predicted_label"],
-                "label_probs": prediction["label_probs"],
-                "sentences": prediction["predicted_rationale"],
-                "sentences_probs": prediction["rationale_probs"],
-            }
-        }
+        # Add prediction, nothing if it's NEI.
+        formatted_entry = format_prediction(prediction)
         formatted[prediction["claim_id"]].update(formatted_entry)
 
     # Convert to jsonl.
@@ -121,77 +140,80 @@ def format_predictions(args, predictions_all):
     return res
 
 
-def stance_document(exe_id: str, device: str) -> None:
+def stance_document(exe_id: str, session: LongCheckerSession) -> None:
     """Runs stance prediction for each retrieved evidence for the
     current execution instance.
 
     Args:
         exe_id (str): The execution id.
-        device (str): The device to run the model on.
+        session (LongCheckerSession): The loaded longchecker model.
     """
 
-    args = argparse.Namespace()
-    args.checkpoint_path = "longchecker/checkpoints/covidfact.ckpt"
-    args.input_file = f"data/{exe_id}/ds_claims.jsonl"
-    args.corpus_file = f"data/{exe_id}/ds_corpus.jsonl"
-    args.output_file = f"data/{exe_id}/ds_result.jsonl"
-    args.batch_size = 1
-    args.device = device
-    args.num_workers = 4
-    args.no_nei = False
-    args.force_rationale = False
-    args.debug = False
+    claims = load_jsonl(f"data/{exe_id}/ds_claims.jsonl")
+    corpus = load_jsonl(f"data/{exe_id}/ds_corpus.jsonl")
 
-    predictions = get_predictions(args)
-    data = format_predictions(args, predictions)
+    entries = document_entries(claims, corpus)
+    predictions = session.predict(entries, "document", token_budget=8192)
+    data = format_predictions(claims, predictions)
 
-    write_jsonl(data, args.output_file)
+    write_jsonl(data, f"data/{exe_id}/ds_result.jsonl")
 
 
-def stance_evidence(exe_id: str, device: str) -> None:
-    """Produces the files needed to predict the stances between the evidences.
+def stance_evidence(
+    exe_id: str,
+    session: LongCheckerSession,
+    device: str,
+    write_files: bool = False,
+) -> Iterator[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """Predicts the stances between the evidences, handing the pairs of
+    evidences to longchecker in memory.
 
     Args:
         exe_id (str): The execution id.
-        device (str): The device to run the model on.
-    """
+        session (LongCheckerSession): The loaded longchecker model.
+        device (str): The device to run the models on.
+        write_files (bool): Whether to also write the files of the pairs and
+            their stances, as longchecker would read and write them. Default
+            False.
 
-    output_claims = f"data/{exe_id}/es_claims.jsonl"
-    output_corpus = f"data/{exe_id}/es_corpus.jsonl"
+    Returns:
+        Iterator[Tuple[Dict[str, Any], Dict[str, Any]]]: The stances, predicted
+            as they are consumed.
+    """
 
     args = argparse.Namespace()
-    args.oclaims = output_claims
-    args.ocorpus = output_corpus
-    args.omap = f"data/{exe_id}/es_map.json"
-    args.claims = f"data/{exe_id}/ds_claims.jsonl"
     args.corpus = f"data/{exe_id}/ds_corpus.jsonl"
     args.predictions = f"data/{exe_id}/ds_result.jsonl"
-
-    produce_files(args)
-
-    args = argparse.Namespace()
-    args.checkpoint_path = "longchecker/checkpoints/covidfact.ckpt"
-    args.input_file = output_claims
-    args.corpus_file = output_corpus
-    args.output_file = f"data/{exe_id}/es_result.jsonl"
-    args.batch_size = 1
+    args.pairs = "all"
+    args.top_k = 3
+    args.similarity = "tfidf"
+    args.dense_model = "pritamdeka/S-PubMedBert-MS-MARCO"
     args.device = device
-    args.num_workers = 4
-    args.no_nei = False
-    args.force_rationale = False
-    args.debug = False
 
-    predictions = get_predictions(args)
-    data = format_predictions(args, predictions)
+    pairs = iter_pairs(args)
+    if write_files:
+        pairs = write_pairs(
+            pairs,
+            f"data/{exe_id}/es_claims.jsonl",
+            f"data/{exe_id}/es_corpus.jsonl",
+            f"data/{exe_id}/es_map.npy",
+        )
 
-    write_jsonl(data, args.output_file)
+    stances = session.predict_stances(pairs, token_budget=8192)
+    if write_files:
+        stances = write_stances(stances, f"data/{exe_id}/es_result.jsonl")
+    return stances
 
 
-def feature_visualization(exe_id: str) -> None:
+def feature_visualization(
+    exe_id: str, stances: Iterator[Tuple[Dict[str, Any], Dict[str, Any]]]
+) -> None:
     """Extracts features used for visualization.
 
     Args:
         exe_id (str): The execution id.
+        stances (Iterator[Tuple[Dict[str, Any], Dict[str, Any]]]): The
+            stances between the evidences, from stance_evidence.
     """
 
     args = argparse.Namespace()
@@ -200,32 +222,57 @@ def feature_visualization(exe_id: str) -> None:
     args.corpus = f"data/{exe_id}/ds_corpus.jsonl"
     args.predictions = f"data/{exe_id}/ds_result.jsonl"
     args.erelations = f"data/{exe_id}/es_result.jsonl"
-    args.emap = f"data/{exe_id}/es_map.json"
+    args.emap = f"data/{exe_id}/es_map.npy"
+    args.metadata_cache = "data/metadata_cache.sqlite"
+    args.offline = False
+    args.graph_store = (
+        "data/graph_store" if os.path.exists("data/graph_store") else None
+    )
+    args.workers = 4
 
-    get_features(args)
+    get_features(args, stances)
 
 
-def run_query(claim: str, exe_id: str, device: str) -> None:
+def run_query(
+    claim: str, exe_id: str, device: str, write_files: bool = False
+) -> None:
     """Runs the pipeline on the provided claim.
 
     Args:
         claim (str): The claim.
         exe_id (str): The execution id.
         device (str): The device to run the model on.
+        write_files (bool): Whether to also write the files of the evidence
+            pairs and their stances. Default False.
     """
 
     os.makedirs(f"data/{exe_id}", exist_ok=True)
     run_retrieval(claim, exe_id, device)
-    stance_document(exe_id, device)
-    stance_evidence(exe_id, device)
-    feature_visualization(exe_id)
+    # Both stances are predicted by the same model, loaded once.
+    cache = PredictionCache("data/prediction_cache.sqlite")
+    session = LongCheckerSession(
+        "longchecker/checkpoints/covidfact.ckpt", device, cache=cache
+    )
+    stance_document(exe_id, session)
+    stances = stance_evidence(exe_id, session, device, write_files)
+    feature_visualization(exe_id, stances)
+    if write_files:
+        # The graphs stop reading the stances at the last claim they are
+        # built for, the files are complete once every stance is written.
+        for _ in stances:
+            pass
+    print("Longchecker:")
+    print(session.summary())
+    print("Prediction cache:")
+    print(cache.summary())
+    cache.close()
 
 
 def main() -> None:
     """Executes the script."""
 
     args = get_args()
-    run_query(args.claim, args.exe_id, args.device)
+    run_query(args.claim, args.exe_id, args.device, args.write_pairs)
 
 
 if __name__ == "__main__":
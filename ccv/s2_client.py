@@ -0,0 +1,482 @@
+"""Asynchronous client for the Semantic Scholar Academic Graph API. Requests
+share a pool of connections, are paced by a token bucket sized for the rate
+limit of the API (with or without an API key), and failed or rate limited
+requests are retried a bounded number of times with jittered exponential
+backoff, honouring Retry-After when the API sends it.
+
+SyncS2Client runs a client on an event loop in a background thread, so that
+synchronous code such as utility.get_request can use it, including from
+several threads at once.
+
+The shared client can record the responses of a run to a fixture store and
+replay them later without the API, set by environment variables:
+    CCV_HTTP_MODE: "live" (default), "record" or "replay".
+    CCV_HTTP_FIXTURES: Path to the fixture store, default
+        "data/http_fixtures.sqlite".
+    CCV_HTTP_LATENCY: Seconds each replayed response takes, default 0.
+    CCV_HTTP_THROTTLE: If n > 0, every nth replayed request is rate limited,
+        default 0.
+Replayed requests are paced by the token bucket like live ones, so e.g.
+    CCV_HTTP_MODE=replay CCV_HTTP_LATENCY=0.2 python ccv/run_query.py ...
+replays a recorded run as if the API took 200 ms per request, at the rate
+limit for requests without an API key.
+"""
+
+
+import asyncio
+import atexit
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+from http_fixtures import FixtureStore
+
+# (requests per second, burst) allowed with and without an API key.
+KEYED_LIMIT = (1.0, 1)
+UNKEYED_LIMIT = (100 / 300, 100)  # 100 requests per 5 minutes.
+RETRY_STATUSES = {403, 420, 429, 500, 502, 503, 504}
+MODES = ["live", "record", "replay"]
+
+
+class TokenBucket:
+    """Allows at most rate acquisitions per second on average, with bursts
+    of at most capacity acquisitions."""
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        """
+        Args:
+            rate (float): Tokens added per second.
+            capacity (float): Max number of tokens held.
+        """
+
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Waits until a token is available and takes it."""
+
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.last) * self.rate
+                )
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """Empties the bucket so the next token is only available after the
+        given number of seconds, used when the API asks to slow down.
+
+        Args:
+            seconds (float): Seconds to wait.
+        """
+
+        self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+
+def retry_after(value: Optional[str]) -> Optional[float]:
+    """Parses the value of a Retry-After header.
+
+    Args:
+        value (Optional[str]): Seconds or an http date, if the header is set.
+
+    Returns:
+        Optional[float]: Seconds to wait, None if not given or not valid.
+    """
+
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class S2Client:
+    """Sends requests to the API over pooled connections. Must be used as an
+    async context manager, which opens and closes the connections."""
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        rate: Optional[float] = None,
+        burst: Optional[float] = None,
+        max_concurrency: int = 8,
+        max_retries: int = 8,
+        base_delay: float = 2.0,
+        max_delay: float = 300.0,
+        timeout: float = 60.0,
+        counts: Optional[Counter] = None,
+        mode: str = "live",
+        fixtures: Optional[str] = None,
+        latency: float = 0.0,
+        throttle: int = 0,
+    ) -> None:
+        """
+        Args:
+            api_key (Optional[str]): The API key, if any. Default None.
+            rate (Optional[float]): Requests per second, by default the limit
+                for requests with or without a key. Default None.
+            burst (Optional[float]): Max requests sent at once after being
+                idle, by default the burst for requests with or without a
+                key. Default None.
+            max_concurrency (int): Max number of requests in flight. Default 8.
+            max_retries (int): Max number of retries of a request. Default 8.
+            base_delay (float): Seconds to wait before the first retry, doubled
+                for every following retry. Default 2.0.
+            max_delay (float): Max seconds to wait before a retry. Default
+                300.0.
+            timeout (float): Seconds before a request times out. Default 60.0.
+            counts (Optional[Counter]): Counter to count the requests sent,
+                retried and failed in, a new one if None. Default None.
+            mode (str): "live" to send requests to the API, "record" to also
+                store the responses in the fixture store, "replay" to answer
+                requests from the fixture store. Default "live".
+            fixtures (Optional[str]): Path to the fixture store, required to
+                record or replay. Default None.
+            latency (float): Seconds each replayed response takes. Default
+                0.0.
+            throttle (int): If n > 0, every nth replayed request is rate
+                limited. Default 0.
+        """
+
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode {mode!r}, expected one of {MODES}")
+        if mode != "live" and not fixtures:
+            raise ValueError(f"Mode {mode!r} requires a fixture store!")
+
+        default_rate, default_burst = KEYED_LIMIT if api_key else UNKEYED_LIMIT
+        self.api_key = api_key
+        self.rate = rate if rate is not None else default_rate
+        self.burst = burst if burst is not None else default_burst
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.counts = counts if counts is not None else Counter()
+        self.mode = mode
+        self.fixtures = fixtures
+        self.latency = latency
+        self.throttle = throttle
+        self.replayed = 0
+
+    async def __aenter__(self) -> "S2Client":
+        self.bucket = TokenBucket(self.rate, self.burst)
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.max_concurrency),
+            headers={"x-api-key": self.api_key} if self.api_key else None,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+        self.store = None
+        if self.mode != "live":
+            self.store = FixtureStore(self.fixtures)
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.session.close()
+        self.session = None
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+    def backoff(self, attempt: int, wait: Optional[float]) -> float:
+        """Returns the seconds to wait before retrying.
+
+        Args:
+            attempt (int): Number of the attempt that failed, starting at 0.
+            wait (Optional[float]): Seconds the API asked to wait, if any.
+
+        Returns:
+            float: Seconds to wait.
+        """
+
+        delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+        if wait is not None:
+            return wait + random.uniform(0, self.base_delay)
+        return random.uniform(delay / 2, delay)
+
+    async def replay(
+        self, method: str, url: str, data: Optional[Dict[str, Any]]
+    ) -> Tuple[int, str]:
+        """Answers a request with the recorded response, after the injected
+        latency, or with a rate limit response if it is throttled.
+
+        Args:
+            method (str): The http method.
+            url (str): The URL.
+            data (Optional[Dict[str, Any]]): The data sent as JSON.
+
+        Returns:
+            Tuple[int, str]: The status and body of the response.
+        """
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.replayed += 1
+        if self.throttle and self.replayed % self.throttle == 0:
+            return 429, "Too Many Requests"
+        response = self.store.get(method, url, data)
+        if response is None:
+            raise KeyError(f"No recorded response to {method} {url}")
+        return response
+
+    async def request(
+        self, method: str, url: str, data: Optional[Dict[str, Any]] = None
+    ) -> Any:
+        """Sends a request, retrying it if it fails or is rate limited.
+
+        Args:
+            method (str): The http method.
+            url (str): URL to send request to.
+            data (Optional[Dict[str, Any]]): Data to send as JSON. Default
+                None.
+
+        Returns:
+            Any: Request response as JSON, {} if the request failed.
+        """
+
+        for attempt in range(self.max_retries + 1):
+            await self.bucket.acquire()
+            status, text, wait = None, "", None
+            async with self.semaphore:
+                self.counts["requests"] += 1
+                if self.mode == "replay":
+                    status, text = await self.replay(method, url, data)
+                else:
+                    try:
+                        async with self.session.request(
+                            method, url, json=data
+                        ) as r:
+                            status = r.status
+                            text = await r.text()
+                            wait = retry_after(r.headers.get("Retry-After"))
+                    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                        text = repr(e)
+            if self.mode == "record" and (
+                status is not None and status not in RETRY_STATUSES
+            ):
+                self.store.put(method, url, data, status, text)
+            if status == 200:
+                return json.loads(text)
+            if status is not None and status not in RETRY_STATUSES:
+                print(text)
+                self.counts["failures"] += 1
+                return {}
+            if attempt < self.max_retries:
+                delay = self.backoff(attempt, wait)
+                if wait is not None:
+                    self.bucket.pause(delay)
+                self.counts["retries"] += 1
+                await asyncio.sleep(delay)
+        print(f"Giving up on {url} after {self.max_retries} retries: {text}")
+        self.counts["failures"] += 1
+        return {}
+
+    async def get(self, url: str) -> Any:
+        """Sends a http GET request.
+
+        Args:
+            url (str): URL to send request to.
+
+        Returns:
+            Any: Request response as JSON, {} if the request failed.
+        """
+
+        return await self.request("GET", url)
+
+    async def post(self, url: str, data: Dict[str, Any]) -> Any:
+        """Sends a http POST request with the given JSON data.
+
+        Args:
+            url (str): URL to send request to.
+            data (Dict[str, Any]): Data to send as JSON.
+
+        Returns:
+            Any: Request response as JSON, {} if the request failed.
+        """
+
+        return await self.request("POST", url, data)
+
+
+class SyncS2Client:
+    """Synchronous façade of S2Client, running it on an event loop in a
+    background thread. Can be used from several threads at once."""
+
+    def __init__(self, **kwargs: Any) -> None:
+        """
+        Args:
+            **kwargs (Any): Arguments of S2Client.
+        """
+
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.client = S2Client(**kwargs)
+        self.run(self.client.__aenter__())
+
+    def run(self, coroutine: Any) -> Any:
+        """Runs the coroutine on the client's event loop and waits for it.
+
+        Args:
+            coroutine (Any): The coroutine.
+
+        Returns:
+            Any: The result of the coroutine.
+        """
+
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    @property
+    def counts(self) -> Counter:
+        """Number of requests sent, retried and failed."""
+
+        return self.client.counts
+
+    def get(self, url: str) -> Any:
+        """Sends a http GET request.
+
+        Args:
+            url (str): URL to send request to.
+
+        Returns:
+            Any: Request response as JSON, {} if the request failed.
+        """
+
+        return self.run(self.client.get(url))
+
+    def post(self, url: str, data: Dict[str, Any]) -> Any:
+        """Sends a http POST request with the given JSON data.
+
+        Args:
+            url (str): URL to send request to.
+            data (Dict[str, Any]): Data to send as JSON.
+
+        Returns:
+            Any: Request response as JSON, {} if the request failed.
+        """
+
+        return self.run(self.client.post(url, data))
+
+    def get_many(self, urls: List[str]) -> List[Any]:
+        """Sends http GET requests to all the given URLs concurrently.
+
+        Args:
+            urls (List[str]): URLs to send requests to.
+
+        Returns:
+            List[Any]: Response of each request as JSON, {} if it failed.
+        """
+
+        async def gather() -> List[Any]:
+            return await asyncio.gather(*[self.client.get(u) for u in urls])
+
+        return self.run(gather())
+
+    def close(self) -> None:
+        """Closes the connections and stops the event loop."""
+
+        self.run(self.client.__aexit__())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+counts = Counter()  # requests, retries and failures of the shared client.
+client: Optional[SyncS2Client] = None
+client_key: Tuple[Optional[str], Tuple[Tuple[str, Any], ...]] = (None, ())
+client_lock = threading.Lock()
+client_options: Dict[str, Any] = {}
+
+
+def configure(**kwargs: Any) -> None:
+    """Sets the arguments of S2Client used by get_client, replacing the
+    current client.
+
+    Args:
+        **kwargs (Any): Arguments of S2Client, except api_key.
+    """
+
+    global client
+
+    with client_lock:
+        client_options.clear()
+        client_options.update(kwargs)
+        if client is not None:
+            client.close()
+            client = None
+
+
+def http_options() -> Dict[str, Any]:
+    """Returns the arguments of S2Client set by the CCV_HTTP_* environment
+    variables, see the module docstring.
+
+    Returns:
+        Dict[str, Any]: The arguments.
+    """
+
+    return {
+        "mode": os.environ.get("CCV_HTTP_MODE", "live"),
+        "fixtures": os.environ.get(
+            "CCV_HTTP_FIXTURES", "data/http_fixtures.sqlite"
+        ),
+        "latency": float(os.environ.get("CCV_HTTP_LATENCY", 0)),
+        "throttle": int(os.environ.get("CCV_HTTP_THROTTLE", 0)),
+    }
+
+
+def get_client() -> SyncS2Client:
+    """Returns the shared client, created on first use with the API key in
+    the SS_API_KEY environment variable, and the arguments set by the
+    CCV_HTTP_* environment variables and configure.
+
+    Returns:
+        SyncS2Client: The client.
+    """
+
+    global client
+    global client_key
+
+    options = {**http_options(), **client_options}
+    key = (os.environ.get("SS_API_KEY"), tuple(options.items()))
+    with client_lock:
+        if client is None or key != client_key:
+            if client is not None:
+                client.close()
+            client = SyncS2Client(api_key=key[0], counts=counts, **options)
+            client_key = key
+        return client
+
+
+def close_client() -> None:
+    """Closes the shared client, if it was created."""
+
+    global client
+
+    with client_lock:
+        if client is not None:
+            client.close()
+            client = None
+
+
+atexit.register(close_client)
@@ -0,0 +1,183 @@
+"""Persistent cache of re-ranker scores, so that (claim, document) pairs that
+have already been scored by the same model, at the same precision, are not
+scored again."""
+
+import hashlib
+import sqlite3
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+Key = Tuple[str, int]  # (claim, doc_id)
+# Number of pairs looked up per query, below the SQLite variable limit.
+LOOKUP_SIZE = 400
+
+
+def claim_hash(claim: str) -> str:
+    """Hashes the claim after normalizing its unicode and whitespace, neither
+    of which changes how the re-ranker tokenizes the claim.
+
+    Args:
+        claim (str): The claim.
+
+    Returns:
+        str: The hash of the normalized claim.
+    """
+
+    claim = " ".join(unicodedata.normalize("NFC", claim).split())
+    return hashlib.sha1(claim.encode()).hexdigest()
+
+
+class ScoreCache:
+    """SQLite backed cache keyed by (claim hash, doc_id, model name,
+    max_length, precision). When holding more than max_entries scores, the
+    least recently used ones are evicted."""
+
+    def __init__(
+        self,
+        path: str,
+        model_name: str,
+        max_length: int,
+        precision: str,
+        max_entries: int = 1_000_000,
+    ) -> None:
+        """
+        Args:
+            path (str): Path to the cache file, created if it does not exist.
+            model_name (str): Name of the re-ranker model.
+            max_length (int): Max number of tokens of the re-ranker inputs.
+            precision (str): Precision the re-ranker runs at, one of
+                reranker.PRECISIONS.
+            max_entries (int): Max number of scores to keep. Default
+                1,000,000.
+        """
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS scores ("
+            "claim TEXT NOT NULL, "
+            "doc_id INTEGER NOT NULL, "
+            "model TEXT NOT NULL, "
+            "max_length INTEGER NOT NULL, "
+            "precision TEXT NOT NULL, "
+            "score REAL NOT NULL, "
+            "last_used INTEGER NOT NULL, "
+            "PRIMARY KEY (claim, doc_id, model, max_length, precision))"
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS scores_last_used ON scores (last_used)"
+        )
+        self.conn.commit()
+        self.model_name = model_name
+        self.max_length = max_length
+        self.precision = precision
+        self.max_entries = max_entries
+        self.clock = self.conn.execute(
+            "SELECT COALESCE(MAX(last_used), 0) FROM scores"
+        ).fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+        self.scored = 0
+        self.scoring_time = 0.0
+
+    def get_many(self, keys: Iterable[Key]) -> Dict[Key, float]:
+        """Looks up the scores of the given pairs, marking them as used.
+
+        Args:
+            keys (Iterable[Key]): (claim, doc_id) pairs to look up.
+
+        Returns:
+            Dict[Key, float]: The scores of the pairs found in the cache.
+        """
+
+        self.clock += 1
+        keys = list(keys)
+        hashes: Dict[Tuple[str, int], List[Key]] = defaultdict(list)
+        for claim, doc_id in dict.fromkeys(keys):
+            hashes[(claim_hash(claim), int(doc_id))].append((claim, doc_id))
+        pairs = list(hashes)
+        model = (self.model_name, self.max_length, self.precision)
+
+        found = {}
+        for i in range(0, len(pairs), LOOKUP_SIZE):
+            chunk = pairs[i : i + LOOKUP_SIZE]
+            rows = self.conn.execute(
+                "SELECT claim, doc_id, score FROM scores WHERE model = ? "
+                "AND max_length = ? AND precision = ? AND (claim, doc_id) IN "
+                f"(VALUES {', '.join(['(?, ?)'] * len(chunk))})",
+                (*model, *(x for pair in chunk for x in pair)),
+            ).fetchall()
+            for claim, doc_id, score in rows:
+                for key in hashes[(claim, doc_id)]:
+                    found[key] = score
+            self.conn.executemany(
+                "UPDATE scores SET last_used = ? WHERE claim = ? "
+                "AND doc_id = ? AND model = ? AND max_length = ? "
+                "AND precision = ?",
+                [
+                    (self.clock, claim, doc_id, *model)
+                    for claim, doc_id, _ in rows
+                ],
+            )
+        self.conn.commit()
+        hits = sum(key in found for key in keys)
+        self.hits += hits
+        self.misses += len(keys) - hits
+        return found
+
+    def put_many(
+        self, scores: Dict[Key, float], seconds: Optional[float] = None
+    ) -> None:
+        """Stores the given scores, evicting the least recently used scores
+        if the cache grows too large.
+
+        Args:
+            scores (Dict[Key, float]): The score of each (claim, doc_id) pair.
+            seconds (Optional[float]): Time it took to compute the scores,
+                used to estimate the time saved by the cache. Default None.
+        """
+
+        self.clock += 1
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    claim_hash(claim),
+                    doc_id,
+                    self.model_name,
+                    self.max_length,
+                    self.precision,
+                    score,
+                    self.clock,
+                )
+                for (claim, doc_id), score in scores.items()
+            ],
+        )
+        excess = (
+            self.conn.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+            - self.max_entries
+        )
+        if excess > 0:
+            self.conn.execute(
+                "DELETE FROM scores WHERE rowid IN (SELECT rowid FROM scores "
+                "ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+        self.conn.commit()
+        if seconds is not None:
+            self.scored += len(scores)
+            self.scoring_time += seconds
+
+    @property
+    def time_saved(self) -> float:
+        """Estimated seconds saved by the cache, based on the average time it
+        took to score a pair that was not in the cache."""
+
+        if not self.scored:
+            return 0.0
+        return self.hits * self.scoring_time / self.scored
+
+    def close(self) -> None:
+        """Closes the cache file."""
+
+        self.conn.close()
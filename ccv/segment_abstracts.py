@@ -0,0 +1,184 @@
+"""Splits the abstracts of the indexed CORD-19 documents into sentences.
+Running the script segments the whole index once and saves the sentences as
+a sentence_store.SentenceStore.
+
+example usage:
+    python ccv/segment_abstracts.py \
+        --index "./anserini/indexes/lucene-index-cord19-abstract-2022-02-07" \
+        --output "./data/sentence_store" \
+        --workers 8
+"""
+
+
+import argparse
+import json
+import re
+from multiprocessing import Pool
+from typing import Dict, List, Tuple
+
+from nltk import (
+    corpus,
+    ne_chunk,
+    pos_tag,
+    word_tokenize,
+    sent_tokenize,
+    download,
+)
+from nltk.tree import Tree
+from pyserini.search.lucene import LuceneSearcher
+from tqdm import tqdm
+
+from sentence_store import write_store
+
+
+def get_args() -> argparse.Namespace:
+    """Returns the given arguments.
+
+    Returns:
+        argparse.Namespace: The arguments.
+    """
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--index", type=str, help="index file path", required=True
+    )
+    parser.add_argument(
+        "--output", type=str, help="store folder to create", required=True
+    )
+    parser.add_argument(
+        "--workers", type=int, help="number of processes to use", default=1
+    )
+
+    return parser.parse_args()
+
+
+def split_fullstopless(text: str) -> List[str]:
+    """Tries to split text without fullstops into sentences.
+
+    Args:
+        text (str): Text without fullstops
+
+    Returns:
+        List[str]: List of produced sentences
+    """
+
+    tokens = word_tokenize(text.replace(".", ""))
+    chunks = ne_chunk(pos_tag(tokens))
+
+    # Lowercase entities
+    tokens = []
+    for c in chunks:
+        if isinstance(c, Tree):
+            tokens.append(" ".join([w for w, _ in c.leaves()]).lower())
+        else:
+            tokens.append(c[0])
+
+    # Combine words with special tokens.
+    new_tokens = []
+    for i, token in enumerate(tokens):
+        if token in "?!.,:;'\"-%)" or token == "'s":
+            new_tokens[-1] = new_tokens[-1] + token
+        elif i != 0 and new_tokens[-1] == "(":
+            new_tokens[-1] = new_tokens[-1] + token
+        else:
+            new_tokens.append(token)
+
+    # Detect spaces after lower-case character and before capitalized word.
+    text = " ".join(new_tokens)
+    regex = r"(?<=[a-z])\s(?=\b[A-Z][a-z]+\b)"
+    sentences = re.split(regex, text)
+
+    # If last word in sentence is a stopword, continue sentence.
+    new_sentences = []
+    for i, s in enumerate(sentences):
+        if i != 0 and word_tokenize(new_sentences[-1])[
+            -1
+        ] in corpus.stopwords.words("english"):
+            new_sentences[-1] = new_sentences[-1] + " " + s
+        else:
+            new_sentences.append(s)
+
+    # Add fullstops to sentences.
+    new_sentences = [s + "." for s in new_sentences]
+    return new_sentences
+
+
+def get_sentences(
+    metadata: Dict[str, str],
+) -> List[str]:
+    """Retrieves sentences from a hit's abstract.
+
+    Args:
+        hit (Dict[str, Any]): The metadata associated with the hit to retrieve
+            abstract sentences from.
+
+    Returns:
+        List[str]: The sentences from a hit's abstract.
+    """
+
+    abstract = metadata["abstract"]
+    sentences = sent_tokenize(abstract)
+
+    # Sometimes the abstract has missing fullstops, tries to salvage that.
+    if len(sentences) == 1:
+        sentences = split_fullstopless(abstract)
+
+    return sentences
+
+
+def segment(doc: Tuple[str, str]) -> Tuple[str, List[str]]:
+    """Splits the abstract of the given document into sentences.
+
+    Args:
+        doc (Tuple[str, str]): The docid and raw contents of the document.
+
+    Returns:
+        Tuple[str, List[str]]: The docid and sentences of the document.
+    """
+
+    docid, raw = doc
+    return docid, get_sentences(json.loads(raw)["csv_metadata"])
+
+
+def build(index: str, output: str, workers: int = 1) -> None:
+    """Segments the abstracts of all documents in the index and saves them as
+    a sentence store.
+
+    Args:
+        index (str): Path to the index.
+        output (str): Path to the store folder to create.
+        workers (int): Number of processes to use. Default 1.
+    """
+
+    searcher = LuceneSearcher(index)
+    docs = (
+        (d.docid(), d.raw())
+        for d in (searcher.doc(i) for i in range(searcher.num_docs))
+    )
+
+    with Pool(workers) as pool:
+        write_store(
+            output,
+            tqdm(
+                pool.imap(segment, docs, chunksize=256),
+                total=searcher.num_docs,
+            ),
+        )
+
+
+def main() -> None:
+    """Executes the script."""
+
+    args = get_args()
+
+    download("punkt")
+    download("averaged_perceptron_tagger")
+    download("maxent_ne_chunker")
+    download("words")
+    download("stopwords")
+
+    build(args.index, args.output, args.workers)
+
+
+if __name__ == "__main__":
+    main()
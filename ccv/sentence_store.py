@@ -0,0 +1,92 @@
+"""Store of the sentences of the abstracts of the indexed CORD-19 documents,
+which retrieval memory-maps and looks the sentences of its hits up in,
+instead of segmenting the abstracts of the hits of every claim. The store is
+built once for the whole index by segment_abstracts.py.
+
+The store is a folder containing:
+    keys.npy: The sorted docids of the index.
+    starts.npy, ends.npy: The range of sentences of each docid.
+    offsets.npy: The byte offset of each sentence in sentences.bin.
+    sentences.bin: All sentences as one utf-8 encoded string.
+"""
+
+
+import mmap
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+class SentenceStore:
+    """Memory-mapped sentences of abstracts, keyed by docid."""
+
+    def __init__(self, path: str) -> None:
+        """
+        Args:
+            path (str): Path to the store folder.
+        """
+
+        path = Path(path)
+        self.keys = np.load(path / "keys.npy", mmap_mode="r")
+        self.starts = np.load(path / "starts.npy", mmap_mode="r")
+        self.ends = np.load(path / "ends.npy", mmap_mode="r")
+        self.offsets = np.load(path / "offsets.npy", mmap_mode="r")
+        with open(path / "sentences.bin", "rb") as f:
+            empty = f.seek(0, 2) == 0
+            self.blob = b""
+            if not empty:
+                self.blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, docid: str) -> Optional[List[str]]:
+        """Looks up the sentences of the abstract of the given document.
+
+        Args:
+            docid (str): The docid of the document in the index.
+
+        Returns:
+            Optional[List[str]]: The sentences, None if not in the store.
+        """
+
+        key = docid.encode()
+        i = int(np.searchsorted(self.keys, key))
+        if i == len(self.keys) or self.keys[i] != key:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return [
+            self.blob[self.offsets[s] : self.offsets[s + 1]].decode()
+            for s in range(self.starts[i], self.ends[i])
+        ]
+
+
+def write_store(output: str, docs: Iterable[Tuple[str, List[str]]]) -> None:
+    """Saves the sentences of the given documents as a sentence store.
+
+    Args:
+        output (str): Path to the store folder to create.
+        docs (Iterable[Tuple[str, List[str]]]): The docid and sentences of
+            each document.
+    """
+
+    output = Path(output)
+    output.mkdir(parents=True, exist_ok=True)
+    keys, starts, ends, offsets = [], [], [], [0]
+    with open(output / "sentences.bin", "wb") as blob:
+        for docid, sentences in docs:
+            keys.append(docid)
+            starts.append(len(offsets) - 1)
+            for s in sentences:
+                data = s.encode()
+                blob.write(data)
+                offsets.append(offsets[-1] + len(data))
+            ends.append(len(offsets) - 1)
+
+    keys = np.array(keys, dtype=np.bytes_)
+    order = np.argsort(keys, kind="stable")
+    np.save(output / "keys.npy", keys[order])
+    np.save(output / "starts.npy", np.array(starts, dtype=np.int64)[order])
+    np.save(output / "ends.npy", np.array(ends, dtype=np.int64)[order])
+    np.save(output / "offsets.npy", np.array(offsets, dtype=np.int64))
@@ -1,23 +1,51 @@
-"""Takes claims, corpus and results of the predictions using longchecker and
+"""Takes the corpus and results of the predictions using longchecker and
 outputs the files needed to run longchecker for stance detection between
-evidence sentences for each claim.
+evidence sentences for each claim. The claims themselves are not needed.
+
+Which pairs of evidence sentences (rationales) of different documents are
+written is chosen by a pair strategy:
+    all: Every ordered pair, so the stance is predicted in both directions.
+    symmetric: Every unordered pair once, the predicted stance is mirrored.
+    top_k: Only the pairs where one rationale is among the --top_k rationales
+        most similar to the other, by the cosine of their TF-IDF vectors or
+        dense embeddings, as unordered pairs with the stance mirrored.
+
+Mirroring changes the graphs built by feature_visualization.py. With all,
+create_graph keeps a pair with a stance in one direction only as a one-way
+link, and drops a pair whose directions disagree. A mirrored stance is always
+a bidirectional link.
+
+The claim map, mapping the id of each pair to its claim and evidences, is
+written as a binary map (see pair_map.py) if its file ends in .npy, else as
+JSON.
 
 example usage:
     python ccv/stance_evidence.py \
         --oclaims "./data/eclaims.jsonl" \
         --ocorpus "./data/ecorpus.jsonl" \
-        --omap "./data/emap.json" \
-        --claims "./data/predict_claims.jsonl" \
+        --omap "./data/emap.npy" \
         --corpus "./data/predict_corpus.jsonl" \
-        --predictions "./data/predict_result.jsonl"
+        --predictions "./data/predict_result.jsonl" \
+        --pairs "top_k" \
+        --top_k 3
 """
 
 
 import argparse
 import json
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
 import pandas as pd
 from tqdm import tqdm
 
+from pair_map import evidence_doc_id, pair_rows, save_pair_map
+
+PAIR_STRATEGIES = ["all", "symmetric", "top_k"]
+SIMILARITIES = ["tfidf", "dense"]
+
 
 def get_args() -> argparse.Namespace:
     """Returns the given arguments.
@@ -35,107 +63,376 @@ def get_args() -> argparse.Namespace:
         "--ocorpus", type=str, help="output corpus file", required=True
     )
     parser.add_argument(
-        "--omap", type=str, help="output claim map file", required=True
+        "--omap",
+        type=str,
+        help="output claim map file, binary if ending in .npy else JSON",
+        required=True,
     )
-    parser.add_argument("--claims", type=str, help="claims file", required=True)
     parser.add_argument("--corpus", type=str, help="corpus file", required=True)
     parser.add_argument(
         "--predictions", type=str, help="predictions file", required=True
     )
+    parser.add_argument(
+        "--pairs",
+        type=str,
+        choices=PAIR_STRATEGIES,
+        help="which pairs of evidences to write",
+        default="all",
+    )
+    parser.add_argument(
+        "--top_k",
+        type=int,
+        help="number of most similar evidences kept per evidence with top_k",
+        default=3,
+    )
+    parser.add_argument(
+        "--similarity",
+        type=str,
+        choices=SIMILARITIES,
+        help="similarity of evidences used by top_k",
+        default="tfidf",
+    )
+    parser.add_argument(
+        "--dense_model",
+        type=str,
+        help="embedding model of the dense similarity",
+        default="pritamdeka/S-PubMedBert-MS-MARCO",
+    )
+    parser.add_argument(
+        "--device", type=str, help="device to embed on", default="cpu"
+    )
 
     return parser.parse_args()
 
 
-def produce_files(args: argparse.Namespace) -> None:
-    """Produces the files needed to predict the stances between the evidences.
+def tfidf_vectors(texts: List[str]) -> np.ndarray:
+    """Computes the normalized TF-IDF vectors of the given texts, with the
+    document frequencies counted over the texts themselves.
+
+    Args:
+        texts (List[str]): The texts.
+
+    Returns:
+        np.ndarray: The vector of each text, one per row.
+    """
+
+    vocabulary = {}
+    rows, columns, counts = [], [], []
+    for row, text in enumerate(texts):
+        for word, count in Counter(re.findall(r"\w+", text.lower())).items():
+            rows.append(row)
+            columns.append(vocabulary.setdefault(word, len(vocabulary)))
+            counts.append(count)
+    tf = np.zeros((len(texts), len(vocabulary)), dtype=np.float32)
+    tf[rows, columns] = counts
+    df = (tf > 0).sum(0)
+    vectors = tf * (np.log((1 + len(texts)) / (1 + df)) + 1)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def select_pairs(
+    doc_nums: List[int],
+    strategy: str,
+    vectors: Optional[np.ndarray] = None,
+    k: int = 3,
+) -> List[Tuple[int, int, bool]]:
+    """Selects the pairs of evidences of different documents to predict the
+    stance between.
+
+    Args:
+        doc_nums (List[int]): The document of each evidence.
+        strategy (str): One of PAIR_STRATEGIES.
+        vectors (Optional[np.ndarray]): Normalized vector of each evidence,
+            required by top_k. Default None.
+        k (int): Number of most similar evidences kept per evidence by top_k.
+            Default 3.
+
+    Returns:
+        List[Tuple[int, int, bool]]: The first and second evidence of each
+            pair, in the order of the first then the second evidence, and
+            whether the stance of the pair is to be mirrored.
+    """
+
+    doc_nums = np.asarray(doc_nums)
+    other = doc_nums[:, None] != doc_nums[None, :]
+    if strategy == "all":
+        keep = other
+    elif strategy == "symmetric":
+        keep = np.triu(other, 1)
+    elif strategy == "top_k":
+        similarities = np.where(other, vectors @ vectors.T, -np.inf)
+        top = np.argsort(-similarities, axis=1, kind="stable")[:, :k]
+        rows = np.arange(len(doc_nums))[:, None]
+        keep = np.zeros_like(other)
+        keep[rows, top] = other[rows, top]
+        keep = np.triu(keep | keep.T, 1)
+    else:
+        raise ValueError(f"Unknown pair strategy {strategy}!")
+    mirror = strategy != "all"
+    return [(i, j, mirror) for i, j in zip(*np.nonzero(keep))]
+
+
+def claim_evidences(
+    claim_num: int, evidence_dict: Dict[str, Any], corpus: pd.DataFrame
+) -> Tuple[List[str], List[Tuple[int, int, str]], List[Dict[str, Any]]]:
+    """Collects the evidences of the documents of a claim.
+
+    Args:
+        claim_num (int): The claim.
+        evidence_dict (Dict[str, Any]): The prediction of longchecker for
+            each evidence document of the claim.
+        corpus (pd.DataFrame): The corpus, indexed by doc_id.
+
+    Returns:
+        Tuple[List[str], List[Tuple[int, int, str]], List[Dict[str, Any]]]:
+            The doc_id of each document, the document number, evidence number
+            and text of each evidence, and the entry of each evidence in the
+            evidence corpus.
+    """
+
+    doc_ids, evidences, entries = [], [], []
+    for doc_num, (doc_id, evidence) in enumerate(evidence_dict.items()):
+        doc_ids.append(doc_id)
+        abstract = corpus.loc[int(doc_id)]["abstract"]
+        for evidence_num, s in enumerate(evidence["sentences"]):
+            evidences.append((doc_num, evidence_num, abstract[s]))
+            entries.append(
+                {
+                    "doc_id": evidence_doc_id(claim_num, doc_num, evidence_num),
+                    "title": None,
+                    "abstract": [abstract[s]],
+                }
+            )
+    return doc_ids, evidences, entries
+
+
+def evidence_vectors(
+    args: argparse.Namespace, texts: List[str], encoder: Any
+) -> Optional[np.ndarray]:
+    """Computes the vectors of the evidences of a claim that top_k compares.
 
     Args:
         args (argparse.Namespace): The provided arguments.
+        texts (List[str]): The text of each evidence.
+        encoder (Any): The DenseEncoder of the dense similarity, None for
+            TF-IDF.
+
+    Returns:
+        Optional[np.ndarray]: The normalized vector of each evidence, None if
+            the pair strategy does not need them.
+    """
+
+    if args.pairs != "top_k":
+        return None
+    if encoder is None:
+        return tfidf_vectors(texts)
+    return encoder.encode(texts)
+
+
+def pair_records(
+    claim_num: int,
+    doc_ids: List[str],
+    evidences: List[Tuple[int, int, str]],
+    entries: List[Dict[str, Any]],
+    selected: List[Tuple[int, int, bool]],
+    first_id: int,
+) -> List[Dict[str, Any]]:
+    """Builds the records of the selected pairs of evidences of a claim.
+
+    Args:
+        claim_num (int): The claim.
+        doc_ids (List[str]): The doc_id of each document, from
+            claim_evidences.
+        evidences (List[Tuple[int, int, str]]): The evidences, from
+            claim_evidences.
+        entries (List[Dict[str, Any]]): The entries of the evidences, from
+            claim_evidences.
+        selected (List[Tuple[int, int, bool]]): The pairs, from select_pairs.
+        first_id (int): The id of the first pair.
+
+    Returns:
+        List[Dict[str, Any]]: The id, claim and doc_ids of the entry of each
+            pair in the evidence claims, and its link as in the claim map.
+    """
+
+    pairs = []
+    for id, (first, second, mirror) in enumerate(selected, first_id):
+        doc_num, evidence_num, e1 = evidences[first]
+        other_doc_num, other_evidence_num, _ = evidences[second]
+        pairs.append(
+            {
+                "id": id,
+                "claim": e1,
+                "doc_ids": [entries[second]["doc_id"]],
+                "link": {
+                    "claim_id": claim_num,
+                    "fdoc_id": doc_ids[doc_num],
+                    "fdoc_e_num": evidence_num,
+                    "sdoc_id": doc_ids[other_doc_num],
+                    "sdoc_e_num": other_evidence_num,
+                    "mirror": mirror,
+                },
+            }
+        )
+    return pairs
+
+
+def iter_pairs(
+    args: argparse.Namespace,
+) -> Iterator[Tuple[List[Dict[str, Any]], List[Dict[str, Any]], int]]:
+    """Selects the pairs of evidences to predict the stances between, one
+    claim at a time.
+
+    Args:
+        args (argparse.Namespace): The provided arguments.
+
+    Returns:
+        Iterator[Tuple[List[Dict[str, Any]], List[Dict[str, Any]], int]]: For
+            each claim with evidence, the evidences as entries of the evidence
+            corpus, the selected pairs and the number of pairs of evidences of
+            different documents. Each pair has the id, claim and doc_ids of
+            its entry in the evidence claims, and its link as in the claim
+            map.
     """
 
-    claims = pd.read_json(args.claims, lines=True).set_index("id")
     corpus = pd.read_json(args.corpus, lines=True).set_index("doc_id")
     predictions = pd.read_json(args.predictions, lines=True).set_index("id")
 
-    claim_map = {}
+    encoder = None
+    if args.pairs == "top_k" and args.similarity == "dense":
+        # Only imported when needed, as it loads torch and transformers.
+        from dense import DenseEncoder
+
+        encoder = DenseEncoder(args.dense_model, args.device)
+
     claim_count = 0
-    with open(args.ocorpus, "w") as ecorpus, open(args.oclaims, "w") as eclaims:
-        for claim_num, row in tqdm(
-            predictions.iterrows(), total=predictions.shape[0]
-        ):
-            evidence_dict = row.iloc[0]
-            if not evidence_dict:  # Did not find any evidence for claim.
-                continue
-
-            # Aggregate document information
-            info = {}
-            info["claim"] = claims.loc[claim_num][0]
-            info["docs"] = []
-            for doc_id, evidence in evidence_dict.items():
-                doc = corpus.loc[int(doc_id)]
-
-                d = {}
-                d["id"] = doc_id
-                d["label"] = evidence["label"]
-                d["evidence"] = [
-                    doc["abstract"][s] for s in evidence["sentences"]
-                ]
-                info["docs"].append(d)
-
-            docs = info["docs"]
-
-            # Produce all possible pairs of evidences, excluding pairs of
-            # evidences from same document.
-            for doc_num, d1 in enumerate(docs):
-                # For every evidence in document
-                for evidence_num, e1 in enumerate(d1["evidence"]):
-                    # Write to "evidence corpus"
-                    ecorpus.write(
-                        json.dumps(
-                            {
-                                "doc_id": int(
-                                    f"{claim_num+1}0{doc_num+1}0{evidence_num+1}"
-                                ),
-                                "title": None,
-                                "abstract": [e1],
-                            }
+    npairs = 0  # number of pairs of evidences of different documents.
+    for claim_num, row in tqdm(
+        predictions.iterrows(), total=predictions.shape[0]
+    ):
+        evidence_dict = row.iloc[0]
+        if not evidence_dict:  # Did not find any evidence for claim.
+            continue
+        doc_ids, evidences, entries = claim_evidences(
+            claim_num, evidence_dict, corpus
+        )
+        if not evidences:
+            continue
+        doc_nums = [doc_num for doc_num, _, _ in evidences]
+        sizes = np.bincount(doc_nums)
+        nclaim = len(evidences) ** 2 - int((sizes**2).sum())
+        npairs += nclaim
+
+        texts = [e for _, _, e in evidences]
+        vectors = evidence_vectors(args, texts, encoder)
+        # No need to check a document's evidences against each other.
+        selected = select_pairs(doc_nums, args.pairs, vectors, args.top_k)
+        pairs = pair_records(
+            claim_num, doc_ids, evidences, entries, selected, claim_count
+        )
+        claim_count += len(pairs)
+        yield entries, pairs, nclaim
+
+    ncut = npairs - claim_count
+    print(
+        f"Selected {claim_count} of {npairs} evidence pairs, cut {ncut} "
+        f"({100 * ncut / max(npairs, 1):.1f}%) using the {args.pairs} strategy."
+    )
+
+
+def write_pairs(
+    claim_pairs: Iterable[
+        Tuple[List[Dict[str, Any]], List[Dict[str, Any]], int]
+    ],
+    oclaims: str,
+    ocorpus: str,
+    omap: str,
+) -> Iterator[Tuple[List[Dict[str, Any]], List[Dict[str, Any]], int]]:
+    """Writes the evidence claims, evidence corpus and claim map files of the
+    pairs as they pass through, for longchecker to be run on the files.
+
+    Args:
+        claim_pairs (Iterable[Tuple[List[Dict[str, Any]],
+            List[Dict[str, Any]], int]]): The evidences and pairs of each
+            claim, from iter_pairs.
+        oclaims (str): Output claims file.
+        ocorpus (str): Output corpus file.
+        omap (str): Output claim map file, binary if ending in .npy else JSON.
+
+    Returns:
+        Iterator[Tuple[List[Dict[str, Any]], List[Dict[str, Any]], int]]: The
+            evidences and pairs of each claim.
+    """
+
+    binary = omap.endswith(".npy")
+    claim_map = {}  # JSON map.
+    rows = []  # rows of the binary map, by claim.
+    with open(ocorpus, "w") as ecorpus, open(oclaims, "w") as eclaims:
+        for entries, pairs, nclaim in claim_pairs:
+            for entry in entries:
+                ecorpus.write(json.dumps(entry) + "\n")
+            for pair in pairs:
+                # Write evidence pair
+                eclaims.write(
+                    json.dumps(
+                        {
+                            "id": pair["id"],
+                            "claim": pair["claim"],
+                            "doc_ids": pair["doc_ids"],
+                        }
+                    )
+                    + "\n"
+                )
+                link = pair["link"]
+                if not binary:
+                    claim_map[pair["id"]] = {
+                        k: v for k, v in link.items() if k != "mirror"
+                    }
+                    if link["mirror"]:
+                        claim_map[pair["id"]]["mirror"] = True
+            if binary and pairs:
+                # The binary map holds the doc_ids as integers.
+                rows.append(
+                    pair_rows(
+                        (
+                            pair["id"],
+                            pair["link"]["claim_id"],
+                            int(pair["link"]["fdoc_id"]),
+                            pair["link"]["fdoc_e_num"],
+                            int(pair["link"]["sdoc_id"]),
+                            pair["link"]["sdoc_e_num"],
+                            pair["link"]["mirror"],
                         )
-                        + "\n"
+                        for pair in pairs
                     )
+                )
+            yield entries, pairs, nclaim
+    if binary:
+        save_pair_map(omap, rows)
+    else:
+        with open(omap, "w") as emap:
+            emap.write(json.dumps(claim_map))
+
+
+def produce_files(args: argparse.Namespace) -> Tuple[int, int]:
+    """Produces the files needed to predict the stances between the evidences.
+
+    Args:
+        args (argparse.Namespace): The provided arguments.
+
+    Returns:
+        Tuple[int, int]: Number of evidence pairs written, and number of pairs
+            of evidences of different documents.
+    """
 
-                    # For every document
-                    for other_doc_num, d2 in enumerate(docs):
-                        if (
-                            other_doc_num == doc_num
-                        ):  # No need to check a document's evidences against each other.
-                            continue
-                        # For every evidence in other document.
-                        for other_evidence_num in range(len(d2["evidence"])):
-                            # Write evidence pair
-                            eclaims.write(
-                                json.dumps(
-                                    {
-                                        "id": claim_count,
-                                        "claim": e1,
-                                        "doc_ids": [
-                                            int(
-                                                f"{claim_num+1}0{other_doc_num+1}0{other_evidence_num+1}"
-                                            )
-                                        ],
-                                    }
-                                )
-                                + "\n"
-                            )
-                            claim_map[claim_count] = {
-                                "claim_id": claim_num,
-                                "fdoc_id": d1["id"],
-                                "fdoc_e_num": evidence_num,
-                                "sdoc_id": d2["id"],
-                                "sdoc_e_num": other_evidence_num,
-                            }
-                            claim_count += 1
-    with open(args.omap, "w") as emap:
-        emap.write(json.dumps(claim_map))
+    written, npairs = 0, 0
+    for _, pairs, nclaim in write_pairs(
+        iter_pairs(args), args.oclaims, args.ocorpus, args.omap
+    ):
+        written += len(pairs)
+        npairs += nclaim
+    return written, npairs
 
 
 def main():
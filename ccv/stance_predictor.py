@@ -0,0 +1,358 @@
+"""Predicts stances using longchecker in memory. A LongCheckerSession loads
+the model once and serves both the stances of the retrieved documents to the
+claims and the stances between evidence pairs.
+
+The pairs are taken as stance_evidence.iter_pairs selects them and the
+stances are handed to feature_visualization.get_features as they are
+predicted, instead of writing the evidence claims and corpus files for
+longchecker to read back, and its results for get_features to read back.
+
+Given a PredictionCache, the session only predicts the inputs not already in
+the cache, and predicts repeated inputs once.
+"""
+
+
+import json
+import sys
+import time
+from collections import defaultdict
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+sys.path.append("longchecker/")
+sys.path.append("longchecker/longchecker/")
+from longchecker.data import Collator, LongCheckerDataset, get_tokenizer
+from longchecker.model import LongCheckerModel
+from prediction_cache import PredictionCache, prediction_key
+
+CHUNK_SIZE = 1024  # number of pairs tensorized and predicted at a time.
+# Longformer pads its inputs to a multiple of its attention window, which is
+# what the inputs cost whatever their length.
+ATTENTION_WINDOW = 512
+
+
+def format_prediction(prediction: Dict[str, Any]) -> Dict[str, Any]:
+    """Formats a prediction of longchecker as the evidence of its claim, as
+    format_predictions of run_query.py does.
+
+    Args:
+        prediction (Dict[str, Any]): The prediction.
+
+    Returns:
+        Dict[str, Any]: The evidence, {} if the prediction is NEI.
+    """
+
+    if prediction["predicted_label"] == "NEI":
+        return {}
+    return {
+        prediction["abstract_id"]: {
+            "label": prediction["predicted_label"],
+            "label_probs": prediction["label_probs"],
+            "sentences": prediction["predicted_rationale"],
+            "sentences_probs": prediction["rationale_probs"],
+        }
+    }
+
+
+def pair_entries(
+    claim_pairs: Iterable[
+        Tuple[List[Dict[str, Any]], List[Dict[str, Any]], int]
+    ],
+) -> Iterator[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """Turns the selected pairs into the entries longchecker tensorizes.
+
+    Args:
+        claim_pairs (Iterable[Tuple[List[Dict[str, Any]],
+            List[Dict[str, Any]], int]]): The evidences and pairs of each
+            claim, from stance_evidence.iter_pairs.
+
+    Returns:
+        Iterator[Tuple[Dict[str, Any], Dict[str, Any]]]: The entry and link
+            of each pair.
+    """
+
+    for entries, pairs, _ in claim_pairs:
+        docs = {entry["doc_id"]: entry for entry in entries}
+        for pair in pairs:
+            for doc_id in pair["doc_ids"]:
+                doc = docs[doc_id]
+                entry = {
+                    "claim_id": pair["id"],
+                    "abstract_id": doc_id,
+                    "to_tensorize": {
+                        "claim": pair["claim"],
+                        "sentences": doc["abstract"],
+                        "title": doc["title"],
+                    },
+                }
+                yield entry, pair["link"]
+
+
+def document_entries(
+    claims: List[Dict[str, Any]], corpus: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """Turns the claims and their retrieved documents into the entries
+    longchecker tensorizes, as its reader does with the claims and corpus
+    files.
+
+    Args:
+        claims (List[Dict[str, Any]]): The claims, with the doc_ids of their
+            documents.
+        corpus (List[Dict[str, Any]]): The documents.
+
+    Returns:
+        List[Dict[str, Any]]: The entry of each claim and document.
+    """
+
+    docs = {doc["doc_id"]: doc for doc in corpus}
+    return [
+        {
+            "claim_id": claim["id"],
+            "abstract_id": doc_id,
+            "to_tensorize": {
+                "claim": claim["claim"],
+                "sentences": docs[doc_id]["abstract"],
+                "title": docs[doc_id]["title"],
+            },
+        }
+        for claim in claims
+        for doc_id in claim["doc_ids"]
+    ]
+
+
+def batches(
+    lengths: List[int],
+    batch_size: int = 1,
+    token_budget: Optional[int] = None,
+    multiple: int = ATTENTION_WINDOW,
+) -> Iterator[List[int]]:
+    """Splits inputs into batches of inputs of similar length, either of
+    batch_size inputs or of as many inputs as fit in the token budget when
+    padded.
+
+    Args:
+        lengths (List[int]): Number of tokens of each input.
+        batch_size (int): Batch size, if no token budget is given. Default 1.
+        token_budget (Optional[int]): If given, batches are filled with as
+            many inputs as fit in this many (padded) tokens, instead of
+            batch_size inputs. Default None.
+        multiple (int): Lengths are rounded up to a multiple of this, as the
+            model pads them. Default ATTENTION_WINDOW.
+
+    Yields:
+        List[int]: Indices of the inputs in the next batch.
+    """
+
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    if token_budget is None:
+        for i in range(0, len(order), batch_size):
+            yield order[i : i + batch_size]
+        return
+
+    batch, longest = [], 0
+    for i in order:
+        padded = -(-lengths[i] // multiple) * multiple
+        length = max(longest, padded)
+        if batch and (len(batch) + 1) * length > token_budget:
+            yield batch
+            batch, length = [], padded
+        batch.append(i)
+        longest = length
+    if batch:
+        yield batch
+
+
+class LongCheckerSession:
+    """Keeps longchecker and its tokenizer loaded, to predict the stances of
+    several stages, keeping track of the time each stage takes. Predictions
+    are looked up in, and stored to, the cache if one is given."""
+
+    def __init__(
+        self,
+        checkpoint_path: str,
+        device: str,
+        no_nei: bool = False,
+        cache: Optional[PredictionCache] = None,
+    ) -> None:
+        """
+        Args:
+            checkpoint_path (str): Path to the checkpoint.
+            device (str): The device to run the model on.
+            no_nei (bool): Whether to never predict NEI. Default False.
+            cache (Optional[PredictionCache]): Cache of predictions. Default
+                None.
+        """
+
+        start = time.perf_counter()
+        self.model = LongCheckerModel.load_from_checkpoint(
+            checkpoint_path=checkpoint_path
+        )
+        # If not predicting NEI, set the model label threshold to 0.
+        if no_nei:
+            self.model.label_threshold = 0.0
+        self.model.to(device)
+        self.model.eval()
+        self.model.freeze()
+        self.tokenizer = get_tokenizer()
+        self.collator = Collator(self.tokenizer)
+        self.cache = cache
+        if cache is not None:
+            # The predictions depend on the checkpoint and the label
+            # threshold.
+            digest = cache.checkpoint_digest(checkpoint_path)
+            self.model_digest = f"{digest}:no_nei={no_nei}"
+        self.load_time = time.perf_counter() - start
+        self.times = defaultdict(float)  # seconds predicting, by stage.
+        self.counts = defaultdict(int)  # number of entries, by stage.
+
+    def predict(
+        self,
+        entries: List[Dict[str, Any]],
+        stage: str,
+        batch_size: int = 1,
+        token_budget: Optional[int] = None,
+        force_rationale: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """Predicts the stances of the entries, batching entries of similar
+        length together. Each batch is only padded to its longest entry. With
+        a cache, only the entries not in the cache are predicted, each
+        distinct input once, and their predictions are stored.
+
+        Args:
+            entries (List[Dict[str, Any]]): The entries, as from
+                document_entries or pair_entries.
+            stage (str): The stage the time taken, and the hits and misses of
+                the cache, are counted towards.
+            batch_size (int): Batch size, if no token budget is given.
+                Default 1.
+            token_budget (Optional[int]): If given, batches are filled with as
+                many entries as fit in this many (padded) tokens. Default
+                None.
+            force_rationale (bool): Whether to always predict a rationale.
+                Default False.
+
+        Returns:
+            List[Dict[str, Any]]: The prediction of each entry, in the order
+                of the entries.
+        """
+
+        start = time.perf_counter()
+        keys, found = list(range(len(entries))), {}
+        if self.cache is not None:
+            model = f"{self.model_digest}:force_rationale={force_rationale}"
+            keys = [
+                prediction_key(model, entry["to_tensorize"])
+                for entry in entries
+            ]
+            found = self.cache.get_many(keys, stage)
+        # The first entry of each input not in the cache is predicted.
+        misses = {}
+        for i, key in enumerate(keys):
+            if key not in found:
+                misses.setdefault(key, i)
+        misses = list(misses.values())
+
+        dataset = LongCheckerDataset(
+            [entries[i] for i in misses], self.tokenizer
+        )
+        inputs = [dataset[i] for i in range(len(misses))]
+        lengths = [len(x["tokenized"]["input_ids"]) for x in inputs]
+        predicted = {}
+        for batch in batches(lengths, batch_size, token_budget):
+            collated = self.collator([inputs[i] for i in batch])
+            for i, prediction in zip(
+                batch, self.model.predict(collated, force_rationale)
+            ):
+                predicted[keys[misses[i]]] = prediction
+        if self.cache is not None and predicted:
+            self.cache.put_many(predicted)
+
+        found.update(predicted)
+        predictions = [
+            dict(
+                found[key],
+                claim_id=entry["claim_id"],
+                abstract_id=entry["abstract_id"],
+            )
+            for key, entry in zip(keys, entries)
+        ]
+        self.times[stage] += time.perf_counter() - start
+        self.counts[stage] += len(entries)
+        return predictions
+
+    def predict_stances(
+        self,
+        claim_pairs: Iterable[
+            Tuple[List[Dict[str, Any]], List[Dict[str, Any]], int]
+        ],
+        batch_size: int = 1,
+        token_budget: Optional[int] = None,
+    ) -> Iterator[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """Predicts the stances of the selected pairs, a chunk of pairs at a
+        time, counted towards the "evidence" stage.
+
+        Args:
+            claim_pairs (Iterable[Tuple[List[Dict[str, Any]],
+                List[Dict[str, Any]], int]]): The evidences and pairs of each
+                claim, from stance_evidence.iter_pairs.
+            batch_size (int): Batch size, if no token budget is given.
+                Default 1.
+            token_budget (Optional[int]): If given, batches are filled with as
+                many pairs as fit in this many (padded) tokens. Default None.
+
+        Returns:
+            Iterator[Tuple[Dict[str, Any], Dict[str, Any]]]: The evidence
+                predicted for each pair, as in the results of longchecker, and
+                its link, in the order of the pairs.
+        """
+
+        pairs = pair_entries(claim_pairs)
+        while True:
+            chunk = list(islice(pairs, CHUNK_SIZE))
+            if not chunk:
+                return
+            entries = [entry for entry, _ in chunk]
+            predictions = self.predict(
+                entries, "evidence", batch_size, token_budget
+            )
+            for prediction, (_, link) in zip(predictions, chunk):
+                yield format_prediction(prediction), link
+
+    def summary(self) -> str:
+        """Returns the time taken loading the model and predicting each
+        stage.
+
+        Returns:
+            str: The times, one line each.
+        """
+
+        lines = [f"load: {self.load_time:.1f}s"]
+        for stage, seconds in self.times.items():
+            count = self.counts[stage]
+            lines.append(
+                f"{stage}: {seconds:.1f}s, {count} inputs, "
+                f"{count / max(seconds, 1e-9):.1f} inputs/s"
+            )
+        return "\n".join(lines)
+
+
+def write_stances(
+    stances: Iterable[Tuple[Dict[str, Any], Dict[str, Any]]], path: str
+) -> Iterator[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """Writes the stances as they pass through, as the results of longchecker
+    ran on the files written by stance_evidence.write_pairs.
+
+    Args:
+        stances (Iterable[Tuple[Dict[str, Any], Dict[str, Any]]]): The
+            evidence and link of each pair, in the order of the pairs.
+        path (str): The results file.
+
+    Returns:
+        Iterator[Tuple[Dict[str, Any], Dict[str, Any]]]: The stances.
+    """
+
+    with open(path, "w") as f:
+        # The pairs are numbered from 0 in order.
+        for id, (evidence, link) in enumerate(stances):
+            f.write(json.dumps({"id": id, "evidence": evidence}) + "\n")
+            yield evidence, link
@@ -1,10 +1,14 @@
-import json
+import graph_store
 import os
-import requests
-import time
-from typing import Dict, Any
+import s2_client
+from typing import Any, Dict, Iterable, List, Tuple, Union
 
 
+api_url = os.environ.get(
+    "SS_API_URL", "https://api.semanticscholar.org/graph/v1"
+)
+batch_limit = 500  # max number of ids per request to the paper batch endpoint.
+
 type_map = {
     "s2": "",
     "doi": "",
@@ -15,34 +19,110 @@ type_map = {
     "pmc": "PMCID:",
 }
 
+# CORD-19 metadata columns holding other ids of a paper, and their id type, in
+# the order they are used to look up a paper's corpusid.
+id_keys = [
+    ("arxiv_id", "arxiv"),
+    ("doi", "doi"),
+    ("pubmed_id", "pubmed"),
+    ("pmcid", "pmc"),
+    ("mag_id", "mag"),
+    ("sha", "s2"),
+]
+
 
 def get_request(url: str) -> Dict[str, Any]:
-    """Sends a http request to the given URL. If return code 429 or 403, waits 60 seconds and tries again.
+    """Sends a http request to the given URL using the shared API client,
+    which paces requests and retries them when rate limited.
+
+    Args:
+        url (str): URL to send request to.
+
+    Returns:
+        Dict[str, Any]: Request response as JSON, {} if the request failed.
+    """
+
+    return s2_client.get_client().get(url)
+
+
+def get_requests(urls: List[str]) -> List[Dict[str, Any]]:
+    """Sends http requests to all the given URLs concurrently using the
+    shared API client.
+
+    Args:
+        urls (List[str]): URLs to send requests to.
+
+    Returns:
+        List[Dict[str, Any]]: Response of each request as JSON, {} if the
+            request failed.
+    """
+
+    return s2_client.get_client().get_many(urls)
+
+
+def post_request(url: str, data: Dict[str, Any]) -> Any:
+    """Sends a http POST request with the given JSON data to the given URL
+    using the shared API client.
 
     Args:
         url (str): URL to send request to.
+        data (Dict[str, Any]): Data to send as JSON.
+
+    Returns:
+        Any: Request response as JSON, {} if the request failed.
+    """
+
+    return s2_client.get_client().post(url, data)
+
+
+def request_count() -> int:
+    """Returns the number of requests sent to the API, including retries.
+
+    Returns:
+        int: The number of requests.
+    """
+
+    return s2_client.counts["requests"]
+
+
+def check_id_type(type: str) -> None:
+    """Checks that the type of id is known.
+
+    Args:
+        type (str): The type of id.
+
+    Raises:
+        ValueError: The type of id is not known.
+    """
+
+    if type not in type_map:
+        raise ValueError(f"{type} is not a known id type!")
+
+
+def format_id(id: str, type: str) -> str:
+    """Formats an id of the given type the way the Semantic Scholar API
+    expects it.
+
+    Args:
+        id (str): The id of the paper.
+        type (str): The type of id.
+
+    Raises:
+        ValueError: The type of id is not known.
 
     Returns:
-        Dict[str, Any]: Request response as JSON.
+        str: The formatted id.
     """
 
-    key = os.environ.get("SS_API_KEY")
-    headers = {"x-api-key": key} if key else None
-    r = requests.get(url, headers=headers)
-    if r.status_code in [420, 403, 504]:
-        print("Rate limited, waiting 5 minutes...")
-        time.sleep(60 * 5)
-        return get_request(url)
-    if r.status_code != 200:
-        print(r.text)
-        return {}
-    r = json.loads(r.text)
-    return r
+    check_id_type(type)
+    if type == "pmc":
+        return str(type_map[type]) + str(id)[3:]
+    return str(type_map[type]) + str(id)
 
 
 def get_corpusid(id: str, type: str) -> str:
     """Takes an id and the type of id and tries to find the associated papers
-        corpusid.
+        corpusid, in the graph store if there is one, or else using the API.
 
     Args:
         id (str): The id of the paper.
@@ -55,17 +135,59 @@ def get_corpusid(id: str, type: str) -> str:
         str: The corpusid of the paper, if found.
     """
 
-    if type not in type_map:
-        raise ValueError(f"{type} is not a known id type!")
-    if type == "pmc":
-        id = str(type_map[type]) + str(id)[3:]
-    else:
-        id = str(type_map[type]) + str(id)
-    url = f"https://api.semanticscholar.org/graph/v1/paper/{id}?fields=externalIds"
+    formatted = format_id(id, type)
+    store = graph_store.get_store()
+    if store is not None:
+        corpusid = store.corpusid(id, type)
+        if corpusid is not None:
+            return corpusid
+    url = f"{api_url}/paper/{formatted}?fields=externalIds"
     r = get_request(url)
     return r.get("externalIds", {}).get("CorpusId", "")
 
 
+def get_corpusids(
+    ids: Iterable[Tuple[str, str]]
+) -> Dict[Tuple[str, str], Union[int, str]]:
+    """Takes (type, id) pairs and tries to find the associated papers'
+    corpusids, looking them up in the graph store if there is one, and using
+    as few requests to the paper batch endpoint as possible for the rest.
+
+    Args:
+        ids (Iterable[Tuple[str, str]]): (type, id) pairs of papers.
+
+    Raises:
+        ValueError: A type of id is not known.
+
+    Returns:
+        Dict[Tuple[str, str], Union[int, str]]: The corpusid of each given
+            pair, "" if the paper was not found. Pairs part of a failed
+            request are left out.
+    """
+
+    ids = list(dict.fromkeys(ids))
+    for type in {type for type, _ in ids}:
+        check_id_type(type)
+    url = f"{api_url}/paper/batch?fields=externalIds"
+    result = {}
+    store = graph_store.get_store()
+    if store is not None:
+        for type, id in ids:
+            corpusid = store.corpusid(id, type)
+            if corpusid is not None:
+                result[(type, id)] = corpusid
+        ids = [k for k in ids if k not in result]
+    for i in range(0, len(ids), batch_limit):
+        chunk = ids[i : i + batch_limit]
+        r = post_request(url, {"ids": [format_id(id, t) for t, id in chunk]})
+        if not isinstance(r, list):
+            continue
+        for k, paper in zip(chunk, r):
+            paper = paper or {}
+            result[k] = (paper.get("externalIds") or {}).get("CorpusId", "")
+    return result
+
+
 def extract_nested_value(d: Dict, key: Any) -> Any:
     """Returns the value of the first occurrence of the given key in the given
         dictionary.
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The modules of ccv/ import each other by name, as when run as scripts.
+sys.path.append(os.path.join(os.path.dirname(__file__), "ccv"))
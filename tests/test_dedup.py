@@ -0,0 +1,34 @@
+import random
+from difflib import SequenceMatcher
+
+from dedup import find_duplicates, lcs_length, qgrams
+
+
+def pairwise(titles, threshold):
+    return [
+        (i, j)
+        for i in range(len(titles))
+        for j in range(i + 1, len(titles))
+        if SequenceMatcher(a=titles[i], b=titles[j]).ratio() >= threshold
+    ]
+
+
+def test_qgrams_number_repeats():
+    assert qgrams("aaa") == [("aa", 0), ("aa", 1)]
+
+
+def test_lcs_length():
+    assert lcs_length("abcbdab", "bdcaba") == 4
+    assert lcs_length("abc", "") == 0
+
+
+def test_find_duplicates_matches_pairwise():
+    random.seed(0)
+    words = ["covid", "sars", "ace2", "receptor", "binding", "cells", "a"]
+    titles = [
+        " ".join(random.choices(words, k=random.randint(1, 6)))
+        for _ in range(200)
+    ]
+    titles += ["", "x", "xy"]
+    for threshold in [0.6, 0.825, 0.95]:
+        assert find_duplicates(titles, threshold) == pairwise(titles, threshold)
@@ -0,0 +1,70 @@
+import json
+
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("pyserini")
+pytest.importorskip("transformers")
+from dense import DenseIndex, build_ivf, quantize, rrf  # noqa: E402
+
+
+def write_index(path, vectors, dtype):
+    with open(path / "meta.json", "w") as f:
+        json.dump({"model": "m", "max_length": 8, "dtype": dtype}, f)
+    docids = [f"d{i}" for i in range(len(vectors))]
+    np.save(path / "docids.npy", np.array(docids, dtype=np.bytes_))
+    if dtype == "int8":
+        values, scales = quantize(vectors)
+        np.save(path / "embeddings.npy", values)
+        np.save(path / "scales.npy", scales)
+    else:
+        np.save(path / "embeddings.npy", vectors.astype(dtype))
+
+
+def exact(vectors, queries, k):
+    scores = queries @ vectors.T
+    return [
+        [f"d{i}" for i in np.lexsort((np.arange(len(s)), -s))[:k]]
+        for s in scores
+    ]
+
+
+@pytest.fixture
+def vectors():
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(300, 16)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_rrf():
+    assert rrf([["a", "b", "c"], ["c", "a"]]) == ["a", "c", "b"]
+    assert rrf([]) == []
+
+
+def test_quantize(vectors):
+    values, scales = quantize(vectors)
+    assert values.dtype == np.int8
+    assert np.abs(values * scales[:, None] - vectors).max() <= scales.max()
+
+
+def test_search_in_blocks(tmp_path, vectors):
+    write_index(tmp_path, vectors, "float16")
+    index = DenseIndex(str(tmp_path), block_size=64)
+    queries = vectors[:5] + 0.01
+    expected = exact(index.vectors(slice(None)), queries, 10)
+    assert [[d for d, _ in r] for r in index.search(queries, 10)] == expected
+
+
+def test_ivf_scanning_all_partitions_is_exact(tmp_path, vectors):
+    write_index(tmp_path, vectors, "int8")
+    build_ivf(str(tmp_path), 8)
+    index = DenseIndex(str(tmp_path))
+    queries = vectors[:5]
+    expected = index.search(queries, 10)
+    for found, exact_found in zip(index.search(queries, 10, 8), expected):
+        assert [d for d, _ in found] == [d for d, _ in exact_found]
+        assert [s for _, s in found] == pytest.approx(
+            [s for _, s in exact_found], abs=1e-6
+        )
+    assert index.search(queries, 10, nprobe=1)[0][0][0] == "d0"
@@ -0,0 +1,431 @@
+import json
+
+import pytest
+
+import feature_visualization as fv
+import utility
+from metadata_cache import MetadataCache
+from pair_map import convert
+
+
+def paper(citations, authors):
+    return {
+        "citationCount": citations,
+        "influentialCitationCount": 0,
+        "authors": [
+            {
+                "authorId": str(a),
+                "name": f"author {a}",
+                "paperCount": None,
+                "citationCount": 1,
+                "hIndex": 2,
+            }
+            for a in authors
+        ],
+    }
+
+
+def test_process_papers_batches_and_falls_back(monkeypatch):
+    monkeypatch.setattr(fv.graph_store, "get_store", lambda: None)
+    monkeypatch.setattr(utility, "batch_limit", 2)
+    posted, fetched = [], []
+
+    def post_request(url, data):
+        posted.append(data["ids"])
+        # The batch endpoint does not return paper 2.
+        return [
+            None if id == "corpusid:2" else paper(int(id[9:]), [7])
+            for id in data["ids"]
+        ]
+
+    def get_request(url):
+        fetched.append(url.split("?")[0].split(":")[-1])
+        return paper(20, [8, 9])
+
+    monkeypatch.setattr(fv, "post_request", post_request)
+    monkeypatch.setattr(fv, "get_request", get_request)
+    result = fv.process_papers(["1", "2", "3", "1"])
+    assert posted == [["corpusid:1", "corpusid:2"], ["corpusid:3"]]
+    # The paper and authors of paper 2 are fetched on their own, together.
+    assert fetched == ["2"]
+    assert result["1"]["pinfo"] == {
+        "citationCount": 1,
+        "influentialCitationCount": 0,
+    }
+    assert result["2"]["pinfo"]["citationCount"] == 20
+    assert result["2"]["ainfo"] == {
+        "authors": {"8": "author 8", "9": "author 9"},
+        "paperCounts": [0, 0],
+        "citationCounts": [1, 1],
+        "hIndices": [2, 2],
+    }
+
+
+def test_parse_references_skips_papers_without_ids():
+    res = {
+        "data": [
+            {"citedPaper": {"externalIds": {"CorpusId": 5}}, "intents": []},
+            {"citedPaper": {"externalIds": None}, "intents": ["x"]},
+        ]
+    }
+    assert fv.parse_references(res) == {"5": {"intents": []}}
+
+
+def fake_api(monkeypatch):
+    """Answers paper batch and reference requests, counting them."""
+
+    calls = {"papers": [], "references": []}
+    monkeypatch.setattr(fv.graph_store, "get_store", lambda: None)
+
+    def post_request(url, data):
+        calls["papers"].extend(id[9:] for id in data["ids"])
+        return [paper(int(id[9:]), [1]) for id in data["ids"]]
+
+    def get_requests(urls):
+        ids = [url.split("/references")[0].split(":")[-1] for url in urls]
+        calls["references"].extend(ids)
+        return [
+            {"data": [{"citedPaper": {"externalIds": {"CorpusId": id}}}]}
+            for id in ids
+        ]
+
+    monkeypatch.setattr(fv, "post_request", post_request)
+    monkeypatch.setattr(fv, "get_requests", get_requests)
+    return calls
+
+
+def test_get_metadata_fetches_what_is_not_cached(tmp_path, monkeypatch):
+    calls = fake_api(monkeypatch)
+    cache = MetadataCache(str(tmp_path / "metadata.sqlite"))
+    cache.put_many([("1", "pinfo", {"cached": True})])
+    result = fv.get_metadata(["1", "2", "1"], cache)
+    assert list(result) == ["1", "2"]
+    assert result["1"]["pinfo"] == {"cached": True}
+    assert result["2"]["pinfo"]["citationCount"] == 2
+    assert result["2"]["rinfo"] == {"2": {}}
+    assert calls == {"papers": ["1", "2"], "references": ["1", "2"]}
+
+    # Everything is cached now, offline too.
+    calls["papers"].clear()
+    calls["references"].clear()
+    assert fv.get_metadata(["1", "2"], cache) == result
+    offline = MetadataCache(str(tmp_path / "metadata.sqlite"), offline=True)
+    assert fv.get_metadata(["2", "3"], offline) == {"2": result["2"]}
+    assert calls == {"papers": [], "references": []}
+
+
+def test_get_metadata_keeps_what_was_fetched_on_failure(tmp_path, monkeypatch):
+    fake_api(monkeypatch)
+
+    def get_requests(urls):
+        return [{"data": []}, {"error": "bad response"}]
+
+    monkeypatch.setattr(fv, "get_requests", get_requests)
+    cache = MetadataCache(str(tmp_path / "metadata.sqlite"))
+    with pytest.raises(KeyError):
+        fv.get_metadata(["1", "2"], cache)
+    assert cache.get("1", "pinfo")["citationCount"] == 1
+    assert cache.get("2", "ainfo")["authors"] == {"1": "author 1"}
+    assert cache.get("1", "rinfo") == {}
+    assert cache.get("2", "rinfo") is None
+
+
+def doc(aliases, references, authors):
+    return {
+        "aliases": aliases,
+        "ainfo": {"authors": {a: f"author {a}" for a in authors}},
+        "rinfo": {
+            r: {"isInfluential": r == "1", "intents": ["result"]}
+            for r in references
+        },
+    }
+
+
+def test_get_ref_links_follows_aliases():
+    dinfo = {
+        # References document 3 by an alias, as well as by its corpusid.
+        "1": doc([], ["30", "3", "99"], []),
+        "2": doc([], ["1", "3"], []),
+        "3": doc(["30"], [], []),
+    }
+    assert fv.get_ref_links(dinfo) == {
+        "1": [{"reference": "3", "isInfluential": False, "intent": ["result"]}],
+        "2": [
+            {"reference": "1", "isInfluential": True, "intent": ["result"]},
+            {"reference": "3", "isInfluential": False, "intent": ["result"]},
+        ],
+    }
+
+
+def test_get_aut_links_links_the_last_later_document():
+    dinfo = {
+        "1": doc([], [], ["a", "b"]),
+        "2": doc([], [], ["a"]),
+        "3": doc([], [], ["b", "c"]),
+        "4": doc([], [], ["d"]),
+    }
+    assert fv.get_aut_links(dinfo) == {
+        "1": {"doc": "3", "common": ["b"]},
+    }
+
+
+def stance(label):
+    return {
+        "0": {
+            "label": label,
+            "label_probs": [0.7, 0.1, 0.2],
+            "sentences_probs": [0.9],
+        }
+    }
+
+
+def pair(claim_id, fdoc_id, sdoc_id, mirror=False):
+    return {
+        "claim_id": claim_id,
+        "fdoc_id": fdoc_id,
+        "fdoc_e_num": 0,
+        "sdoc_id": sdoc_id,
+        "sdoc_e_num": 1,
+        "mirror": mirror,
+    }
+
+
+def write_jsonl(path, rows):
+    with open(path, "w") as f:
+        f.writelines(json.dumps(row) + "\n" for row in rows)
+
+
+def test_iter_evi_links_json_and_binary_maps_agree(tmp_path):
+    pairs = {
+        "0": pair(1, "10", "11", mirror=True),
+        "1": pair(1, "11", "12"),
+        "2": pair(3, "10", "12"),
+        "3": pair(3, "12", "10"),
+    }
+    with open(tmp_path / "emap.json", "w") as f:
+        json.dump(pairs, f)
+    convert(str(tmp_path / "emap.json"), str(tmp_path / "emap.npy"))
+    write_jsonl(
+        tmp_path / "erelations.jsonl",
+        [
+            {"id": 0, "evidence": stance("SUPPORT")},
+            {"id": 1, "evidence": {}},
+            {"id": 2, "evidence": stance("CONTRADICT")},
+            {"id": 3, "evidence": stance("SUPPORT")},
+        ],
+    )
+
+    erelations = str(tmp_path / "erelations.jsonl")
+    links = list(fv.iter_evi_links(erelations, str(tmp_path / "emap.json")))
+    assert [(id, len(claim_links)) for id, claim_links in links] == [
+        (1, 2),
+        (3, 2),
+    ]
+    # The stance of the first pair was predicted in one direction only.
+    first, mirrored = links[0][1]
+    assert (first["fdoc_id"], mirrored["fdoc_id"]) == ("10", "11")
+    assert (first["fdoc_e_num"], mirrored["fdoc_e_num"]) == (0, 1)
+    assert mirrored["label"] == "SUPPORT"
+    assert links[1][1][0]["label_prob"] == 0.7
+    assert links[1][1][1]["label_prob"] == 0.2
+    assert list(fv.iter_evi_links(erelations, str(tmp_path / "emap.npy"))) == (
+        links
+    )
+
+
+def metadata(authors):
+    return {
+        "pinfo": {"citationCount": 1, "influentialCitationCount": 0},
+        "ainfo": {
+            "authors": {a: f"author {a}" for a in authors},
+            "paperCounts": [1] * len(authors),
+            "citationCounts": [2] * len(authors),
+            "hIndices": [1] * len(authors),
+        },
+        "rinfo": {},
+    }
+
+
+EVIDENCE = {
+    "label": "SUPPORT",
+    "label_probs": [0.1, 0.2, 0.7],
+    "sentences": [0, 1],
+    "sentences_probs": [0.8, 0.6],
+}
+
+
+def features_args(tmp_path, predictions, workers=1):
+    """Writes the claims and corpus of the given predictions."""
+
+    write_jsonl(
+        tmp_path / "claims.jsonl",
+        [{"id": p["id"], "claim": f"claim {p['id']}"} for p in predictions],
+    )
+    doc_ids = sorted({int(d) for p in predictions for d in p["evidence"]})
+    write_jsonl(
+        tmp_path / "corpus.jsonl",
+        [
+            {
+                "doc_id": d,
+                "title": f"title {d}",
+                "abstract": ["first.", "second."],
+                "aliases": [],
+                "publish_time": "2020-01-02",
+                "journal": "journal",
+            }
+            for d in doc_ids
+        ],
+    )
+    write_jsonl(tmp_path / "predictions.jsonl", predictions)
+    return fv.argparse.Namespace(
+        output=str(tmp_path / f"graphs_{workers}.jsonl"),
+        claims=str(tmp_path / "claims.jsonl"),
+        corpus=str(tmp_path / "corpus.jsonl"),
+        predictions=str(tmp_path / "predictions.jsonl"),
+        erelations=None,
+        emap=None,
+        metadata_cache=None,
+        offline=False,
+        workers=workers,
+        graph_store=None,
+    )
+
+
+def test_get_features_builds_a_graph_per_claim(tmp_path, monkeypatch):
+    args = features_args(
+        tmp_path,
+        [
+            {"id": 1, "evidence": {"10": EVIDENCE, "11": EVIDENCE}},
+            {"id": 2, "evidence": {}},
+            # Document 12 has no metadata, leaving claim 3 without evidence.
+            {"id": 3, "evidence": {"12": EVIDENCE}},
+        ],
+    )
+    requested = []
+
+    def get_metadata(doc_ids, cache):
+        requested.extend(doc_ids)
+        return {"10": metadata(["a"]), "11": metadata(["a", "b"])}
+
+    monkeypatch.setattr(fv, "get_metadata", get_metadata)
+    fv.get_features(args, [(stance("SUPPORT"), pair(1, "10", "11"))])
+
+    assert requested == ["10", "11", "12"]
+    with open(args.output) as f:
+        graphs = [json.loads(line) for line in f]
+    assert len(graphs) == 1
+    nodes = {node["id"]: node for node in graphs[0]["nodes"]}
+    assert nodes["Claim"]["text"] == "claim 1"
+    assert nodes["10"]["date"] == "2020-01-02"
+    assert nodes["11_1"]["text"] == "second."
+    assert sorted(nodes) == [
+        "10",
+        "10_0",
+        "10_1",
+        "11",
+        "11_0",
+        "11_1",
+        "Claim",
+        "a",
+        "b",
+    ]
+    elinks = [link for link in graphs[0]["links"] if "sentProb" in link]
+    assert [(e["source"], e["target"]) for e in elinks] == [("10_0", "11_1")]
+
+
+def test_get_features_in_a_pool_writes_the_graphs_in_order(
+    tmp_path, monkeypatch
+):
+    monkeypatch.setattr(
+        fv,
+        "get_metadata",
+        lambda doc_ids, cache: {d: metadata([d]) for d in doc_ids},
+    )
+    # More claims than are kept waiting for the workers at a time.
+    predictions = [
+        {"id": i, "evidence": {str(10 + i % 3): EVIDENCE}} for i in range(30)
+    ]
+    outputs = []
+    for workers in [1, 2]:
+        args = features_args(tmp_path, predictions, workers)
+        fv.get_features(args, [])
+        with open(args.output) as f:
+            outputs.append(f.read())
+    assert outputs[0] == outputs[1]
+    graphs = [json.loads(line) for line in outputs[1].splitlines()]
+    assert [g["nodes"][0]["text"] for g in graphs] == [
+        f"claim {i}" for i in range(30)
+    ]
+
+
+def test_group_evi_links_keeps_claims_without_stances():
+    grouped = fv.group_evi_links(
+        [
+            ({}, pair(1, "10", "11")),
+            (stance("SUPPORT"), pair(2, "10", "11")),
+            ({}, pair(2, "11", "10")),
+            ({}, pair(3, "10", "11")),
+        ]
+    )
+    counts = [(id, len(links)) for id, links in grouped]
+    assert counts == [(1, 0), (2, 1), (3, 0)]
+
+
+def test_evi_links_read_no_further_than_the_claim():
+    # Claim 2 has no pairs, all pairs of claim 3 have no stance.
+    pairs = [pair(1, "10", "11"), pair(3, "10", "11"), pair(3, "11", "10")]
+    pairs.append(pair(4, "10", "11"))
+    evidence = [stance("SUPPORT"), {}, {}, stance("CONTRADICT")]
+    read = []
+
+    def stances():
+        for id, e in enumerate(evidence):
+            read.append(id)
+            yield e, pairs[id]
+
+    evi_links = fv.EviLinks(fv.group_evi_links(stances()))
+    assert len(evi_links.get(1)) == 1
+    assert read == [0, 1]
+    # Telling that claim 2 has no pairs reads the pairs of claim 3.
+    assert evi_links.get(2) == {}
+    assert read == [0, 1, 2, 3]
+    assert evi_links.get(3) == {}
+    assert evi_links.get(4)[0]["label"] == "CONTRADICT"
+    assert evi_links.pending == {}
+
+
+def test_get_features_drops_the_links_of_documents_left_out(
+    tmp_path, monkeypatch
+):
+    args = features_args(
+        tmp_path,
+        [
+            {
+                "id": 1,
+                "evidence": {"10": EVIDENCE, "11": EVIDENCE, "12": EVIDENCE},
+            }
+        ],
+    )
+    # Document 12 has no metadata, as when not in the cache offline.
+    monkeypatch.setattr(
+        fv,
+        "get_metadata",
+        lambda doc_ids, cache: {"10": metadata(["a"]), "11": metadata(["b"])},
+    )
+    fv.get_features(
+        args,
+        [
+            (stance("SUPPORT"), pair(1, "10", "11")),
+            (stance("SUPPORT"), pair(1, "10", "12")),
+            (stance("CONTRADICT"), pair(1, "12", "11")),
+        ],
+    )
+
+    with open(args.output) as f:
+        (graph,) = [json.loads(line) for line in f]
+    nodes = {node["id"] for node in graph["nodes"]}
+    assert "12" not in nodes
+    for link in graph["links"]:
+        assert link["source"] in nodes and link["target"] in nodes
+    elinks = [link for link in graph["links"] if "sentProb" in link]
+    assert [(e["source"], e["target"]) for e in elinks] == [("10_0", "11_1")]
@@ -0,0 +1,216 @@
+import gzip
+import json
+import random
+
+import numpy as np
+import pytest
+
+import graph_store
+from graph_store import GraphStore, TableWriter, build
+
+
+def write_shard(path, records):
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, "wt") as f:
+        f.writelines(json.dumps(r) + "\n" for r in records)
+    return str(path)
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 3, 50, 1000])
+def test_table_writer_sorts_across_runs(tmp_path, chunk_rows):
+    random.seed(chunk_rows)
+    # Few distinct keys, so that equal keys span runs.
+    keys = [random.randrange(20) for _ in range(200)]
+    writer = TableWriter(
+        tmp_path, {"key": np.int64, "row": np.int64}, "key", chunk_rows
+    )
+    for row, key in enumerate(keys):
+        writer.add(key, row)
+    writer.close()
+
+    order = np.argsort(keys, kind="stable")
+    assert np.load(tmp_path / "key.npy").tolist() == sorted(keys)
+    assert np.load(tmp_path / "row.npy").tolist() == order.tolist()
+    # The runs are removed.
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["key.npy", "row.npy"]
+
+
+def test_table_writer_bytes_and_order(tmp_path):
+    keys = [b"b", b"aaaa", b"", b"ab", b"b"]
+    writer = TableWriter(tmp_path, {"k": np.bytes_, "v": np.int64}, "k", 2)
+    ordered = TableWriter(tmp_path, {"o": np.int64}, chunk_rows=2)
+    for i, key in enumerate(keys):
+        writer.add(key, i)
+        ordered.add(i)
+    writer.close()
+    ordered.close()
+    assert np.load(tmp_path / "k.npy").tolist() == sorted(keys)
+    assert np.load(tmp_path / "v.npy").tolist() == [2, 1, 3, 0, 4]
+    assert np.load(tmp_path / "o.npy").tolist() == [0, 1, 2, 3, 4]
+
+
+def test_table_writer_empty(tmp_path):
+    TableWriter(tmp_path, {"k": np.bytes_, "v": np.int64}, "k").close()
+    assert len(np.load(tmp_path / "k.npy")) == 0
+    assert len(np.load(tmp_path / "v.npy")) == 0
+
+
+PAPERS = [
+    {
+        "corpusid": 30,
+        "citationcount": 5,
+        "influentialcitationcount": 1,
+        "authors": [
+            {"authorId": "7", "name": "Ada"},
+            {"authorId": None, "name": "Unknown"},
+        ],
+        "externalids": {"DOI": "10.1/ABC", "PubMedCentral": "123"},
+    },
+    {
+        "corpusid": 10,
+        "citationcount": None,
+        "authors": [{"authorId": "8", "name": "Bob"}],
+        "externalids": {"ArXiv": "2101.1"},
+    },
+    {"corpusid": 20, "authors": []},
+]
+AUTHORS = [
+    {"authorid": "8", "papercount": 2, "citationcount": 3, "hindex": 1},
+    {"authorid": "7", "papercount": 9, "citationcount": 90, "hindex": 4},
+]
+CITATIONS = [
+    {
+        "citingcorpusid": 30,
+        "citedcorpusid": 10,
+        "isinfluential": True,
+        "intents": [["methodology"], ["result", "unknown"]],
+        "contexts": ["first", "second"],
+    },
+    {"citingcorpusid": 10, "citedcorpusid": 20, "intents": None},
+    {"citingcorpusid": 30, "citedcorpusid": None},
+    {"citingcorpusid": 30, "citedcorpusid": 20, "contexts": ["third"]},
+]
+
+
+@pytest.fixture
+def shards(tmp_path):
+    return {
+        "papers": [
+            write_shard(tmp_path / "papers_0.jsonl.gz", PAPERS[:1]),
+            write_shard(tmp_path / "papers_1.jsonl", PAPERS[1:]),
+        ],
+        "authors": [write_shard(tmp_path / "authors.jsonl", AUTHORS)],
+        "citations": [write_shard(tmp_path / "citations.jsonl", CITATIONS)],
+        "paper_ids": [
+            write_shard(
+                tmp_path / "paper_ids.jsonl",
+                [{"sha": "ABCDEF", "corpusid": 10}],
+            )
+        ],
+    }
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 1000])
+def test_lookups(tmp_path, shards, monkeypatch, chunk_rows):
+    monkeypatch.setattr(graph_store, "CHUNK_ROWS", chunk_rows)
+    build(str(tmp_path / "store"), **shards)
+    store = GraphStore(str(tmp_path / "store"))
+
+    assert store.paper("30") == {
+        "citationCount": 5,
+        "influentialCitationCount": 1,
+    }
+    assert store.paper("10")["citationCount"] == 0
+    assert store.paper("40") is None
+    assert store.authors_of("30") == {
+        "authors": {"7": "Ada", None: "Unknown"},
+        "paperCounts": [9, 0],
+        "citationCounts": [90, 0],
+        "hIndices": [4, 0],
+    }
+    assert store.authors_of("20")["authors"] == {}
+    assert store.references("30") == {
+        "10": {
+            "contexts": ["first", "second"],
+            "intents": ["methodology", "result"],
+            "isInfluential": True,
+        },
+        "20": {"contexts": ["third"], "intents": [], "isInfluential": False},
+    }
+    # Known papers without citations have no references.
+    assert store.references("20") == {}
+    assert store.references("40") is None
+    assert store.corpusid("10.1/abc", "doi") == 30
+    assert store.corpusid("PMC123", "pmc") == 30
+    assert store.corpusid("2101.1", "arxiv") == 10
+    assert store.corpusid("abcdef", "s2") == 10
+    assert store.corpusid("1", "mag") is None
+    assert (store.hits, store.misses) == (10, 3)
+
+
+def test_lookups_need_their_dataset(tmp_path, shards):
+    build(str(tmp_path / "store"), papers=shards["papers"])
+    store = GraphStore(str(tmp_path / "store"))
+    assert store.paper("30")["citationCount"] == 5
+    assert store.authors_of("30") is None
+    assert store.references("30") is None
+    assert store.corpusid("2101.1", "arxiv") == 10
+    assert store.get("20", "rinfo") is None
+
+
+def test_get_metadata_looks_up_the_store_once(tmp_path, shards, monkeypatch):
+    import feature_visualization as fv
+
+    build(str(tmp_path / "store"), **shards)
+    monkeypatch.setattr(graph_store, "store", GraphStore(tmp_path / "store"))
+    fetched = []
+
+    def get_request(url):
+        fetched.append(url)
+        return {
+            "citationCount": 1,
+            "influentialCitationCount": 0,
+            "authors": [
+                {
+                    "authorId": "1",
+                    "name": "Cy",
+                    "paperCount": 1,
+                    "citationCount": 1,
+                    "hIndex": 1,
+                }
+            ],
+        }
+
+    monkeypatch.setattr(fv, "post_request", lambda url, data: {})
+    monkeypatch.setattr(fv, "get_request", get_request)
+    monkeypatch.setattr(fv, "get_requests", lambda urls: [{"data": []}])
+    result = fv.get_metadata(["30", "99"])
+    assert result["30"]["rinfo"]["20"]["contexts"] == ["third"]
+    assert result["99"]["rinfo"] == {}
+    assert len(fetched) == 1
+    # Each kind of information of each document is looked up once.
+    store = graph_store.get_store()
+    assert (store.hits, store.misses) == (3, 3)
+
+
+def test_get_corpusids_looks_up_the_store_first(tmp_path, shards, monkeypatch):
+    import utility
+
+    build(str(tmp_path / "store"), **shards)
+    monkeypatch.setattr(graph_store, "store", GraphStore(tmp_path / "store"))
+    posted = []
+
+    def post_request(url, data):
+        posted.append(data["ids"])
+        return [{"externalIds": {"CorpusId": 7}} for _ in data["ids"]]
+
+    monkeypatch.setattr(utility, "post_request", post_request)
+    ids = [("doi", "10.1/ABC"), ("arxiv", "9"), ("s2", "abcdef")]
+    assert utility.get_corpusids(ids) == {
+        ("doi", "10.1/ABC"): 30,
+        ("arxiv", "9"): 7,
+        ("s2", "abcdef"): 10,
+    }
+    assert posted == [["arXiv:9"]]
+    with pytest.raises(ValueError):
+        utility.get_corpusids([("doi", "10.1/ABC"), ("isbn", "1")])
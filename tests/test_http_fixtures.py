@@ -0,0 +1,76 @@
+import asyncio
+
+from aiohttp import web
+
+from http_fixtures import FixtureStore, data_key
+from s2_client import S2Client
+
+
+def test_data_key_is_canonical():
+    assert data_key(None) == ""
+    assert data_key({"b": [1, 2], "a": 1}) == data_key({"a": 1, "b": [1, 2]})
+    assert data_key({"ids": [1, 2]}) != data_key({"ids": [2, 1]})
+
+
+def test_store_round_trip(tmp_path):
+    path = str(tmp_path / "fixtures.sqlite")
+    store = FixtureStore(path)
+    store.put("GET", "u", None, 200, "get")
+    store.put("POST", "u", {"ids": [1]}, 200, "post")
+    store.put("POST", "u", {"ids": [1]}, 404, "replaced")
+    assert store.get("GET", "u") == (200, "get")
+    assert store.get("POST", "u") is None
+    assert store.get("POST", "u", {"ids": [2]}) is None
+    store.close()
+
+    store = FixtureStore(path)
+    assert len(store) == 2
+    assert store.get("POST", "u", {"ids": [1]}) == (404, "replaced")
+
+
+def test_record_then_replay(tmp_path):
+    path = str(tmp_path / "fixtures.sqlite")
+    hits = {"paper": 0, "flaky": 0}
+
+    async def paper(request):
+        hits["paper"] += 1
+        return web.json_response(await request.json())
+
+    async def flaky(request):
+        hits["flaky"] += 1
+        if hits["flaky"] == 1:
+            return web.Response(status=503, text="unavailable")
+        return web.json_response({"ok": True})
+
+    async def send(mode, base):
+        client = S2Client(
+            rate=100, burst=100, base_delay=0.01, mode=mode, fixtures=path
+        )
+        async with client:
+            return [
+                await client.post(f"{base}/paper", {"ids": [1]}),
+                await client.get(f"{base}/flaky"),
+            ]
+
+    async def record():
+        app = web.Application()
+        app.add_routes([web.post("/paper", paper), web.get("/flaky", flaky)])
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = runner.addresses[0][1]
+        try:
+            base = f"http://127.0.0.1:{port}"
+            return base, await send("record", base)
+        finally:
+            await runner.cleanup()
+
+    base, recorded = asyncio.run(record())
+    assert recorded == [{"ids": [1]}, {"ok": True}]
+    assert hits == {"paper": 1, "flaky": 2}
+    # Only the final response to a retried request is recorded.
+    assert len(FixtureStore(path)) == 2
+
+    # The server is gone, the responses come from the store.
+    assert asyncio.run(send("replay", base)) == recorded
@@ -0,0 +1,70 @@
+import utility
+from id_cache import CorpusIdCache, resolve_doc_ids
+
+
+def metadata(**ids):
+    row = {key: "" for key, _ in utility.id_keys}
+    row["s2_id"] = ""
+    row.update(ids)
+    return row
+
+
+def test_cache_round_trip(tmp_path):
+    cache = CorpusIdCache(str(tmp_path / "ids.sqlite"))
+    assert cache.get("doi", "10.1/a") is None
+    cache.put_many([("doi", "10.1/a", 42), ("doi", "10.1/b", "")])
+    assert cache.get("doi", "10.1/a") == 42
+    assert cache.get("doi", "10.1/b") == ""
+    assert (cache.hits, cache.misses) == (2, 1)
+    cache.close()
+
+
+def test_get_corpusids_batches(monkeypatch):
+    monkeypatch.setattr(utility.graph_store, "get_store", lambda: None)
+    monkeypatch.setattr(utility, "batch_limit", 2)
+    posted = []
+
+    def post_request(url, data):
+        posted.append(data["ids"])
+        return [
+            None if id == "PMID:2" else {"externalIds": {"CorpusId": 7}}
+            for id in data["ids"]
+        ]
+
+    monkeypatch.setattr(utility, "post_request", post_request)
+    ids = [("pubmed", "1"), ("pubmed", "2"), ("arxiv", "3"), ("pubmed", "1")]
+    result = utility.get_corpusids(ids)
+    assert posted == [["PMID:1", "PMID:2"], ["arXiv:3"]]
+    assert result == {
+        ("pubmed", "1"): 7,
+        ("pubmed", "2"): "",
+        ("arxiv", "3"): 7,
+    }
+
+
+def test_resolve_doc_ids_in_id_key_order(tmp_path, monkeypatch):
+    # doi comes before pubmed in id_keys, so it is the id a paper with both
+    # is resolved with.
+    corpusids = {("doi", "d1"): 1, ("pubmed", "p1"): 2, ("pubmed", "p2"): 3}
+    calls = []
+
+    def get_corpusids(ids):
+        ids = sorted(ids)
+        calls.append(ids)
+        return {k: corpusids.get(k, "") for k in ids}
+
+    monkeypatch.setattr(utility, "get_corpusids", get_corpusids)
+    metadatas = [
+        metadata(s2_id="9"),
+        metadata(doi="d1", pubmed_id="p1"),
+        metadata(doi="d2", pubmed_id="p2"),
+        metadata(),
+    ]
+    cache = CorpusIdCache(str(tmp_path / "ids.sqlite"))
+    assert resolve_doc_ids(metadatas, cache) == ["9", 1, 3, ""]
+    assert calls == [[("doi", "d1"), ("doi", "d2")], [("pubmed", "p2")]]
+
+    # Everything, unresolved ids included, is now answered by the cache.
+    calls.clear()
+    assert resolve_doc_ids(metadatas, cache) == ["9", 1, 3, ""]
+    assert calls == []
@@ -0,0 +1,22 @@
+import metadata_cache
+from metadata_cache import MetadataCache
+
+
+def test_expires_per_kind(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(metadata_cache.time, "time", lambda: now[0])
+    path = str(tmp_path / "metadata.sqlite")
+    cache = MetadataCache(path, ttls={"pinfo": 10, "rinfo": 100})
+    cache.put_many([("1", "pinfo", {"a": 1}), (2, "rinfo", {"2": {}})])
+    assert cache.get("1", "pinfo") == {"a": 1}
+    assert cache.get("2", "rinfo") == {"2": {}}
+    assert cache.get("1", "rinfo") is None
+
+    now[0] += 50
+    assert cache.get("1", "pinfo") is None
+    assert cache.get("2", "rinfo") == {"2": {}}
+    assert MetadataCache(path, offline=True).get("1", "pinfo") == {"a": 1}
+    assert cache.summary() == (
+        "pinfo: 1 hits, 1 expired, 0 misses\n"
+        "rinfo: 2 hits, 0 expired, 1 misses"
+    )
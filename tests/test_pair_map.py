@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+from pair_map import (
+    DOC_BITS,
+    EVIDENCE_BITS,
+    PairMap,
+    convert,
+    evidence_doc_id,
+    pair_rows,
+    save_pair_map,
+)
+
+
+def test_evidence_doc_id_packs_at_the_limits():
+    last_doc, last_evidence = (1 << DOC_BITS) - 1, (1 << EVIDENCE_BITS) - 1
+    id = evidence_doc_id(5, last_doc, last_evidence)
+    assert id >> (DOC_BITS + EVIDENCE_BITS) == 5
+    assert (id >> EVIDENCE_BITS) & last_doc == last_doc
+    assert id & last_evidence == last_evidence
+    # The largest ids of a claim stay below the smallest of the next claim.
+    assert id + 1 == evidence_doc_id(6, 0, 0)
+    assert evidence_doc_id(5, 1, 0) == evidence_doc_id(5, 0, last_evidence) + 1
+    with pytest.raises(ValueError):
+        evidence_doc_id(5, 1 << DOC_BITS, 0)
+    with pytest.raises(ValueError):
+        evidence_doc_id(5, 0, 1 << EVIDENCE_BITS)
+
+
+def rows(claim_ids):
+    return pair_rows(
+        (i, claim_id, 10, 0, 11, 1, False)
+        for i, claim_id in enumerate(claim_ids)
+    )
+
+
+def test_link_looks_up_a_pair_by_id(tmp_path):
+    path = str(tmp_path / "map.npy")
+    claim_ids = [3, 1, 3, 2, 1]
+    save_pair_map(path, [rows(claim_ids[:2]), rows(claim_ids)[2:]])
+    pair_map = PairMap(path)
+    assert len(pair_map) == len(claim_ids)
+    assert [pair_map.link(i)["claim_id"] for i in range(5)] == claim_ids
+    assert pair_map.link(2) == {
+        "claim_id": 3,
+        "fdoc_id": "10",
+        "fdoc_e_num": 0,
+        "sdoc_id": "11",
+        "sdoc_e_num": 1,
+        "mirror": False,
+    }
+
+
+def test_save_pair_map_needs_the_pairs_numbered(tmp_path):
+    with pytest.raises(ValueError):
+        save_pair_map(str(tmp_path / "map.npy"), [rows([1, 2])[::-1]])
+
+
+def test_convert_round_trip(tmp_path):
+    pairs = {
+        "1": {
+            "claim_id": 7,
+            "fdoc_id": "12",
+            "fdoc_e_num": 3,
+            "sdoc_id": "40",
+            "sdoc_e_num": 0,
+            "mirror": True,
+        },
+        "0": {
+            "claim_id": 7,
+            "fdoc_id": "40",
+            "fdoc_e_num": 0,
+            "sdoc_id": "12",
+            "sdoc_e_num": 3,
+        },
+    }
+    with open(tmp_path / "map.json", "w") as f:
+        json.dump(pairs, f)
+    convert(str(tmp_path / "map.json"), str(tmp_path / "map.npy"))
+    pair_map = PairMap(str(tmp_path / "map.npy"))
+    assert pair_map.link(0) == dict(pairs["0"], mirror=False)
+    assert pair_map.link(1) == pairs["1"]
+    assert len(pair_map) == 2
@@ -0,0 +1,66 @@
+import threading
+import time
+
+import pytest
+
+from pipeline import run_pipeline
+
+
+def test_items_come_out_in_order():
+    stages = [lambda x: x + 1, lambda x: x * 2]
+    assert list(run_pipeline(range(100), stages, 1)) == [
+        (x + 1) * 2 for x in range(100)
+    ]
+
+
+def test_no_stages():
+    assert list(run_pipeline(range(5), [])) == list(range(5))
+
+
+def test_source_runs_on_calling_thread():
+    caller = threading.get_ident()
+    source_threads, stage_threads = set(), set()
+
+    def source():
+        for x in range(20):
+            source_threads.add(threading.get_ident())
+            yield x
+
+    def stage(x):
+        stage_threads.add(threading.get_ident())
+        time.sleep(0.001)
+        return x
+
+    assert list(run_pipeline(source(), [stage, stage], 1)) == list(range(20))
+    assert source_threads == {caller}
+    assert caller not in stage_threads
+
+
+def test_stage_failure_is_raised():
+    def stage(x):
+        if x == 3:
+            raise ValueError("bad item")
+        return x
+
+    results = []
+    with pytest.raises(ValueError, match="bad item"):
+        for x in run_pipeline(range(10), [stage, lambda x: x]):
+            results.append(x)
+    assert results == [0, 1, 2]
+
+
+def test_source_failure_is_raised():
+    def source():
+        yield 1
+        raise KeyError("no more")
+
+    with pytest.raises(KeyError):
+        list(run_pipeline(source(), [lambda x: x]))
+
+
+def test_closing_early_stops_the_threads():
+    before = threading.active_count()
+    results = run_pipeline(range(1000), [lambda x: x, lambda x: x], 1)
+    assert next(results) == 0
+    results.close()
+    assert threading.active_count() == before
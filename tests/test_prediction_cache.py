@@ -0,0 +1,92 @@
+import os
+
+import prediction_cache
+from prediction_cache import PredictionCache, prediction_key
+
+
+def prediction(label):
+    return {
+        "claim_id": 1,
+        "abstract_id": 2,
+        "predicted_label": label,
+        "label_probs": [0.1, 0.2, 0.7],
+        "predicted_rationale": [0],
+        "rationale_probs": [0.8],
+    }
+
+
+def test_prediction_key():
+    text = {"claim": "c", "title": "t", "sentences": ["a", "b"]}
+    assert prediction_key("m", text) == prediction_key("m", dict(text))
+    assert prediction_key("m", text) != prediction_key("n", text)
+    assert prediction_key("m", text) != prediction_key(
+        "m", dict(text, sentences=["ab"])
+    )
+
+
+def test_hits_and_misses(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = PredictionCache(path)
+    cache.put_many({"a": prediction("SUPPORT"), "b": prediction("NEI")})
+    # Only the fields of the prediction itself are kept.
+    fields = {k: prediction("SUPPORT")[k] for k in prediction_cache.FIELDS}
+    # Repeated keys are counted once.
+    assert cache.get_many(["a", "c", "a", "c", "d"], "document") == {
+        "a": fields
+    }
+    assert cache.get_many(["b"], "evidence")["b"]["predicted_label"] == "NEI"
+    assert dict(cache.hits) == {"document": 1, "evidence": 1}
+    assert dict(cache.misses) == {"document": 2, "evidence": 0}
+    assert cache.summary().split("\n") == [
+        "document: 1 hits, 2 misses, 33.3% hit rate",
+        "evidence: 1 hits, 0 misses, 100.0% hit rate",
+    ]
+    cache.close()
+
+    # The predictions are kept, not the statistics.
+    cache = PredictionCache(path)
+    assert set(cache.get_many(["a", "b", "c"], "document")) == {"a", "b"}
+    assert cache.summary() == "document: 2 hits, 1 misses, 66.7% hit rate"
+
+
+def test_lookups_in_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(prediction_cache, "LOOKUP_SIZE", 3)
+    cache = PredictionCache(str(tmp_path / "cache.sqlite"))
+    keys = [str(i) for i in range(10)]
+    cache.put_many({key: prediction("SUPPORT") for key in keys[::2]})
+    assert sorted(cache.get_many(keys + keys, "s")) == keys[::2]
+    assert (cache.hits["s"], cache.misses["s"]) == (5, 5)
+
+
+def test_checkpoint_digest_until_the_checkpoint_changes(tmp_path, monkeypatch):
+    hashed = []
+    file_digest = prediction_cache.file_digest
+
+    def digest(path):
+        hashed.append(path)
+        return file_digest(path)
+
+    monkeypatch.setattr(prediction_cache, "file_digest", digest)
+    checkpoint = tmp_path / "model.ckpt"
+    checkpoint.write_bytes(b"weights")
+    os.utime(checkpoint, (1000, 1000))
+    path = str(tmp_path / "cache.sqlite")
+    first = PredictionCache(path).checkpoint_digest(str(checkpoint))
+    # Kept across caches, without hashing the checkpoint again.
+    assert PredictionCache(path).checkpoint_digest(str(checkpoint)) == first
+    assert len(hashed) == 1
+
+    cache = PredictionCache(path)
+    # Same size and time of modification, the digest is not recomputed.
+    checkpoint.write_bytes(b"Weights")
+    os.utime(checkpoint, (1000, 1000))
+    assert cache.checkpoint_digest(str(checkpoint)) == first
+    # A new time of modification.
+    os.utime(checkpoint, (2000, 2000))
+    second = cache.checkpoint_digest(str(checkpoint))
+    assert second != first
+    # A new size.
+    checkpoint.write_bytes(b"Weights!")
+    os.utime(checkpoint, (2000, 2000))
+    assert cache.checkpoint_digest(str(checkpoint)) not in [first, second]
+    assert len(hashed) == 3
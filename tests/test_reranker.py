@@ -0,0 +1,61 @@
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+from reranker import MonoT5Reranker  # noqa: E402
+
+
+class FakeReranker(MonoT5Reranker):
+    """Scores inputs by their tokens, without loading a model."""
+
+    def __init__(self, batch_size=64, token_budget=None, sort_by_length=True):
+        self.batch_size = batch_size
+        self.token_budget = token_budget
+        self.sort_by_length = sort_by_length
+        self.max_length = 512
+        self.seen = []
+
+    def encode(self, query, texts):
+        return [[len(query)] * len(text) for text in texts]
+
+    def forward(self, inputs):
+        self.seen.append(len(inputs) * max(len(x) for x in inputs))
+        return [float(sum(x)) for x in inputs]
+
+
+INPUTS = [[1] * n for n in [5, 1, 9, 3, 3, 7]]
+
+
+def test_batches_of_batch_size_sorted_by_length():
+    reranker = FakeReranker(batch_size=4)
+    assert list(reranker.batches(INPUTS)) == [[1, 3, 4, 0], [5, 2]]
+
+
+def test_batches_in_input_order():
+    reranker = FakeReranker(batch_size=4, sort_by_length=False)
+    assert list(reranker.batches(INPUTS)) == [[0, 1, 2, 3], [4, 5]]
+
+
+def test_score_encoded_keeps_input_order():
+    reranker = FakeReranker(batch_size=2)
+    assert reranker.score_encoded(INPUTS) == [5.0, 1.0, 9.0, 3.0, 3.0, 7.0]
+
+
+def test_batches_under_token_budget():
+    reranker = FakeReranker(token_budget=12)
+    batches = list(reranker.batches(INPUTS))
+    assert batches == [[1, 3, 4], [0], [5], [2]]
+    for batch in batches:
+        longest = max(len(INPUTS[i]) for i in batch)
+        assert len(batch) == 1 or len(batch) * longest <= 12
+
+
+def test_score_many_fills_batches_across_queries():
+    reranker = FakeReranker(token_budget=100)
+    queries = [("ab", ["x", "xyz"]), ("abc", []), ("a", ["xy", "x", "xyzw"])]
+    assert reranker.score_many(queries) == [
+        [2.0, 6.0],
+        [],
+        [2.0, 1.0, 4.0],
+    ]
+    assert len(reranker.seen) == 1
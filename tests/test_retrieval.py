@@ -0,0 +1,34 @@
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("nltk")
+pytest.importorskip("pyserini")
+pytest.importorskip("transformers")
+from retrieval import search  # noqa: E402
+
+
+class Searcher:
+    """Stands in for LuceneSearcher, a hit per word of the claim."""
+
+    def __init__(self):
+        self.batches = []
+
+    def search(self, claim, k):
+        return claim.split()[:k]
+
+    def batch_search(self, claims, qids, k, threads):
+        self.batches.append(qids)
+        return {qid: self.search(c, k) for qid, c in zip(qids, claims)}
+
+
+CLAIMS = [f"claim {i}" + " word" * i for i in range(5)]
+
+
+def test_batched_search_returns_the_serial_hits_in_order():
+    searcher = Searcher()
+    serial = list(search(searcher, CLAIMS, 3))
+    assert serial[1] == ["claim", "1", "word"]
+    batched = list(search(searcher, CLAIMS, 3, threads=4, chunk_size=2))
+    assert batched == serial
+    assert searcher.batches == [["0", "1"], ["2", "3"], ["4"]]
+    assert list(search(searcher, [], 3, threads=4)) == []
@@ -0,0 +1,162 @@
+import asyncio
+import time
+from email.utils import formatdate
+
+import pytest
+from aiohttp import web
+
+import s2_client
+from http_fixtures import FixtureStore
+from s2_client import S2Client, TokenBucket, retry_after
+
+
+class Clock:
+    """Stands in for time.monotonic and asyncio.sleep, advancing instantly."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(s2_client.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(s2_client.asyncio, "sleep", clock.sleep)
+    return clock
+
+
+def test_token_bucket_paces_after_burst(clock):
+    async def acquire(n):
+        bucket = TokenBucket(rate=2.0, capacity=3)
+        times = []
+        for _ in range(n):
+            await bucket.acquire()
+            times.append(clock.now)
+        return times
+
+    assert asyncio.run(acquire(6)) == pytest.approx(
+        [0.0, 0.0, 0.0, 0.5, 1.0, 1.5]
+    )
+
+
+def test_token_bucket_pause(clock):
+    async def acquire():
+        bucket = TokenBucket(rate=1.0, capacity=5)
+        bucket.pause(10.0)
+        await bucket.acquire()
+
+    asyncio.run(acquire())
+    assert clock.now == pytest.approx(10.0)
+
+
+def test_retry_after():
+    assert retry_after(None) is None
+    assert retry_after("") is None
+    assert retry_after("3") == 3.0
+    assert retry_after("-1") == 0.0
+    assert retry_after("soon") is None
+    assert retry_after(formatdate(time.time() + 60, usegmt=True)) == (
+        pytest.approx(60, abs=2)
+    )
+
+
+def test_backoff_bounds():
+    client = S2Client(base_delay=1.0, max_delay=5.0)
+    for attempt in range(6):
+        delay = min(5.0, 2**attempt)
+        assert delay / 2 <= client.backoff(attempt, None) <= delay
+    assert 7.0 <= client.backoff(0, 7.0) <= 8.0
+
+
+def serve(handler, *requests, **kwargs):
+    """Sends the requests to a local server answering every request with
+    handler, returning the responses and the client."""
+
+    async def send():
+        app = web.Application()
+        app.add_routes([web.route("*", "/{path}", handler)])
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        base = f"http://127.0.0.1:{runner.addresses[0][1]}"
+        client = S2Client(rate=100, burst=100, base_delay=0.01, **kwargs)
+        try:
+            async with client:
+                results = [
+                    await client.request(method, base + path, *data)
+                    for method, path, *data in requests
+                ]
+        finally:
+            await runner.cleanup()
+        return results, client
+
+    return asyncio.run(send())
+
+
+def test_retries_throttled_requests():
+    calls = []
+
+    async def handler(request):
+        calls.append(request.path)
+        # Every 2nd request is throttled.
+        if len(calls) % 2 == 0:
+            return web.Response(status=429, headers={"Retry-After": "0"})
+        if request.path == "/u2":
+            return web.Response(status=404, text="not found")
+        return web.json_response({"a": 1})
+
+    results, client = serve(
+        handler, ("GET", "/u1"), ("GET", "/u1"), ("POST", "/u2", {"ids": [1]})
+    )
+    assert results == [{"a": 1}, {"a": 1}, {}]
+    assert calls == ["/u1", "/u1", "/u1", "/u2", "/u2"]
+    assert client.counts == {"requests": 5, "retries": 2, "failures": 1}
+
+
+def test_gives_up_after_max_retries():
+    async def handler(request):
+        return web.Response(status=503, text="unavailable")
+
+    results, client = serve(handler, ("GET", "/u"), max_retries=3)
+    assert results == [{}]
+    assert client.counts == {"requests": 4, "retries": 3, "failures": 1}
+
+
+def run(client, *requests):
+    async def send():
+        async with client:
+            return [await client.request(*r) for r in requests]
+
+    return asyncio.run(send())
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        S2Client(mode="offline")
+    with pytest.raises(ValueError):
+        S2Client(mode="replay")
+
+
+def test_replay_throttles_every_nth_request(tmp_path, clock):
+    path = str(tmp_path / "fixtures.sqlite")
+    store = FixtureStore(path)
+    store.put("GET", "u1", None, 200, '{"a": 1}')
+    store.put("POST", "u2", {"ids": [1]}, 404, "not found")
+    store.close()
+
+    client = S2Client(
+        rate=100, burst=100, mode="replay", fixtures=path, throttle=2
+    )
+    results = run(
+        client, ("GET", "u1"), ("GET", "u1"), ("POST", "u2", {"ids": [1]})
+    )
+    assert results == [{"a": 1}, {"a": 1}, {}]
+    # The 2nd and 4th replayed requests are throttled and retried.
+    assert client.counts == {"requests": 5, "retries": 2, "failures": 1}
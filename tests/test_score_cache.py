@@ -0,0 +1,53 @@
+from score_cache import LOOKUP_SIZE, ScoreCache, claim_hash
+
+
+def test_claim_hash_normalizes_whitespace_and_unicode():
+    assert claim_hash("Café  binds\tACE2 ") == claim_hash("Café binds ACE2")
+    assert claim_hash("a b") != claim_hash("ab")
+
+
+def test_get_many(tmp_path):
+    cache = ScoreCache(str(tmp_path / "scores.sqlite"), "t5", 512, "fp32")
+    cache.put_many({("claim a", 1): -0.5, ("claim b", 2): -1.5}, 2.0)
+    found = cache.get_many(
+        [("claim a", 1), ("claim  a", 1), ("claim a", 2), ("claim b", 2)]
+    )
+    assert found == {
+        ("claim a", 1): -0.5,
+        ("claim  a", 1): -0.5,
+        ("claim b", 2): -1.5,
+    }
+    assert (cache.hits, cache.misses) == (3, 1)
+    assert cache.time_saved == 3.0
+
+
+def test_get_many_more_than_one_query(tmp_path):
+    cache = ScoreCache(str(tmp_path / "scores.sqlite"), "t5", 512, "fp32")
+    n = 2 * LOOKUP_SIZE + 1
+    cache.put_many({("claim", i): float(i) for i in range(0, n, 2)})
+    found = cache.get_many(("claim", i) for i in range(n))
+    assert found == {("claim", i): float(i) for i in range(0, n, 2)}
+
+
+def test_keyed_by_model_length_and_precision(tmp_path):
+    path = str(tmp_path / "scores.sqlite")
+    ScoreCache(path, "t5", 512, "fp32").put_many({("claim", 1): -0.5})
+    for other in [
+        ("t5", 512, "bf16"),
+        ("t5", 256, "fp32"),
+        ("t6", 512, "fp32"),
+    ]:
+        assert ScoreCache(path, *other).get_many([("claim", 1)]) == {}
+    assert ScoreCache(path, "t5", 512, "fp32").get_many([("claim", 1)]) == {
+        ("claim", 1): -0.5
+    }
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ScoreCache(str(tmp_path / "scores.sqlite"), "t5", 512, "fp32", 2)
+    cache.put_many({("claim", 1): 1.0})
+    cache.put_many({("claim", 2): 2.0})
+    cache.get_many([("claim", 1)])
+    cache.put_many({("claim", 3): 3.0})
+    found = cache.get_many([("claim", 1), ("claim", 2), ("claim", 3)])
+    assert found == {("claim", 1): 1.0, ("claim", 3): 3.0}
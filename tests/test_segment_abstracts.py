@@ -0,0 +1,44 @@
+import json
+
+import pytest
+
+pytest.importorskip("nltk")
+pytest.importorskip("pyserini")
+import segment_abstracts  # noqa: E402
+from sentence_store import SentenceStore  # noqa: E402
+
+
+class Doc:
+    def __init__(self, docid, abstract):
+        self.id = docid
+        self.contents = json.dumps({"csv_metadata": {"abstract": abstract}})
+
+    def docid(self):
+        return self.id
+
+    def raw(self):
+        return self.contents
+
+
+class Searcher:
+    docs = [Doc("b2", "Second. Third."), Doc("a1", "First.")]
+    num_docs = len(docs)
+
+    def __init__(self, index):
+        pass
+
+    def doc(self, i):
+        return self.docs[i]
+
+
+def test_build(tmp_path, monkeypatch):
+    monkeypatch.setattr(segment_abstracts, "LuceneSearcher", Searcher)
+    monkeypatch.setattr(
+        segment_abstracts,
+        "get_sentences",
+        lambda metadata: metadata["abstract"].split(" "),
+    )
+    segment_abstracts.build("index", str(tmp_path / "store"))
+    store = SentenceStore(str(tmp_path / "store"))
+    assert store.get("a1") == ["First."]
+    assert store.get("b2") == ["Second.", "Third."]
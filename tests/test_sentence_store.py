@@ -0,0 +1,17 @@
+from sentence_store import SentenceStore, write_store
+
+
+def test_get(tmp_path):
+    docs = {"b2": ["Second.", "Ünïcode."], "a1": ["First."], "c3": []}
+    write_store(str(tmp_path / "store"), docs.items())
+    store = SentenceStore(str(tmp_path / "store"))
+    for docid, sentences in docs.items():
+        assert store.get(docid) == sentences
+    assert store.get("a0") is None
+    assert store.get("z9") is None
+    assert (store.hits, store.misses) == (3, 2)
+
+
+def test_empty_store(tmp_path):
+    write_store(str(tmp_path), iter([]))
+    assert SentenceStore(str(tmp_path)).get("a1") is None
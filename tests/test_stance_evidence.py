@@ -0,0 +1,124 @@
+import numpy as np
+import pytest
+
+from feature_visualization import get_evi_link, group_evi_links
+from graph import create_graph
+from stance_evidence import select_pairs
+
+# The document of each evidence of a claim.
+DOC_NUMS = [0, 0, 1, 2]
+DOC_IDS = ["10", "11", "12"]
+E_NUMS = [0, 1, 0, 0]
+
+
+def every_ordered_pair(doc_nums):
+    """The pairs written before there were pair strategies."""
+
+    return [
+        (i, j)
+        for i in range(len(doc_nums))
+        for j in range(len(doc_nums))
+        if doc_nums[i] != doc_nums[j]
+    ]
+
+
+def link(i, j, mirror):
+    return {
+        "claim_id": 1,
+        "fdoc_id": DOC_IDS[DOC_NUMS[i]],
+        "fdoc_e_num": E_NUMS[i],
+        "sdoc_id": DOC_IDS[DOC_NUMS[j]],
+        "sdoc_e_num": E_NUMS[j],
+        "mirror": mirror,
+    }
+
+
+# The predicted label of the pairs with a stance. The directions of (0, 2)
+# disagree, (1, 3) and (0, 3) have a stance in one direction only.
+LABELS = {
+    (0, 2): "SUPPORT",
+    (2, 0): "CONTRADICT",
+    (0, 3): "CONTRADICT",
+    (1, 3): "SUPPORT",
+    (2, 3): "SUPPORT",
+    (3, 2): "SUPPORT",
+}
+
+
+def stance(i, j):
+    if (i, j) not in LABELS:
+        return {}
+    return {
+        "0": {
+            "label": LABELS[(i, j)],
+            "label_probs": [0.6, 0.1, 0.3],
+            "sentences_probs": [0.1 * (i + 1)],
+        }
+    }
+
+
+def graph(elinks):
+    doc = {
+        "label": "SUPPORT",
+        "label_prob": 0.9,
+        "title": "title",
+        "evidence": [{"text": "e0", "prob": 0.5}, {"text": "e1", "prob": 0.5}],
+        "pinfo": {"citationCount": 1, "influentialCitationCount": 0},
+        "ainfo": {
+            "authors": {"1": "author 1"},
+            "paperCounts": [1],
+            "citationCounts": [1],
+            "hIndices": [1],
+        },
+        "publish_time": "2020-01-01",
+        "journal": None,
+    }
+    return create_graph(
+        {
+            "claim": "claim",
+            "docs": {id: doc for id in DOC_IDS},
+            "rlinks": {},
+            "elinks": elinks,
+        }
+    )
+
+
+def test_all_selects_every_ordered_pair():
+    assert select_pairs(DOC_NUMS, "all") == [
+        (i, j, False) for i, j in every_ordered_pair(DOC_NUMS)
+    ]
+
+
+def test_all_leaves_the_graph_unchanged():
+    pairs = select_pairs(DOC_NUMS, "all")
+    [(_, elinks)] = group_evi_links(
+        (stance(i, j), link(i, j, mirror)) for i, j, mirror in pairs
+    )
+    # The links as built before, from the map without mirror flags.
+    before = []
+    for i, j in every_ordered_pair(DOC_NUMS):
+        if stance(i, j):
+            unflagged = link(i, j, False)
+            del unflagged["mirror"]
+            before.append(get_evi_link(stance(i, j), unflagged))
+    assert elinks == before
+    assert graph(elinks) == graph(before)
+    bidirectional = [
+        e["bidirectional"] for e in graph(elinks)["links"] if "sentProb" in e
+    ]
+    # Disagreeing pairs are dropped, one-way stances stay one-way.
+    assert sorted(bidirectional) == [False, False, True]
+
+
+@pytest.mark.parametrize("strategy", ["symmetric", "top_k"])
+def test_mirrored_stances_are_bidirectional_links(strategy):
+    vectors = np.eye(len(DOC_NUMS))[:, ::-1] + 0.1
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    pairs = select_pairs(DOC_NUMS, strategy, vectors, k=1)
+    assert all(mirror and i < j for i, j, mirror in pairs)
+    [(_, elinks)] = group_evi_links(
+        (stance(i, j), link(i, j, mirror)) for i, j, mirror in pairs
+    )
+    links = [e for e in graph(elinks)["links"] if "sentProb" in e]
+    assert len(links) == sum(1 for i, j, _ in pairs if stance(i, j))
+    assert all(e["bidirectional"] for e in links)
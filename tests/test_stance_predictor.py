@@ -0,0 +1,319 @@
+import argparse
+import importlib
+import json
+import random
+import sys
+import types
+
+import pytest
+
+from feature_visualization import group_evi_links, iter_evi_links
+from pair_map import PairMap
+from stance_evidence import iter_pairs, write_pairs
+
+
+class Dataset:
+    """Stands in for LongCheckerDataset, a token per character."""
+
+    def __init__(self, entries, tokenizer):
+        self.entries = entries
+
+    def __getitem__(self, i):
+        text = self.entries[i]["to_tensorize"]
+        length = len(text["claim"]) + sum(map(len, text["sentences"]))
+        return {
+            "entry": self.entries[i],
+            "tokenized": {"input_ids": [0] * length},
+        }
+
+
+class Collator:
+    def __init__(self, tokenizer):
+        pass
+
+    def __call__(self, batch):
+        return batch
+
+
+class Model:
+    """Stands in for LongCheckerModel, predicting from the words of the
+    input, and keeping the claims of the inputs it predicts."""
+
+    predicted = []
+
+    @classmethod
+    def load_from_checkpoint(cls, checkpoint_path):
+        return cls()
+
+    def to(self, device):
+        pass
+
+    def eval(self):
+        pass
+
+    def freeze(self):
+        pass
+
+    def predict(self, batch, force_rationale):
+        predictions = []
+        for x in batch:
+            text = x["entry"]["to_tensorize"]
+            Model.predicted.append(text["claim"])
+            words = text["claim"].split() + text["sentences"][0].split()
+            label = ["NEI", "SUPPORT", "CONTRADICT"][len(words) % 3]
+            predictions.append(
+                {
+                    "claim_id": x["entry"]["claim_id"],
+                    "abstract_id": x["entry"]["abstract_id"],
+                    "predicted_label": label,
+                    "label_probs": [0.2, 0.3, 0.5],
+                    "predicted_rationale": [0],
+                    "rationale_probs": [0.9],
+                }
+            )
+        return predictions
+
+
+@pytest.fixture
+def stance_predictor(monkeypatch):
+    """Imports stance_predictor with longchecker stubbed."""
+
+    data = types.ModuleType("longchecker.data")
+    data.Collator = Collator
+    data.LongCheckerDataset = Dataset
+    data.get_tokenizer = lambda: None
+    model = types.ModuleType("longchecker.model")
+    model.LongCheckerModel = Model
+    package = types.ModuleType("longchecker")
+    package.data, package.model = data, model
+    monkeypatch.setitem(sys.modules, "longchecker", package)
+    monkeypatch.setitem(sys.modules, "longchecker.data", data)
+    monkeypatch.setitem(sys.modules, "longchecker.model", model)
+    monkeypatch.delitem(sys.modules, "stance_predictor", raising=False)
+    monkeypatch.setattr(Model, "predicted", [])
+    return importlib.import_module("stance_predictor")
+
+
+def write_jsonl(path, rows):
+    with open(path, "w") as f:
+        f.writelines(json.dumps(row) + "\n" for row in rows)
+    return str(path)
+
+
+def read_jsonl(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def pairs_args(tmp_path, strategy):
+    evidence = {"label": "SUPPORT", "sentences": [0, 2]}
+    corpus = [
+        {
+            "doc_id": d,
+            "title": f"title {d}",
+            "abstract": [f"doc {d} sentence" + " word" * s for s in range(3)],
+        }
+        for d in [10, 11, 12]
+    ]
+    predictions = [
+        {"id": 0, "evidence": {"10": evidence, "11": evidence}},
+        {"id": 1, "evidence": {}},
+        {"id": 2, "evidence": {"10": evidence, "11": evidence, "12": evidence}},
+    ]
+    return argparse.Namespace(
+        corpus=write_jsonl(tmp_path / "corpus.jsonl", corpus),
+        predictions=write_jsonl(tmp_path / "predictions.jsonl", predictions),
+        pairs=strategy,
+        top_k=1,
+        similarity="tfidf",
+    )
+
+
+@pytest.mark.parametrize("strategy", ["all", "symmetric", "top_k"])
+def test_written_pairs_match_the_entries_in_memory(
+    tmp_path, stance_predictor, strategy
+):
+    files = [str(tmp_path / name) for name in ["c.jsonl", "d.jsonl", "m.npy"]]
+    args = pairs_args(tmp_path, strategy)
+    claim_pairs = list(write_pairs(iter_pairs(args), *files))
+    in_memory = list(stance_predictor.pair_entries(claim_pairs))
+    assert len(in_memory) == sum(len(pairs) for _, pairs, _ in claim_pairs)
+
+    # The entries longchecker would read from the files.
+    entries = stance_predictor.document_entries(
+        read_jsonl(files[0]), read_jsonl(files[1])
+    )
+    assert entries == [entry for entry, _ in in_memory]
+    pair_map = PairMap(files[2])
+    assert [pair_map.link(i) for i in range(len(pair_map))] == [
+        link for _, link in in_memory
+    ]
+
+
+def test_mirrored_stances_match_the_files(tmp_path, stance_predictor):
+    files = [str(tmp_path / name) for name in ["c.jsonl", "d.jsonl", "m.npy"]]
+    session = stance_predictor.LongCheckerSession("checkpoint", "cpu")
+    args = pairs_args(tmp_path, "symmetric")
+    stances = session.predict_stances(
+        write_pairs(iter_pairs(args), *files), token_budget=1024
+    )
+    results = str(tmp_path / "results.jsonl")
+    in_memory = list(
+        group_evi_links(stance_predictor.write_stances(stances, results))
+    )
+
+    assert [claim_id for claim_id, _ in in_memory] == [0, 2]
+    for _, links in in_memory:
+        ends = [
+            ((e["fdoc_id"], e["fdoc_e_num"]), (e["sdoc_id"], e["sdoc_e_num"]))
+            for e in links
+        ]
+        # Each stance is followed by its mirror.
+        assert ends[1::2] == [(b, a) for a, b in ends[::2]]
+        assert [e["label"] for e in links[1::2]] == [
+            e["label"] for e in links[::2]
+        ]
+    assert sum(len(links) for _, links in in_memory) > 0
+    # Reading the files back gives the same links.
+    assert list(iter_evi_links(results, files[2])) == in_memory
+
+
+def test_real_dataset_and_collator(tmp_path, monkeypatch):
+    """The inputs LongCheckerSession.predict measures and batches, as the
+    real tokenizer, dataset and collator of longchecker make them."""
+
+    monkeypatch.syspath_prepend("longchecker/longchecker/")
+    monkeypatch.syspath_prepend("longchecker/")
+    data = pytest.importorskip("longchecker.data")
+    monkeypatch.delitem(sys.modules, "stance_predictor", raising=False)
+    stance_predictor = importlib.import_module("stance_predictor")
+    corpus = read_jsonl(pairs_args(tmp_path, "all").corpus)
+    claims = [
+        {"id": 0, "claim": "a claim", "doc_ids": [10]},
+        {
+            "id": 1,
+            "claim": "a much longer claim than the other",
+            "doc_ids": [12],
+        },
+    ]
+    tokenizer = data.get_tokenizer()
+    entries = stance_predictor.document_entries(claims, corpus)
+    dataset = data.LongCheckerDataset(entries, tokenizer)
+    inputs = [dataset[i] for i in range(len(dataset))]
+    lengths = [len(x["tokenized"]["input_ids"]) for x in inputs]
+    assert 0 < lengths[0] < lengths[1]
+
+    collated = data.Collator(tokenizer)(inputs[::-1])
+    input_ids = collated["tokenized"]["input_ids"]
+    # The batch is padded to its longest input, in the order of the inputs.
+    assert tuple(input_ids.shape) == (2, lengths[1])
+    assert [int(x) for x in collated["claim_id"]] == [1, 0]
+
+
+def test_batches_of_fixed_size_sorted_by_length(stance_predictor):
+    batches = stance_predictor.batches
+    assert list(batches([3, 1, 2], batch_size=2)) == [[1, 2], [0]]
+    assert list(batches([3, 1, 2])) == [[1], [2], [0]]
+    assert list(batches([], batch_size=2)) == []
+
+
+def test_batches_fill_the_token_budget_padded(stance_predictor):
+    batches = stance_predictor.batches
+    # Padded to 512, 512, 1024, 1024 and 1024 tokens.
+    lengths = [600, 10, 1000, 20, 513]
+    assert list(batches(lengths, token_budget=2048)) == [[1, 3], [4, 0], [2]]
+    assert list(batches([3, 3, 3, 5], token_budget=10, multiple=1)) == [
+        [0, 1, 2],
+        [3],
+    ]
+    # An input over the budget is a batch of its own.
+    assert list(batches([5000, 10], token_budget=1024)) == [[1], [0]]
+
+
+def test_batches_cover_every_input_once(stance_predictor):
+    random.seed(0)
+    lengths = [random.randrange(1, 3000) for _ in range(200)]
+    for token_budget in [None, 1024, 4096]:
+        batched = list(
+            stance_predictor.batches(lengths, 4, token_budget, multiple=256)
+        )
+        assert sorted(i for batch in batched for i in batch) == list(
+            range(len(lengths))
+        )
+        if token_budget is None:
+            continue
+        for batch in batched:
+            # Batches of several inputs fit the budget.
+            padded = max(-(-lengths[i] // 256) * 256 for i in batch)
+            assert len(batch) == 1 or len(batch) * padded <= token_budget
+
+
+def test_one_session_serves_both_stages(
+    tmp_path, stance_predictor, monkeypatch
+):
+    loads = []
+
+    def load_from_checkpoint(checkpoint_path):
+        loads.append(checkpoint_path)
+        return Model()
+
+    monkeypatch.setattr(Model, "load_from_checkpoint", load_from_checkpoint)
+    session = stance_predictor.LongCheckerSession("checkpoint", "cpu")
+    args = pairs_args(tmp_path, "all")
+    claims = [{"id": 0, "claim": "a claim", "doc_ids": [10, 11]}]
+    corpus = read_jsonl(args.corpus)
+    entries = stance_predictor.document_entries(claims, corpus)
+    predictions = session.predict(entries, "document", token_budget=1024)
+    assert [(p["claim_id"], p["abstract_id"]) for p in predictions] == [
+        (0, 10),
+        (0, 11),
+    ]
+    stances = list(session.predict_stances(iter_pairs(args), batch_size=2))
+
+    assert loads == ["checkpoint"]
+    assert dict(session.counts) == {"document": 2, "evidence": len(stances)}
+    assert len(stances) > 0
+    lines = session.summary().split("\n")
+    assert [line.split(":")[0] for line in lines] == [
+        "load",
+        "document",
+        "evidence",
+    ]
+
+
+def test_session_predicts_each_input_once(tmp_path, stance_predictor):
+    from prediction_cache import PredictionCache
+
+    checkpoint = tmp_path / "model.ckpt"
+    checkpoint.write_bytes(b"weights")
+    corpus = read_jsonl(pairs_args(tmp_path, "all").corpus)
+    # The same claim under two ids, and a document repeated for a claim.
+    claims = [
+        {"id": 0, "claim": "a claim", "doc_ids": [10, 11, 10]},
+        {"id": 1, "claim": "a claim", "doc_ids": [11]},
+        {"id": 2, "claim": "another claim", "doc_ids": [12]},
+    ]
+    entries = stance_predictor.document_entries(claims, corpus)
+    cache = PredictionCache(str(tmp_path / "cache.sqlite"))
+    session = stance_predictor.LongCheckerSession(
+        str(checkpoint), "cpu", cache=cache
+    )
+    predictions = session.predict(entries, "document", batch_size=2)
+    assert sorted(Model.predicted) == ["a claim", "a claim", "another claim"]
+    assert [(p["claim_id"], p["abstract_id"]) for p in predictions] == [
+        (entry["claim_id"], entry["abstract_id"]) for entry in entries
+    ]
+    assert predictions[0] == predictions[2]
+    assert (cache.hits["document"], cache.misses["document"]) == (0, 3)
+
+    # A new session with the same checkpoint predicts nothing.
+    Model.predicted.clear()
+    session = stance_predictor.LongCheckerSession(
+        str(checkpoint), "cpu", cache=cache
+    )
+    assert session.predict(entries, "document") == predictions
+    assert Model.predicted == []
+    assert (cache.hits["document"], cache.misses["document"]) == (3, 3)
+    # Other settings are other inputs.
+    session.predict(entries, "document", force_rationale=True)
+    assert len(Model.predicted) == 3